@@ -1,36 +1,24 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from config import Config
-from database import init_db
+from database import init_db, init_app as init_db_app, rebuild_search_index
 from auth import auth_bp
 from auction import auction_bp
 from bid import bid_bp
+from images import image_bp, migrate_inline_images
 from scheduler import start_scheduler
+from orderbook import start_order_book
+from utils import get_client_ip
+from logs import configure_logging, log_access
 import logging
+import metrics
+import time
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
+# 配置日志（异步批量写出）
+configure_logging()
 logger = logging.getLogger(__name__)
 
-def get_client_ip():
-    """获取客户端真实IP地址，考虑代理情况"""
-    # 优先检查X-Forwarded-For头（如果有反向代理）
-    if request.headers.get('X-Forwarded-For'):
-        # X-Forwarded-For可能包含多个IP，取第一个
-        ip = request.headers.get('X-Forwarded-For').split(',')[0].strip()
-        return ip
-    # 检查X-Real-IP头
-    elif request.headers.get('X-Real-Ip'):
-        return request.headers.get('X-Real-Ip')
-    # 直接连接的IP
-    else:
-        return request.remote_addr or 'unknown'
-
 def create_app():
     """创建Flask应用"""
     app = Flask(__name__)
@@ -46,23 +34,26 @@ def create_app():
     # 初始化JWT
     jwt = JWTManager(app)
     
-    # 添加请求前钩子来记录请求信息（包括IP）
+    # 添加请求前钩子：开始计时、统计SQL，并按比例抽样分析
     @app.before_request
-    def log_request_info():
-        if request.path.startswith('/api/'):
-            client_ip = get_client_ip()
-            logger.info(f"[{client_ip}] {request.method} {request.path} - User-Agent: {request.headers.get('User-Agent', 'Unknown')}")
-            
-            auth_header = request.headers.get('Authorization', '')
-            if auth_header:
-                logger.debug(f"[{client_ip}] Authorization header: {auth_header[:50]}...")  # 只打印前50个字符
-    
-    # 添加请求后钩子来记录响应信息（包括IP和状态码）
+    def start_request_metrics():
+        g.request_started = time.perf_counter()
+        metrics.start_request()
+        g.profiler = metrics.start_profile()
+    
+    # 添加请求后钩子：记录各接口的耗时和SQL统计，并为每个API请求写一条访问日志（包括IP、状态码和耗时）
     @app.after_request
-    def log_response_info(response):
-        if request.path.startswith('/api/'):
-            client_ip = get_client_ip()
-            logger.info(f"[{client_ip}] {request.method} {request.path} - Status: {response.status_code}")
+    def record_request(response):
+        started = g.get('request_started')
+        if started is not None:
+            elapsed = time.perf_counter() - started
+            endpoint = request.endpoint or 'unmatched'
+            metrics.finish_request(request.method, endpoint, response.status_code, elapsed)
+            if g.get('profiler') is not None:
+                metrics.finish_profile(g.pop('profiler'), request.method, endpoint, elapsed)
+            if request.path.startswith('/api/'):
+                log_access(request.method, request.path, response.status_code, elapsed,
+                           get_client_ip(), request.headers.get('User-Agent', 'Unknown'))
         return response
     
     # JWT错误处理 - 将422错误转换为401
@@ -94,18 +85,36 @@ def create_app():
     app.register_blueprint(auth_bp)
     app.register_blueprint(auction_bp)
     app.register_blueprint(bid_bp)
+    app.register_blueprint(image_bp)
     
     # 初始化数据库
+    init_db_app(app)
     with app.app_context():
         init_db()
+        # 将旧数据中内联的base64图片迁移到图片存储
+        migrated = migrate_inline_images()
+        if migrated:
+            logger.info(f"Migrated inline images of {migrated} auctions to image store")
     
-    # 启动定时任务
+    # 启动内存出价引擎（BID_ENGINE=memory 时）和定时任务
+    start_order_book()
     start_scheduler()
     
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index_command():
+        """重建拍卖全文搜索索引：flask --app app rebuild-search-index"""
+        count = rebuild_search_index()
+        print(f'Rebuilt search index for {count} auctions')
+    
     @app.route('/')
     def index():
         return {'message': 'Simple Auction API', 'status': 'running'}
     
+    @app.route('/metrics')
+    def metrics_endpoint():
+        """Prometheus文本格式的运行指标（当前进程）"""
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+    
     return app
 
 if __name__ == '__main__':
@@ -0,0 +1,284 @@
+"""ASGI入口
+
+高频的公开读接口、出价接口和实时推送（SSE）由原生异步处理函数处理：
+数据库访问在独立的线程池中执行，等待推送事件时不占用任何线程。
+其余接口通过 WsgiToAsgi 交给Flask应用处理。
+
+启动（在 backend 目录下）：
+    uvicorn asgi:app --host 0.0.0.0 --port 3000
+"""
+from asgiref.wsgi import WsgiToAsgi
+from flask_jwt_extended import decode_token
+from jwt import ExpiredSignatureError, PyJWTError
+from werkzeug.datastructures import MultiDict
+from urllib.parse import parse_qsl
+from app import create_app
+from async_models import Auction, Bid, User, run
+from auction import parse_list_args, format_auction_list, format_auction_detail, format_stream_snapshot, is_final_event
+from bid import check_bid, publish_bid, format_bid_created
+from events import hub, format_sse, SubscriberLimitExceeded
+from config import Config
+from logs import log_access
+from orderbook import BidRejected, get_order_book
+from scheduler import schedule_settlement
+from utils import resolve_client_ip
+import asyncio
+import json
+import logging
+import metrics
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+flask_app = create_app()
+wsgi_app = WsgiToAsgi(flask_app)
+
+class RequestTooLarge(Exception):
+    """请求体超过 MAX_CONTENT_LENGTH（与Flask接口的限制相同），返回413"""
+
+class Request:
+    """从ASGI scope中解析出的请求信息"""
+    
+    def __init__(self, scope, receive, endpoint):
+        self.started = time.perf_counter()
+        # 开始统计该请求的SQL次数和耗时（数据库线程池中的查询也计入，见 async_models._offload）
+        metrics.start_request()
+        self.scope = scope
+        self.endpoint = endpoint
+        self.receive = receive
+        self.method = scope['method']
+        self.path = scope['path']
+        self.headers = {key.decode('latin-1').lower(): value.decode('latin-1') for key, value in scope['headers']}
+        self.args = MultiDict(parse_qsl(scope.get('query_string', b'').decode('latin-1'), keep_blank_values=True))
+    
+    @property
+    def client_ip(self):
+        """客户端IP（与 utils.get_client_ip 的规则一致：只信任可信反向代理写入的 X-Real-IP）"""
+        client = self.scope.get('client')
+        return resolve_client_ip(client[0] if client else None, self.headers.get('x-real-ip'))
+    
+    async def body(self):
+        """读取请求体；声明的长度或已读取的字节数超过 MAX_CONTENT_LENGTH 时抛出 RequestTooLarge，不再继续读取"""
+        limit = Config.MAX_CONTENT_LENGTH
+        declared = self.headers.get('content-length', '')
+        if declared.isdigit() and int(declared) > limit:
+            raise RequestTooLarge()
+        chunks = []
+        size = 0
+        while True:
+            message = await self.receive()
+            if message['type'] == 'http.disconnect':
+                break
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > limit:
+                raise RequestTooLarge()
+            chunks.append(chunk)
+            if not message.get('more_body'):
+                break
+        return b''.join(chunks)
+    
+    def finish(self, status):
+        """响应开始发送后记录耗时指标和访问日志"""
+        elapsed = time.perf_counter() - self.started
+        metrics.finish_request(self.method, self.endpoint, status, elapsed)
+        log_access(self.method, self.path, status, elapsed, self.client_ip, self.headers.get('user-agent', 'Unknown'))
+    
+    def identity(self):
+        """校验Bearer Token，返回 (用户ID, None) 或 (None, 错误响应体)"""
+        header = self.headers.get('authorization', '')
+        if not header.startswith('Bearer '):
+            return None, {'error': '缺少认证Token，请先登录', 'type': 'missing'}
+        try:
+            with flask_app.app_context():
+                claims = decode_token(header[len('Bearer '):])
+        except ExpiredSignatureError:
+            return None, {'error': 'Token已过期，请重新登录', 'type': 'expired'}
+        except PyJWTError as e:
+            logger.warning(f"[{self.client_ip}] Invalid token error: {e}")
+            return None, {'error': 'Token无效，请重新登录', 'type': 'invalid', 'details': str(e)}
+        return int(claims[flask_app.config['JWT_IDENTITY_CLAIM']]), None
+
+def _response_headers(content_type, extra=None):
+    headers = [
+        (b'content-type', content_type.encode()),
+        (b'access-control-allow-origin', b'*'),
+    ]
+    for key, value in (extra or {}).items():
+        headers.append((key.lower().encode(), str(value).encode()))
+    return headers
+
+async def send_json(request, send, data, status=200, headers=None):
+    body = flask_app.json.dumps(data).encode() + b'\n'
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': _response_headers('application/json', headers)})
+    await send({'type': 'http.response.body', 'body': body})
+    request.finish(status)
+
+async def get_auctions(request, send):
+    """获取拍卖列表"""
+    page, per_page, status, order_by, cursor, include_total = parse_list_args(request.args)
+    try:
+        auctions, total, next_cursor = await Auction.get_list(page, per_page, status, order_by, cursor, include_total)
+    except ValueError as e:
+        return await send_json(request, send, {'error': str(e)}, 400)
+    await send_json(request, send, format_auction_list(auctions, total, next_cursor, page, per_page, cursor))
+
+async def get_auction_detail(request, send, auction_id):
+    """获取拍卖详情"""
+    auction = await Auction.get_by_id(auction_id)
+    if not auction:
+        return await send_json(request, send, {'error': '拍卖不存在'}, 404)
+    recent = await Bid.get_recent(auction_id, Config.BID_HISTORY_DETAIL_SIZE)
+    bidder = None
+    if auction['current_bidder_id']:
+        bidder = await User.get_profile(auction['current_bidder_id'])
+    viewer_id, _ = request.identity()
+    result = format_auction_detail(auction, recent['bids'], bidder, viewer_id, recent)
+    result['bid_history_cursor'] = recent['next_cursor']
+    await send_json(request, send, result)
+
+async def create_bid(request, send, auction_id):
+    """参与竞拍（出价）"""
+    bidder_id, error = request.identity()
+    if error:
+        return await send_json(request, send, error, 401)
+    try:
+        data = json.loads(await request.body() or b'null')
+    except RequestTooLarge:
+        return await send_json(request, send, {'error': '请求数据过大'}, 413)
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        return await send_json(request, send, {'error': '请求数据格式不正确'}, 400)
+    
+    amount = data.get('amount')
+    if not amount or amount <= 0:
+        return await send_json(request, send, {'error': '出价金额必须大于0'}, 400)
+    
+    book = get_order_book()
+    if book:
+        # 等待合并提交时占用的是默认线程池，不占数据库线程池
+        try:
+            bid, stats, extended = await asyncio.get_running_loop().run_in_executor(
+                None, book.place, auction_id, bidder_id, amount, check_bid)
+        except BidRejected as e:
+            return await send_json(request, send, {'error': str(e)}, e.status)
+        if extended:
+            schedule_settlement(auction_id, bid['auction_end_time'])
+        for written in (bid, *bid['proxy_bids']):
+            publish_bid(auction_id, written, await User.get_profile(written['bidder_id']), stats)
+        return await send_json(request, send, format_bid_created(bid), 201)
+    
+    auction = await Auction.get_by_id(auction_id)
+    if not auction:
+        return await send_json(request, send, {'error': '拍卖不存在'}, 404)
+    
+    error = check_bid(auction, bidder_id, amount)
+    if error:
+        return await send_json(request, send, {'error': error}, 400)
+    
+    bid = await Bid.place(auction_id, bidder_id, amount)
+    if not bid:
+        return await send_json(request, send, {'error': '出价已被超过或拍卖已结束，请刷新后重试'}, 409)
+    
+    if bid['auction_end_time'] != auction['end_time']:
+        schedule_settlement(auction_id, bid['auction_end_time'])
+    stats = await Bid.get_stats(auction_id)
+    for written in (bid, *bid['proxy_bids']):
+        publish_bid(auction_id, written, await User.get_profile(written['bidder_id']), stats)
+    await send_json(request, send, format_bid_created(bid), 201)
+
+async def stream_auction(request, send, auction_id):
+    """实时推送拍卖的出价和状态变化（Server-Sent Events），等待事件时不占用线程"""
+    auction = await Auction.get_by_id(auction_id)
+    if not auction:
+        return await send_json(request, send, {'error': '拍卖不存在'}, 404)
+    
+    try:
+        subscription = hub.subscribe(auction_id, loop=asyncio.get_running_loop())
+    except SubscriberLimitExceeded:
+        return await send_json(request, send, {'error': '当前查看人数过多，请稍后重试'}, 503,
+                               {'Retry-After': Config.SSE_RETRY_MILLISECONDS // 1000})
+    
+    # 客户端断开时立即结束，而不是等到下一次心跳
+    disconnected = asyncio.ensure_future(_wait_disconnect(request.receive))
+    try:
+        # 先订阅再补发，避免两者之间发布的事件丢失（重复的事件按序号跳过）
+        last_event_id = request.headers.get('last-event-id') or request.args.get('last_event_id')
+        backlog = await run(hub.replay, auction_id, last_event_id)
+        if backlog is None:
+            stats = await Bid.get_stats(auction_id)
+            bidder = None
+            if auction['current_bidder_id']:
+                bidder = await User.get_profile(auction['current_bidder_id'])
+            backlog = [await run(hub.snapshot, auction_id, format_stream_snapshot(auction, stats, bidder))]
+        
+        await send({'type': 'http.response.start', 'status': 200, 'headers': _response_headers(
+            'text/event-stream; charset=utf-8', {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})})
+        request.finish(200)
+        
+        async def write(text):
+            await send({'type': 'http.response.body', 'body': text.encode(), 'more_body': True})
+        
+        await write(f"retry: {Config.SSE_RETRY_MILLISECONDS}\n\n")
+        last_seq = 0
+        for event in backlog:
+            last_seq = max(last_seq, event['seq'])
+            await write(format_sse(event))
+        while not subscription.closed:
+            getter = asyncio.ensure_future(subscription.get(Config.SSE_HEARTBEAT_SECONDS))
+            await asyncio.wait({getter, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if disconnected.done():
+                getter.cancel()
+                return
+            event = getter.result()
+            if event is None:
+                # 心跳注释行，防止连接被代理判定为空闲而断开
+                await write(': heartbeat\n\n')
+                continue
+            if event['seq'] <= last_seq:
+                continue
+            last_seq = event['seq']
+            await write(format_sse(event))
+            if is_final_event(event):
+                break
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        disconnected.cancel()
+        hub.unsubscribe(subscription)
+
+async def _wait_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+# (方法, 路径正则, 处理函数, 指标中的接口名，与Flask的endpoint一致)
+ROUTES = [
+    ('GET', re.compile(r'^/api/auctions$'), get_auctions, 'auction.get_auctions'),
+    ('GET', re.compile(r'^/api/auctions/(\d+)$'), get_auction_detail, 'auction.get_auction_detail'),
+    ('GET', re.compile(r'^/api/auctions/(\d+)/stream$'), stream_auction, 'auction.stream_auction'),
+    ('POST', re.compile(r'^/api/auctions/(\d+)/bids$'), create_bid, 'bid.create_bid'),
+]
+
+async def app(scope, receive, send):
+    """ASGI应用：匹配到原生异步路由时直接处理，否则交给Flask"""
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    
+    if scope['type'] == 'http':
+        for method, pattern, handler, endpoint in ROUTES:
+            match = pattern.match(scope['path'])
+            if match and scope['method'] == method:
+                request = Request(scope, receive, endpoint)
+                return await handler(request, send, *(int(group) for group in match.groups()))
+    
+    await wsgi_app(scope, receive, send)
@@ -0,0 +1,34 @@
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+import asyncio
+import contextvars
+import functools
+import models
+
+# 数据库访问线程池，大小与连接池一致，避免并发查询数超过可复用的连接数
+_executor = ThreadPoolExecutor(max_workers=Config.DB_POOL_SIZE, thread_name_prefix='db')
+
+def _offload(func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        loop = asyncio.get_running_loop()
+        # 在调用方上下文的副本中执行，使查询计入当前请求的SQL统计（metrics.start_request）
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(_executor, functools.partial(context.run, func, *args, **kwargs))
+    return wrapper
+
+async def run(func, *args, **kwargs):
+    """在数据库线程池中执行模型以外需要访问数据库的同步函数（如 events.hub 的补发和快照）"""
+    return await _offload(func)(*args, **kwargs)
+
+def _async_model(model):
+    """生成与模型同名、参数相同的异步静态方法（在数据库线程池中执行同步实现）"""
+    namespace = {'__doc__': f'{model.__name__} 的异步版本'}
+    for name, attr in vars(model).items():
+        if isinstance(attr, staticmethod) and not name.startswith('_'):
+            namespace[name] = staticmethod(_offload(getattr(model, name)))
+    return type(model.__name__, (), namespace)
+
+User = _async_model(models.User)
+Auction = _async_model(models.Auction)
+Bid = _async_model(models.Bid)
@@ -1,17 +1,28 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import Blueprint, Response, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request
 from models import Auction, User
+from images import save_image, generate_thumbnails
+from scheduler import schedule_settlement, schedule_settlements
+from events import hub, format_sse, SubscriberLimitExceeded
+from utils import END_TIME_FORMAT, normalize_end_time
 from datetime import datetime
+import html
+import json
+import logging
 import os
+import sqlite3
 from config import Config
 
 auction_bp = Blueprint('auction', __name__, url_prefix='/api/auctions')
+logger = logging.getLogger(__name__)
 
-@auction_bp.route('', methods=['POST'])
-@jwt_required()
-def create_auction():
-    """发布拍卖标的"""
-    data = request.get_json()
+def validate_auction(data):
+    """按发布规则校验一条拍卖数据，返回 (字段, None) 或 (None, 错误信息)
+    
+    通过校验时会把图片保存到图片存储，字段中的 images 为图片键（及原样保留的外部链接）列表。
+    """
+    if not isinstance(data, dict):
+        return None, '请求数据格式不正确'
     
     title = data.get('title', '').strip()
     description = data.get('description', '').strip()
@@ -19,44 +30,86 @@ def create_auction():
     end_time = data.get('end_time')
     images = data.get('images', [])
     min_increment = data.get('min_increment', 0.01)
+    soft_close_window = data.get('soft_close_window') or 0
+    soft_close_extension = data.get('soft_close_extension') or 0
     
     # 验证输入
     if not title:
-        return jsonify({'error': '标的名称不能为空'}), 400
+        return None, '标的名称不能为空'
     
     if not description:
-        return jsonify({'error': '标的描述不能为空'}), 400
+        return None, '标的描述不能为空'
     
     if not starting_price or starting_price <= 0:
-        return jsonify({'error': '起拍价必须大于0'}), 400
+        return None, '起拍价必须大于0'
     
     if not end_time:
-        return jsonify({'error': '拍卖结束时间不能为空'}), 400
+        return None, '拍卖结束时间不能为空'
     
     if not min_increment or min_increment <= 0:
-        return jsonify({'error': '最低加价幅度必须大于0'}), 400
+        return None, '最低加价幅度必须大于0'
+    
+    # 软结束（防狙击）：两项同时为0（不启用）或同时为正整数秒
+    for value in (soft_close_window, soft_close_extension):
+        if not isinstance(value, int) or isinstance(value, bool) or not 0 <= value <= Config.SOFT_CLOSE_MAX_SECONDS:
+            return None, f'延时设置必须为0到{Config.SOFT_CLOSE_MAX_SECONDS}之间的整数秒'
+    if bool(soft_close_window) != bool(soft_close_extension):
+        return None, '延时时间窗口和延长时间需同时设置'
     
-    # 验证结束时间
+    # 验证结束时间（统一为服务器本地时间的存储格式，出价和结算按字符串比较）
     try:
-        end_datetime = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
-        now = datetime.now(end_datetime.tzinfo) if end_datetime.tzinfo else datetime.now()
-        
-        # 检查是否至少在未来1小时后
-        if (end_datetime - now).total_seconds() < 3600:
-            return jsonify({'error': '拍卖结束时间必须至少在未来1小时后'}), 400
+        end_time = normalize_end_time(end_time)
     except ValueError:
-        return jsonify({'error': '结束时间格式不正确'}), 400
+        return None, '结束时间格式不正确'
+    
+    # 检查是否至少在未来1小时后
+    if (datetime.strptime(end_time, END_TIME_FORMAT) - datetime.now()).total_seconds() < 3600:
+        return None, '拍卖结束时间必须至少在未来1小时后'
+    
+    # 保存图片到图片存储
+    if not isinstance(images, list):
+        return None, '图片格式不正确'
+    try:
+        image_keys = [save_image(image) for image in images]
+    except ValueError as e:
+        return None, str(e)
+    
+    return {
+        'title': title,
+        'description': description,
+        'starting_price': starting_price,
+        'end_time': end_time,
+        'images': image_keys,
+        'min_increment': min_increment,
+        'soft_close_window': soft_close_window,
+        'soft_close_extension': soft_close_extension
+    }, None
+
+@auction_bp.route('', methods=['POST'])
+@jwt_required()
+def create_auction():
+    """发布拍卖标的"""
+    fields, error = validate_auction(request.get_json())
+    if error:
+        return jsonify({'error': error}), 400
     
     seller_id = get_jwt_identity()
     # 将字符串ID转换回整数用于数据库查询
     seller_id = int(seller_id)
     
     # 创建拍卖标的
-    auction = Auction.create(title, description, starting_price, end_time, seller_id, images, min_increment)
+    auction = Auction.create(fields['title'], fields['description'], fields['starting_price'], fields['end_time'],
+                             seller_id, fields['images'], fields['min_increment'],
+                             fields['soft_close_window'], fields['soft_close_extension'])
     
     if not auction:
         return jsonify({'error': '发布失败，请重试'}), 500
     
+    # 后台生成缩略图
+    generate_thumbnails(fields['images'])
+    # 登记到结算引擎，到期时立即结算
+    schedule_settlement(auction['id'], auction['end_time'])
+    
     return jsonify({
         'message': '发布成功',
         'auction': {
@@ -66,18 +119,88 @@ def create_auction():
             'starting_price': auction['starting_price'],
             'current_price': auction['current_price'],
             'min_increment': auction.get('min_increment', 0.01),
+            'soft_close_window': auction['soft_close_window'],
+            'soft_close_extension': auction['soft_close_extension'],
             'end_time': auction['end_time'],
             'status': auction['status']
         }
     }), 201
 
-@auction_bp.route('', methods=['GET'])
-def get_auctions():
-    """获取拍卖列表"""
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
-    status = request.args.get('status', None)
-    order_by = request.args.get('order_by', 'created_at')
+def _import_chunk(seller_id, chunk, results):
+    """插入一批已校验的行，并把每行的结果写入 results"""
+    try:
+        created = Auction.create_many(seller_id, [fields for _, fields in chunk])
+    except sqlite3.Error as e:
+        logger.error(f"Bulk import of {len(chunk)} auctions failed: {e}")
+        for line, _ in chunk:
+            results.append({'line': line, 'error': '保存失败，请重试'})
+        return
+    for (line, fields), (auction_id, end_time) in zip(chunk, created):
+        results.append({'line': line, 'id': auction_id})
+        generate_thumbnails(fields['images'])
+    schedule_settlements(created)
+
+@auction_bp.route('/bulk', methods=['POST'])
+@jwt_required()
+def bulk_create_auctions():
+    """批量发布拍卖
+    
+    请求体为JSON Lines（每行一个与发布接口相同格式的拍卖），边读取边逐行校验，
+    每 BULK_IMPORT_CHUNK_SIZE 行在一个事务中插入。返回每行的结果（行号从1开始）。
+    """
+    seller_id = int(get_jwt_identity())
+    results = []
+    chunk = []
+    rows = 0
+    for line_number, line in enumerate(request.stream, start=1):
+        if not line.strip():
+            continue
+        rows += 1
+        if rows > Config.BULK_IMPORT_MAX_ROWS:
+            results.append({'line': line_number, 'error': f'单次最多导入 {Config.BULK_IMPORT_MAX_ROWS} 条，其余行未处理'})
+            break
+        try:
+            fields, error = validate_auction(json.loads(line))
+        except (ValueError, TypeError, AttributeError):
+            fields, error = None, '请求数据格式不正确'
+        if error:
+            results.append({'line': line_number, 'error': error})
+            continue
+        chunk.append((line_number, fields))
+        if len(chunk) >= Config.BULK_IMPORT_CHUNK_SIZE:
+            _import_chunk(seller_id, chunk, results)
+            chunk = []
+    _import_chunk(seller_id, chunk, results)
+    
+    results.sort(key=lambda result: result['line'])
+    created = sum(1 for result in results if 'id' in result)
+    return jsonify({'created': created, 'failed': len(results) - created, 'results': results}), 200
+
+@auction_bp.route('/my/export', methods=['GET'])
+@jwt_required()
+def export_my_auctions():
+    """以JSON Lines流式导出我发布的拍卖及其出价
+    
+    每行一个对象，type 为 auction 或 bid，出价紧跟在所属拍卖之后。
+    """
+    seller_id = int(get_jwt_identity())
+    
+    def generate():
+        for kind, record in Auction.export_by_seller(seller_id):
+            yield json.dumps({'type': kind, **record}, ensure_ascii=False) + '\n'
+    
+    return Response(generate(), mimetype='application/x-ndjson', headers={
+        'Content-Disposition': f'attachment; filename="auctions-{seller_id}.jsonl"'
+    })
+
+def parse_list_args(args):
+    """解析并校验拍卖列表的查询参数"""
+    page = args.get('page', 1, type=int)
+    per_page = args.get('per_page', 20, type=int)
+    status = args.get('status', None)
+    order_by = args.get('order_by', 'created_at')
+    cursor = args.get('cursor', None)
+    include_total = args.get('include_total', '') in ('1', 'true')
     
     # 验证参数
     if page < 1:
@@ -91,18 +214,12 @@ def get_auctions():
     if order_by not in ['created_at', 'end_time']:
         order_by = 'created_at'
     
-    auctions, total = Auction.get_list(page, per_page, status, order_by)
-    
-    # 获取每个拍卖的竞拍者数量
-    from models import Bid
-    
-    # 格式化输出
+    return page, per_page, status, order_by, cursor, include_total
+
+def format_auction_list(auctions, total, next_cursor, page, per_page, cursor):
+    """格式化拍卖列表响应（剩余时间按请求时刻计算）"""
     result = []
     for auction in auctions:
-        # 计算竞拍者数量
-        bids = Bid.get_by_auction(auction['id'])
-        bidder_count = len(set(bid['bidder_id'] for bid in bids))
-        
         # 计算剩余时间
         end_time = datetime.fromisoformat(auction['end_time'].replace('Z', '+00:00'))
         now = datetime.now(end_time.tzinfo) if end_time.tzinfo else datetime.now()
@@ -118,12 +235,24 @@ def get_auctions():
             'end_time': auction['end_time'],
             'status': auction['status'],
             'images': auction['images'][:1] if auction['images'] else [],  # 只返回第一张图片
+            'thumbnail': auction['thumbnail'],
             'time_left': max(0, int(time_left)) if auction['status'] == 'active' else 0,
             'seller_username': auction.get('seller_username', ''),
-            'bidder_count': bidder_count
+            'bidder_count': auction['bidder_count'],
+            'bid_count': auction['bid_count']
         })
     
-    return jsonify({
+    if cursor is not None:
+        pagination = {
+            'per_page': per_page,
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None
+        }
+        if total is not None:
+            pagination['total'] = total
+        return {'auctions': result, 'pagination': pagination}
+    
+    return {
         'auctions': result,
         'pagination': {
             'page': page,
@@ -131,42 +260,126 @@ def get_auctions():
             'total': total,
             'pages': (total + per_page - 1) // per_page
         }
-    }), 200
+    }
 
-@auction_bp.route('/<int:auction_id>', methods=['GET'])
-def get_auction_detail(auction_id):
-    """获取拍卖详情"""
-    auction = Auction.get_by_id(auction_id)
+@auction_bp.route('', methods=['GET'])
+def get_auctions():
+    """获取拍卖列表
     
-    if not auction:
-        return jsonify({'error': '拍卖不存在'}), 404
+    默认按页码分页；传入 cursor 参数（首页为空）时使用游标分页，
+    总数仅在 include_total=1 时返回。
+    """
+    page, per_page, status, order_by, cursor, include_total = parse_list_args(request.args)
     
-    # 获取出价历史
-    from models import Bid
-    bids = Bid.get_by_auction(auction_id)
+    try:
+        auctions, total, next_cursor = Auction.get_list(page, per_page, status, order_by, cursor, include_total)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify(format_auction_list(auctions, total, next_cursor, page, per_page, cursor)), 200
+
+def highlight(text, terms, length=None):
+    """转义HTML并用<mark>标出关键词；指定 length 时只截取第一个关键词附近的片段"""
+    lowered = text.lower()
+    spans = []
+    for term in terms:
+        term = term.lower()
+        start = lowered.find(term)
+        while start != -1:
+            spans.append((start, start + len(term)))
+            start = lowered.find(term, start + len(term))
+    spans.sort()
+    
+    begin, end = 0, len(text)
+    if length and len(text) > length:
+        # 片段从第一个关键词前少量上下文开始
+        first = spans[0][0] if spans else 0
+        begin = max(0, min(first - length // 4, len(text) - length))
+        end = begin + length
+    
+    parts = ['…'] if begin > 0 else []
+    position = begin
+    for start, stop in spans:
+        start, stop = max(start, position), min(stop, end)
+        if start >= stop:
+            continue
+        parts.append(html.escape(text[position:start]))
+        parts.append('<mark>' + html.escape(text[start:stop]) + '</mark>')
+        position = stop
+    parts.append(html.escape(text[position:end]))
+    if end < len(text):
+        parts.append('…')
+    return ''.join(parts)
+
+@auction_bp.route('/search', methods=['GET'])
+def search_auctions():
+    """全文搜索拍卖标题和描述
+    
+    q 为关键词（空格分隔，需全部出现），可按 status、min_price、max_price 过滤；
+    按相关度排序并游标分页。highlight 中的文本已转义HTML，关键词用<mark>标出。
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': '搜索关键词不能为空'}), 400
+    if len(query) > 100:
+        return jsonify({'error': '搜索关键词不能超过100个字符'}), 400
+    terms = list(dict.fromkeys(query.split()))[:8]
+    status = request.args.get('status', None)
+    if status and status not in ['active', 'ended', 'no_bid']:
+        status = None
+    min_price = request.args.get('min_price', None, type=float)
+    max_price = request.args.get('max_price', None, type=float)
+    cursor = request.args.get('cursor', '')
+    limit = request.args.get('limit', 20, type=int)
+    if limit < 1 or limit > 100:
+        limit = 20
+    
+    try:
+        auctions, next_cursor = Auction.search(terms, status, min_price, max_price, limit, cursor)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    # 格式化出价历史（隐藏部分信息）
-    bid_history = []
-    for bid in bids:
-        bid_history.append({
+    result = format_auction_list(auctions, None, next_cursor, 1, limit, cursor)
+    for item, auction in zip(result['auctions'], auctions):
+        item['highlight'] = {
+            'title': highlight(auction['title'], terms),
+            'description': highlight(auction['description'], terms, 100)
+        }
+    return jsonify(result), 200
+
+def is_seller(auction, viewer_id):
+    """查看者是否是拍卖的发布者"""
+    return viewer_id is not None and int(viewer_id) == auction['seller_id']
+
+def format_bid_history(auction, bids, viewer_id=None):
+    """格式化出价记录：发布者看到完整的出价者用户名，其他人看到的用户名部分隐藏"""
+    full = is_seller(auction, viewer_id)
+    return [
+        {
+            'id': bid['id'],
             'amount': bid['amount'],
             'created_at': bid['created_at'],
-            'bidder': bid['username'] if len(bid['username']) > 1 else '***'
-        })
+            'bidder': bid['username'] if full or len(bid['username']) > 1 else '***'
+        }
+        for bid in bids
+    ]
+
+def format_auction_detail(auction, bids, bidder, viewer_id=None, stats=None):
+    """格式化拍卖详情（bidder 为当前最高出价者资料，viewer_id 为查看者ID）
     
+    bids 为最近的出价记录，stats 为出价统计（bid_count、bidder_count），传入时附带出价总数。
+    """
     # 计算剩余时间
     end_time = datetime.fromisoformat(auction['end_time'].replace('Z', '+00:00'))
     now = datetime.now(end_time.tzinfo) if end_time.tzinfo else datetime.now()
     time_left = (end_time - now).total_seconds()
     
-    # 获取当前最高出价者信息（部分隐藏）
+    # 当前最高出价者信息（部分隐藏）
     current_bidder = None
-    if auction['current_bidder_id']:
-        bidder = User.get_by_id(auction['current_bidder_id'])
-        if bidder:
-            current_bidder = {
-                'username': bidder['username'] if len(bidder['username']) > 1 else '***'
-            }
+    if bidder:
+        current_bidder = {
+            'username': bidder['username'] if len(bidder['username']) > 1 else '***'
+        }
     
     result = {
         'id': auction['id'],
@@ -175,61 +388,119 @@ def get_auction_detail(auction_id):
         'starting_price': auction['starting_price'],
         'current_price': auction['current_price'],
         'min_increment': auction.get('min_increment', 0.01),
+        'soft_close_window': auction.get('soft_close_window') or 0,
+        'soft_close_extension': auction.get('soft_close_extension') or 0,
         'current_bidder': current_bidder,
         'end_time': auction['end_time'],
         'status': auction['status'],
         'images': auction['images'],
         'time_left': max(0, int(time_left)) if auction['status'] == 'active' else 0,
-        'bid_history': bid_history,
+        'bid_history': format_bid_history(auction, bids, viewer_id),
         'seller_id': auction['seller_id'],
         'seller_username': auction.get('seller_username', '')
     }
     
+    if stats is not None:
+        result['bid_count'] = stats['bid_count']
+        result['bidder_count'] = stats['bidder_count']
+    
     # 如果是发布者，显示完整信息
+    if is_seller(auction, viewer_id) and bidder:
+        result['current_bidder'] = {
+            'id': bidder['id'],
+            'username': bidder['username'],
+            'email': bidder['email']
+        }
+    
+    return result
+
+def get_viewer_id():
+    """查看者ID（未登录或令牌无效时为None），决定拍卖详情中出价者信息的可见范围"""
     try:
-        user_id = get_jwt_identity()
-        if user_id is not None:
-            # 将字符串ID转换回整数用于比较
-            user_id = int(user_id)
-            if user_id == auction['seller_id']:
-                if auction['current_bidder_id']:
-                    bidder = User.get_by_id(auction['current_bidder_id'])
-                    if bidder:
-                        result['current_bidder'] = {
-                            'id': bidder['id'],
-                            'username': bidder['username'],
-                            'email': bidder['email']
-                        }
-                # 显示完整出价历史
-                result['bid_history'] = [
-                    {
-                        'amount': bid['amount'],
-                        'created_at': bid['created_at'],
-                        'bidder': bid['username']
-                    }
-                    for bid in bids
-                ]
+        verify_jwt_in_request(optional=True)
+        return get_jwt_identity()
     except:
-        pass  # 未登录用户
+        return None  # 未登录用户
+
+@auction_bp.route('/<int:auction_id>', methods=['GET'])
+def get_auction_detail(auction_id):
+    """获取拍卖详情"""
+    auction = Auction.get_by_id(auction_id)
     
+    if not auction:
+        return jsonify({'error': '拍卖不存在'}), 404
+    
+    # 获取最近的出价记录和出价统计，更早的出价通过 GET /<id>/bids 分页读取
+    from models import Bid
+    recent = Bid.get_recent(auction_id, Config.BID_HISTORY_DETAIL_SIZE)
+    
+    # 获取当前最高出价者信息
+    bidder = None
+    if auction['current_bidder_id']:
+        bidder = User.get_profile(auction['current_bidder_id'])
+    
+    result = format_auction_detail(auction, recent['bids'], bidder, get_viewer_id(), recent)
+    result['bid_history_cursor'] = recent['next_cursor']
     return jsonify(result), 200
 
+@auction_bp.route('/batch', methods=['GET'])
+def get_auctions_batch():
+    """批量获取拍卖详情（关注列表、仪表盘等同时展示多个拍卖的页面）
+    
+    ids 为逗号分隔的拍卖ID（最多 BATCH_DETAIL_MAX_IDS 个），bids 为每个拍卖返回的最近出价条数。
+    拍卖、图片、最近出价和当前最高出价者资料各一条查询，与拍卖数量无关；可见范围与拍卖详情相同。
+    """
+    try:
+        auction_ids = list(dict.fromkeys(int(value) for value in request.args.get('ids', '').split(',') if value.strip()))
+    except ValueError:
+        return jsonify({'error': 'ids 必须是逗号分隔的拍卖ID'}), 400
+    if not auction_ids:
+        return jsonify({'error': '请提供 ids'}), 400
+    if len(auction_ids) > Config.BATCH_DETAIL_MAX_IDS:
+        return jsonify({'error': f'一次最多获取 {Config.BATCH_DETAIL_MAX_IDS} 个拍卖'}), 400
+    limit = request.args.get('bids', Config.BATCH_DETAIL_BIDS, type=int)
+    limit = min(max(limit, 0), Config.BATCH_DETAIL_MAX_BIDS)
+    
+    from models import Bid
+    auctions = Auction.get_many(auction_ids)
+    bids = Bid.get_latest(list(auctions), limit)
+    bidders = User.get_profiles(auction['current_bidder_id'] for auction in auctions.values()
+                                if auction['current_bidder_id'])
+    viewer_id = get_viewer_id()
+    
+    result = []
+    for auction_id in auction_ids:
+        auction = auctions.get(auction_id)
+        if not auction:
+            continue
+        result.append(format_auction_detail(auction, bids[auction_id], bidders.get(auction['current_bidder_id']),
+                                            viewer_id, auction))
+    
+    return jsonify({
+        'auctions': result,
+        'missing': [auction_id for auction_id in auction_ids if auction_id not in auctions]
+    }), 200
+
 @auction_bp.route('/my/listings', methods=['GET'])
 @jwt_required()
 def get_my_auctions():
-    """获取我发布的拍卖"""
+    """获取我发布的拍卖（传入 limit 或 cursor 时使用游标分页）"""
     seller_id = get_jwt_identity()
     # 将字符串ID转换回整数用于数据库查询
     seller_id = int(seller_id)
-    auctions = Auction.get_by_seller(seller_id)
+    cursor = request.args.get('cursor', None)
+    limit = request.args.get('limit', None, type=int)
+    if cursor is not None and limit is None:
+        limit = 20
+    if limit is not None and (limit < 1 or limit > 100):
+        limit = 20
+    try:
+        auctions, next_cursor = Auction.get_by_seller(seller_id, limit, cursor)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    # 获取每个拍卖的竞拍者数量
-    from models import Bid
     result = []
     for auction in auctions:
-        bids = Bid.get_by_auction(auction['id'])
-        bidder_count = len(set(bid['bidder_id'] for bid in bids))
-        
         # 计算剩余时间
         end_time = datetime.fromisoformat(auction['end_time'].replace('Z', '+00:00'))
         now = datetime.now(end_time.tzinfo) if end_time.tzinfo else datetime.now()
@@ -244,9 +515,86 @@ def get_my_auctions():
             'end_time': auction['end_time'],
             'status': auction['status'],
             'images': auction['images'],
-            'bidder_count': bidder_count,
+            'thumbnail': auction['thumbnail'],
+            'bidder_count': auction['bidder_count'],
+            'bid_count': auction['bid_count'],
             'time_left': max(0, int(time_left)) if auction['status'] == 'active' else 0
         })
     
+    if limit is not None:
+        return jsonify({'auctions': result, 'next_cursor': next_cursor, 'has_more': next_cursor is not None}), 200
+    
     return jsonify({'auctions': result}), 200
 
+def format_stream_snapshot(auction, stats, bidder):
+    """实时推送连接建立时发送的完整状态"""
+    current_bidder = None
+    if bidder:
+        current_bidder = {'username': bidder['username'] if len(bidder['username']) > 1 else '***'}
+    return {
+        'auction_id': auction['id'],
+        'status': auction['status'],
+        'current_price': auction['current_price'],
+        'current_bidder': current_bidder,
+        'bid_count': stats['bid_count'],
+        'bidder_count': stats['bidder_count'],
+        'end_time': auction['end_time']
+    }
+
+def is_final_event(event):
+    """拍卖结束的状态事件之后关闭推送连接"""
+    return event['type'] == 'status' and event['data']['status'] != 'active'
+
+@auction_bp.route('/<int:auction_id>/stream', methods=['GET'])
+def stream_auction(auction_id):
+    """实时推送拍卖的出价和状态变化（Server-Sent Events）"""
+    auction = Auction.get_by_id(auction_id)
+    
+    if not auction:
+        return jsonify({'error': '拍卖不存在'}), 404
+    
+    try:
+        subscription = hub.subscribe(auction_id)
+    except SubscriberLimitExceeded:
+        response = jsonify({'error': '当前查看人数过多，请稍后重试'})
+        response.headers['Retry-After'] = str(Config.SSE_RETRY_MILLISECONDS // 1000)
+        return response, 503
+    
+    # 先订阅再补发，避免两者之间发布的事件丢失（重复的事件按序号跳过）
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    backlog = hub.replay(auction_id, last_event_id)
+    if backlog is None:
+        # 无法补发时发送当前完整状态
+        from models import Bid
+        stats = Bid.get_stats(auction_id)
+        bidder = None
+        if auction['current_bidder_id']:
+            bidder = User.get_profile(auction['current_bidder_id'])
+        backlog = [hub.snapshot(auction_id, format_stream_snapshot(auction, stats, bidder))]
+    
+    def generate():
+        try:
+            yield f"retry: {Config.SSE_RETRY_MILLISECONDS}\n\n"
+            last_seq = 0
+            for event in backlog:
+                last_seq = max(last_seq, event['seq'])
+                yield format_sse(event)
+            while not subscription.closed:
+                event = subscription.get(timeout=Config.SSE_HEARTBEAT_SECONDS)
+                if event is None:
+                    # 心跳注释行，防止连接被代理判定为空闲而断开
+                    yield ': heartbeat\n\n'
+                    continue
+                if event['seq'] <= last_seq:
+                    continue
+                last_seq = event['seq']
+                yield format_sse(event)
+                if is_final_event(event):
+                    break
+        finally:
+            hub.unsubscribe(subscription)
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # 关闭nginx对该响应的缓冲
+    })
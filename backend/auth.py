@@ -1,14 +1,31 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from models import User
+from passwords import HashingBusy
+from utils import get_client_ip, RateLimiter
+from config import Config
 import re
 from datetime import datetime
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
+# 按IP限流：登录只统计失败的尝试（成功登录不占用次数），注册统计全部尝试
+login_limiter = RateLimiter(Config.LOGIN_RATE_LIMIT, Config.LOGIN_RATE_WINDOW_SECONDS)
+register_limiter = RateLimiter(Config.LOGIN_RATE_LIMIT, Config.LOGIN_RATE_WINDOW_SECONDS)
+
+def too_many_requests(message, retry_after):
+    """返回429响应并附带Retry-After头"""
+    response = jsonify({'error': message})
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 429
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
     """用户注册"""
+    retry_after = register_limiter.hit(get_client_ip())
+    if retry_after:
+        return too_many_requests('尝试次数过多，请稍后再试', retry_after)
+    
     data = request.get_json()
     
     username = data.get('username', '').strip()
@@ -43,9 +60,13 @@ def register():
         return jsonify({'error': '邮箱已被注册'}), 400
     
     # 创建用户
-    user = User.create(username, email, password)
+    try:
+        user = User.create(username, email, password)
+    except HashingBusy:
+        return too_many_requests('服务器繁忙，请稍后再试', 1)
     if not user:
         return jsonify({'error': '注册失败，请重试'}), 500
+    User.cache_profile(user)
     
     # 生成token (JWT要求subject必须是字符串)
     access_token = create_access_token(identity=str(user['id']))
@@ -63,6 +84,11 @@ def register():
 @auth_bp.route('/login', methods=['POST'])
 def login():
     """用户登录"""
+    client_ip = get_client_ip()
+    retry_after = login_limiter.check(client_ip)
+    if retry_after:
+        return too_many_requests('登录尝试次数过多，请稍后再试', retry_after)
+    
     data = request.get_json()
     
     username_or_email = data.get('username', '').strip()
@@ -77,11 +103,17 @@ def login():
         user = User.get_by_email(username_or_email)
     
     if not user:
+        login_limiter.hit(client_ip)
         return jsonify({'error': '用户名/邮箱或密码错误'}), 401
     
     # 验证密码
-    if not User.verify_password(user, password):
-        return jsonify({'error': '用户名/邮箱或密码错误'}), 401
+    try:
+        if not User.verify_password(user, password):
+            login_limiter.hit(client_ip)
+            return jsonify({'error': '用户名/邮箱或密码错误'}), 401
+    except HashingBusy:
+        return too_many_requests('服务器繁忙，请稍后再试', 1)
+    User.cache_profile(user)
     
     # 生成token (JWT要求subject必须是字符串)
     access_token = create_access_token(identity=str(user['id']))
@@ -109,7 +141,7 @@ def get_current_user():
     """获取当前用户信息"""
     user_id = get_jwt_identity()
     # 将字符串ID转换回整数用于数据库查询
-    user = User.get_by_id(int(user_id))
+    user = User.get_profile(int(user_id))
     
     if not user:
         return jsonify({'error': '用户不存在'}), 404
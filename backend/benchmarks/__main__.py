@@ -0,0 +1,138 @@
+"""拍卖API基准测试套件
+
+写入合成数据后依次运行各压测场景，输出JSON报告（吞吐量及p50/p95/p99延迟），
+可用 --compare 与之前保存的报告对比，便于在版本之间比较。
+
+用法（在 backend 目录下）：
+    python -m benchmarks --users 50 --auctions 500 --bids 2000 --duration 10 --output report.json
+    python -m benchmarks --scenarios listing bid_storm --compare report.json
+    # 对运行中的服务压测（需与服务使用同一个 DATABASE_PATH，以便写入测试数据）
+    DATABASE_PATH=/path/to/auction.db python -m benchmarks --url http://127.0.0.1:3000
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+import tempfile
+import time
+from collections import Counter
+
+from benchmarks.scenarios import HTTP_SCENARIOS, HttpClient, TestClient, settlement_sweep
+from benchmarks.seed import seed_database
+from benchmarks.storage_profile import percentile
+from config import Config
+
+ALL_SCENARIOS = [*HTTP_SCENARIOS, 'settlement_sweep']
+
+
+def summarize(results, duration):
+    """汇总一个场景的请求结果（只统计2xx请求的延迟）"""
+    statuses = Counter(status for status, _ in results)
+    latencies = [elapsed for status, elapsed in results if 200 <= status < 300]
+    return {
+        'requests': len(results),
+        'ok': len(latencies),
+        'throughput_per_sec': round(len(latencies) / duration, 1),
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+    }
+
+
+def summarize_sweep(results):
+    settled = sum(count for count, _ in results)
+    seconds = sum(elapsed for _, elapsed in results)
+    return {
+        'rounds': len(results),
+        'settled': settled,
+        'settled_per_sec': round(settled / seconds, 1) if seconds else 0.0,
+        'p50_ms': percentile([elapsed for _, elapsed in results], 50),
+        'p99_ms': percentile([elapsed for _, elapsed in results], 99),
+    }
+
+
+def compare(report, baseline):
+    """与之前的报告对比吞吐量和p99的变化百分比"""
+    diff = {}
+    for name, current in report['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if not previous:
+            continue
+        diff[name] = {}
+        for field in ('throughput_per_sec', 'settled_per_sec', 'p99_ms'):
+            if previous.get(field) and field in current:
+                diff[name][field] = f'{(current[field] - previous[field]) / previous[field] * 100:+.1f}%'
+    return diff
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='拍卖API基准测试')
+    parser.add_argument('--users', type=int, default=50, help='用户数量')
+    parser.add_argument('--auctions', type=int, default=500, help='拍卖数量')
+    parser.add_argument('--bids', type=int, default=2000, help='出价数量')
+    parser.add_argument('--image-side', type=int, default=0, help='测试图片边长（像素），0表示不上传图片')
+    parser.add_argument('--images-per-auction', type=int, default=1, help='每个拍卖的图片数量')
+    parser.add_argument('--scenarios', nargs='+', default=ALL_SCENARIOS, choices=ALL_SCENARIOS)
+    parser.add_argument('--duration', type=float, default=10, help='每个场景的时长（秒）')
+    parser.add_argument('--concurrency', type=int, default=8, help='每个场景的并发线程数')
+    parser.add_argument('--sweep-batch', type=int, default=500, help='每轮结算的拍卖数量')
+    parser.add_argument('--sweep-rounds', type=int, default=5, help='结算轮数')
+    parser.add_argument('--url', help='被测服务地址；不指定时通过Flask测试客户端在进程内压测')
+    parser.add_argument('--output', help='报告保存路径')
+    parser.add_argument('--compare', help='与之前保存的报告对比')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    if not args.url and not os.environ.get('DATABASE_PATH'):
+        workdir = tempfile.mkdtemp(prefix='bench-suite-')
+        Config.DATABASE_PATH = os.path.join(workdir, 'auction.db')
+        Config.UPLOAD_FOLDER = os.path.join(workdir, 'uploads')
+    Config.LOGIN_RATE_LIMIT = 10 ** 9
+    from app import create_app
+    app = create_app()
+
+    context = seed_database(app, args.users, args.auctions, args.bids, args.image_side, args.images_per_auction)
+    client = HttpClient(args.url) if args.url else TestClient(app)
+
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'mode': 'http' if args.url else 'in-process',
+            'storage_profile': Config.DB_STORAGE_PROFILE,
+            'duration': args.duration,
+            'concurrency': args.concurrency,
+        },
+        'seed': context['stats'],
+        'scenarios': {},
+    }
+    for name in args.scenarios:
+        if name == 'settlement_sweep':
+            results = settlement_sweep(app, context, args.sweep_batch, args.sweep_rounds)
+            report['scenarios'][name] = summarize_sweep(results)
+        else:
+            results = HTTP_SCENARIOS[name](client, context, args.duration, args.concurrency)
+            report['scenarios'][name] = summarize(results, args.duration)
+
+    if args.compare:
+        with open(args.compare) as f:
+            report['compare'] = compare(report, json.load(f))
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""登录高峰对出价延迟的影响
+
+先只运行并发出价得到基准延迟，再在出价的同时发起大量登录请求，
+对比两轮的出价延迟百分位数以及登录请求的状态码分布，输出JSON结果。
+登录请求使用随机的 X-Forwarded-For，测试的是密码哈希线程池的准入控制而不是按IP限流。
+压测客户端与服务端在同一进程内，被拒绝的登录请求会立即重试并占用GIL，
+因此出价吞吐量会随登录线程数下降，应主要对比延迟百分位数。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.login_storm --duration 10 --writers 4 --logins 32
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from werkzeug.security import generate_password_hash
+
+from benchmarks.storage_profile import percentile, seed
+from config import Config
+
+PASSWORD = 'storm12345'
+
+
+def add_login_user(app):
+    """创建用于登录压测的用户（真实的密码哈希）"""
+    from database import get_db, release_db
+    with app.app_context():
+        conn = get_db()
+        conn.execute('INSERT INTO users (username, email, password) VALUES (?, ?, ?)',
+                     ('storm', 'storm@bench.local', generate_password_hash(PASSWORD)))
+        conn.commit()
+        release_db(conn)
+
+
+def run_phase(app, auction_ids, tokens, duration, logins):
+    """出价线程与登录线程同时运行，返回出价延迟和登录状态码统计"""
+    amounts = itertools.count(int(time.time() * 1000))
+    stop = threading.Event()
+    bid_latencies = []
+    login_statuses = Counter()
+    lock = threading.Lock()
+
+    def bidder(token):
+        client = app.test_client()
+        headers = {'Authorization': f'Bearer {token}'}
+        while not stop.is_set():
+            auction_id = random.choice(auction_ids)
+            start = time.perf_counter()
+            response = client.post(f'/api/auctions/{auction_id}/bids',
+                                   json={'amount': next(amounts)}, headers=headers)
+            elapsed = time.perf_counter() - start
+            if response.status_code == 201:
+                with lock:
+                    bid_latencies.append(elapsed)
+
+    def login():
+        client = app.test_client()
+        while not stop.is_set():
+            headers = {'X-Forwarded-For': f'10.{random.randint(0, 255)}.{random.randint(0, 255)}.1'}
+            response = client.post('/api/auth/login',
+                                   json={'username': 'storm', 'password': PASSWORD}, headers=headers)
+            with lock:
+                login_statuses[response.status_code] += 1
+
+    threads = [threading.Thread(target=bidder, args=(token,)) for token in tokens]
+    threads += [threading.Thread(target=login) for _ in range(logins)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    return {
+        'bids_per_sec': round(len(bid_latencies) / duration, 1),
+        'bid_p50_ms': percentile(bid_latencies, 50),
+        'bid_p95_ms': percentile(bid_latencies, 95),
+        'bid_p99_ms': percentile(bid_latencies, 99),
+        'logins_per_sec': round(login_statuses[200] / duration, 1),
+        'login_statuses': {str(status): count for status, count in sorted(login_statuses.items())},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='测试登录高峰期间的出价延迟')
+    parser.add_argument('--duration', type=float, default=10, help='每轮压测时长（秒）')
+    parser.add_argument('--writers', type=int, default=4, help='并发出价线程数')
+    parser.add_argument('--logins', type=int, default=32, help='并发登录线程数')
+    parser.add_argument('--auctions', type=int, default=50, help='预置拍卖数量')
+    parser.add_argument('--executor', choices=['thread', 'process'], default=Config.PASSWORD_HASH_EXECUTOR,
+                        help='密码哈希执行方式')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    Config.PASSWORD_HASH_EXECUTOR = args.executor
+    Config.LOGIN_RATE_LIMIT = 10 ** 9
+    Config.DATABASE_PATH = os.path.join(tempfile.mkdtemp(prefix='bench-login-'), 'auction.db')
+    from app import create_app
+    app = create_app()
+    auction_ids, tokens = seed(app, args.auctions, args.writers)
+    add_login_user(app)
+
+    results = {
+        'executor': args.executor,
+        'baseline': run_phase(app, auction_ids, tokens, args.duration, 0),
+        'login_storm': run_phase(app, auction_ids, tokens, args.duration, args.logins),
+    }
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
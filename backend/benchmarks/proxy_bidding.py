@@ -0,0 +1,167 @@
+"""代理出价（自动出价）基准测试
+
+对同一个拍卖，N 个竞拍者依次登记随机的最高价（低于当时价格的登记被拒绝，也计入请求），
+另一个竞拍者再不断手动出价，
+每个请求直接调用 Bid.place_proxy / Bid.place（不经过HTTP）。
+统计每个请求写入的出价行数、执行的SQL语句数和耗时，并与逐次加价的代理竞价
+（每个代理轮流加一个最低加价幅度，直到只剩一个代理能出价）需要写入的出价行数对比，输出JSON。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.proxy_bidding --proxies 2 10 50 100 --manual-bids 20
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.storage_profile import percentile
+from config import Config
+
+INCREMENT = 1
+
+
+def query_count():
+    """当前进程累计执行的SQL语句数"""
+    import metrics
+    return sum(value for _, _, value in metrics.DB_QUERIES.samples())
+
+
+def bid_rows(auction_id):
+    from database import get_db, release_db
+    conn = get_db()
+    count = conn.execute('SELECT COUNT(*) FROM bids WHERE auction_id = ?', (auction_id,)).fetchone()[0]
+    release_db(conn)
+    return count
+
+
+def escalate(state, proxies):
+    """模拟逐次加价的代理竞价，更新 state 并返回需要写入的出价行数"""
+    rows = 0
+    while True:
+        challengers = [(max_amount, bidder_id) for bidder_id, max_amount in proxies.items()
+                       if bidder_id != state['leader'] and max_amount >= state['price'] + INCREMENT]
+        if not challengers:
+            return rows
+        # 按登记顺序轮流出价：每次由一个未领先的代理加一个最低加价幅度
+        _, bidder_id = min(challengers, key=lambda item: list(proxies).index(item[1]))
+        state['price'] += INCREMENT
+        state['leader'] = bidder_id
+        rows += 1
+
+
+def create_bidders(app, count, prefix):
+    """直接写入用户（跳过密码哈希），返回用户ID"""
+    from database import get_db, release_db
+    with app.app_context():
+        conn = get_db()
+        conn.executemany('INSERT INTO users (username, email, password) VALUES (?, ?, ?)',
+                         [(f'{prefix}{i}', f'{prefix}{i}@bench.local', '-') for i in range(count)])
+        conn.commit()
+        rows = conn.execute('SELECT id FROM users WHERE username LIKE ? ORDER BY id', (f'{prefix}%',)).fetchall()
+        release_db(conn)
+    return [row['id'] for row in rows]
+
+
+def run_war(app, seller_id, proxies, manual_bids):
+    """进行一场 proxies 个代理的竞价，返回每个请求的统计"""
+    from bid import check_bid, check_proxy
+    from models import Auction, Bid
+
+    bidder_ids = create_bidders(app, proxies + 1, f'proxy{proxies}_')
+    manual_id = bidder_ids.pop()
+    end_time = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%dT%H:%M:%S')
+    maxima = random.sample(range(10, 10 + proxies * 20), proxies)
+    registered = {}
+    state = {'price': 1, 'leader': None}
+    requests = []
+    with app.app_context():
+        auction_id = Auction.create(f'Proxy war {proxies}', 'proxy bidding benchmark', 1, end_time,
+                                    seller_id, [], INCREMENT)['id']
+        events = [('proxy', bidder_id, max_amount) for bidder_id, max_amount in zip(bidder_ids, maxima)]
+        for _ in range(manual_bids):
+            events.append(('manual', manual_id, None))
+        for kind, bidder_id, amount in events:
+            rows_before, queries_before = bid_rows(auction_id), query_count()
+            started = time.perf_counter()
+            if kind == 'proxy':
+                bids, error = Bid.place_proxy(auction_id, bidder_id, amount, check_proxy)
+                escalation_rows = 0
+                if not error:
+                    registered[bidder_id] = amount
+                    escalation_rows = escalate(dict(state), registered)
+                if bids:
+                    state['price'], state['leader'] = bids[-1]['amount'], bids[-1]['bidder_id']
+            else:
+                auction = Auction.get_by_id(auction_id)
+                amount = auction['current_price'] + INCREMENT * random.randint(1, 5)
+                if check_bid(auction, bidder_id, amount):
+                    continue
+                bid = Bid.place(auction_id, bidder_id, amount)
+                if not bid:
+                    continue
+                leader = (bid['proxy_bids'] or [bid])[-1]
+                # 逐次加价需要写入的出价行数：从手动出价后开始，代理之间逐个加价
+                naive = {'price': amount, 'leader': bidder_id}
+                escalation_rows = 1 + escalate(naive, registered)
+                state['price'], state['leader'] = leader['amount'], leader['bidder_id']
+            seconds = time.perf_counter() - started
+            requests.append({
+                'kind': kind,
+                'rejected': kind == 'proxy' and error is not None,
+                'bid_rows': bid_rows(auction_id) - rows_before,
+                'queries': query_count() - queries_before - 2,  # 减去统计出价行数的两条查询
+                'seconds': seconds,
+                'escalation_bid_rows': escalation_rows,
+            })
+    return requests
+
+
+def summarize(requests):
+    rows = [request['bid_rows'] for request in requests]
+    queries = [request['queries'] for request in requests]
+    escalation = [request['escalation_bid_rows'] for request in requests]
+    return {
+        'requests': len(requests),
+        'rejected': sum(request.get('rejected', False) for request in requests),
+        'bid_rows_max': max(rows),
+        'bid_rows_mean': round(sum(rows) / len(rows), 2),
+        'queries_max': max(queries),
+        'queries_mean': round(sum(queries) / len(queries), 2),
+        'p50_ms': percentile([request['seconds'] for request in requests], 50),
+        'p95_ms': percentile([request['seconds'] for request in requests], 95),
+        'escalation_bid_rows_max': max(escalation),
+        'escalation_bid_rows_mean': round(sum(escalation) / len(escalation), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='代理出价基准测试')
+    parser.add_argument('--proxies', type=int, nargs='+', default=[2, 10, 50, 100], help='每场竞价的代理数量')
+    parser.add_argument('--manual-bids', type=int, default=20, help='登记代理后的手动出价次数')
+    parser.add_argument('--seed', type=int, default=1, help='随机数种子')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    random.seed(args.seed)
+    workdir = tempfile.mkdtemp(prefix='bench-proxy-')
+    Config.DATABASE_PATH = os.path.join(workdir, 'auction.db')
+    from app import create_app
+    app = create_app()
+    seller_id = create_bidders(app, 1, 'seller')[0]
+
+    report = {'database': Config.DATABASE_PATH, 'wars': {}}
+    for proxies in args.proxies:
+        requests = run_war(app, seller_id, proxies, args.manual_bids)
+        report['wars'][proxies] = {
+            'register': summarize([request for request in requests if request['kind'] == 'proxy']),
+            'manual_bid': summarize([request for request in requests if request['kind'] == 'manual']),
+        }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""压测场景
+
+每个场景在 duration 秒内用 concurrency 个线程反复发起请求，
+返回每个请求的 (状态码, 耗时秒数)。请求通过 TestClient（进程内）或 HttpClient（真实HTTP）发送。
+"""
+import http.client
+import itertools
+import json
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+from benchmarks.seed import PASSWORD
+
+
+class TestClient:
+    """通过Flask测试客户端在进程内发送请求"""
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def request(self, method, path, json_body=None, headers=None):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.open(path, method=method, json=json_body, headers=headers)
+        response.close()
+        return response.status_code
+
+
+class HttpClient:
+    """通过HTTP向运行中的服务发送请求（每个线程复用一个连接）"""
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self._local = threading.local()
+
+    def request(self, method, path, json_body=None, headers=None):
+        headers = dict(headers or {})
+        body = None
+        if json_body is not None:
+            body = json.dumps(json_body)
+            headers['Content-Type'] = 'application/json'
+        for attempt in range(2):
+            conn = getattr(self._local, 'conn', None)
+            if conn is None:
+                conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                if response.getheader('Connection', '').lower() == 'close':
+                    conn.close()
+                    self._local.conn = None
+                return response.status
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    return 0
+        return 0
+
+
+def run_workers(concurrency, duration, make_request):
+    """多线程反复调用 make_request()，返回 [(状态码, 耗时)]"""
+    stop = threading.Event()
+    results = []
+    lock = threading.Lock()
+
+    def worker():
+        local = []
+        while not stop.is_set():
+            start = time.perf_counter()
+            status = make_request()
+            local.append((status, time.perf_counter() - start))
+        with lock:
+            results.extend(local)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def listing(client, context, duration, concurrency):
+    """分页浏览拍卖列表（页码分页和游标分页各一半）"""
+    pages = max(1, len(context['auction_ids']) // 20)
+
+    def make_request():
+        if random.random() < 0.5:
+            return client.request('GET', f'/api/auctions?page={random.randint(1, pages)}&per_page=20')
+        return client.request('GET', '/api/auctions?cursor=&per_page=20')
+
+    return run_workers(concurrency, duration, make_request)
+
+
+def detail_polling(client, context, duration, concurrency):
+    """轮询拍卖详情"""
+    auction_ids = context['auction_ids']
+    return run_workers(concurrency, duration,
+                       lambda: client.request('GET', f'/api/auctions/{random.choice(auction_ids)}'))
+
+
+def bid_storm(client, context, duration, concurrency):
+    """所有线程对同一个热门拍卖出价（400/409 为出价被并发抢先，属于预期结果）"""
+    auction_id = context['auction_ids'][0]
+    tokens = context['tokens'][1:] or context['tokens']  # 第一个用户是该拍卖的发布者
+    amounts = itertools.count(int(time.time()))
+
+    def make_request():
+        headers = {'Authorization': f'Bearer {random.choice(tokens)}'}
+        return client.request('POST', f'/api/auctions/{auction_id}/bids', {'amount': next(amounts)}, headers)
+
+    return run_workers(concurrency, duration, make_request)
+
+
+def login_burst(client, context, duration, concurrency):
+    """大量登录请求（使用随机IP，测试密码哈希线程池的准入控制）"""
+    users = len(context['user_ids'])
+
+    def make_request():
+        headers = {'X-Forwarded-For': f'10.{random.randint(0, 255)}.{random.randint(0, 255)}.{random.randint(1, 254)}'}
+        body = {'username': f'user{random.randrange(users)}', 'password': PASSWORD}
+        return client.request('POST', '/api/auth/login', body, headers)
+
+    return run_workers(concurrency, duration, make_request)
+
+
+def settlement_sweep(app, context, batch_size, rounds):
+    """批量结算已到期的拍卖（直接调用模型，不经过HTTP），返回每轮的 (结算数量, 耗时)"""
+    from database import get_db, release_db
+    from models import Auction, Bid
+
+    results = []
+    user_ids = context['user_ids']
+    with app.app_context():
+        for _ in range(rounds):
+            # 先以未来时间创建并出价，再把结束时间改到过去，模拟一批同时到期的拍卖
+            end_time = time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(time.time() + 3600))
+            auction_ids = []
+            for i in range(batch_size):
+                auction = Auction.create(f'Sweep {i}', 'settlement sweep', 1, end_time, user_ids[0], [], 1)
+                if i % 2 == 0 and len(user_ids) > 1:
+                    Bid.place(auction['id'], user_ids[1], 2)
+                auction_ids.append(auction['id'])
+            conn = get_db()
+            placeholders = ','.join('?' * len(auction_ids))
+            conn.execute(f'UPDATE auctions SET end_time = ? WHERE id IN ({placeholders})',
+                         [time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(time.time() - 1)), *auction_ids])
+            conn.commit()
+            release_db(conn)
+            start = time.perf_counter()
+            settled = Auction.settle(auction_ids)
+            results.append((len(settled), time.perf_counter() - start))
+    return results
+
+
+HTTP_SCENARIOS = {
+    'listing': listing,
+    'detail_polling': detail_polling,
+    'bid_storm': bid_storm,
+    'login_burst': login_burst,
+}
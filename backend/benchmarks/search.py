@@ -0,0 +1,137 @@
+"""全文搜索基准测试
+
+批量写入合成拍卖（经过 auctions_fts 同步触发器），再通过Flask测试客户端
+反复请求 /api/auctions/search，输出每类查询的延迟百分位数和命中数量（JSON）。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.search --auctions 1000000 --iterations 50
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+
+from benchmarks.storage_profile import percentile
+from config import Config
+
+BRANDS = ['Apple', 'Sony', 'Nikon', 'Canon', 'Lenovo', 'Xiaomi', 'Huawei', 'Leica', 'Rolex', 'Omega']
+ITEMS = ['iPhone', 'camera', 'laptop', 'watch', 'lamp', 'guitar', 'bicycle', 'sofa', 'painting', 'vase',
+         '手机', '相机', '笔记本电脑', '手表', '台灯', '吉他', '自行车', '沙发', '油画', '花瓶']
+ADJECTIVES = ['vintage', 'brand new', 'used', 'rare', 'limited edition', 'refurbished',
+              '全新', '二手', '九成新', '限量版', '复古', '收藏级']
+FILLER = ['原装配件齐全', '包装完好', 'works perfectly', 'minor scratches', '支持验货', 'ships worldwide',
+          '当面交易', 'original receipt included', '功能正常', 'collector item']
+
+# (名称, 查询参数)
+QUERIES = [
+    ('common_term', {'q': 'vintage'}),
+    ('rare_term', {'q': 'Leica guitar'}),
+    ('chinese_term', {'q': '笔记本电脑'}),
+    ('two_terms', {'q': 'Rolex watch'}),
+    ('with_filters', {'q': 'camera', 'status': 'active', 'min_price': 100, 'max_price': 500}),
+    ('short_term_scan', {'q': '手机'}),
+    ('no_match', {'q': 'zeppelin'}),
+]
+
+
+def make_auction(end_time, seller_id):
+    title = f'{random.choice(ADJECTIVES)} {random.choice(BRANDS)} {random.choice(ITEMS)}'
+    description = '，'.join(random.sample(FILLER, 4)) + f' {random.choice(ITEMS)} {random.randint(1, 99999)}'
+    price = round(random.uniform(1, 1000), 2)
+    return (title, description, price, price, 1, seller_id, end_time, random.choice(['active', 'active', 'ended']))
+
+
+def seed(app, count, batch_size=10000):
+    """批量写入 count 个拍卖（直接执行SQL，索引由触发器同步），返回耗时"""
+    from database import get_db, release_db
+    from models import User
+
+    started = time.perf_counter()
+    end_time = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%dT%H:%M:%S')
+    with app.app_context():
+        seller = User.create('search_seller', 'search_seller@bench.local', 'bench12345')
+        conn = get_db()
+        for offset in range(0, count, batch_size):
+            rows = [make_auction(end_time, seller['id']) for _ in range(min(batch_size, count - offset))]
+            conn.executemany('''
+                INSERT INTO auctions (title, description, starting_price, current_price, min_increment,
+                                      seller_id, end_time, status)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+            conn.commit()
+        conn.execute("INSERT INTO auctions_fts (auctions_fts) VALUES ('optimize')")
+        conn.commit()
+        # 把WAL中的数据写回数据库文件，避免之后的读请求都要查找很大的WAL
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        release_db(conn)
+    return time.perf_counter() - started
+
+
+def run_query(client, params, iterations):
+    """重复请求第一页并翻到第二页，返回统计结果"""
+    latencies = []
+    second_page = []
+    hits = 0
+    for _ in range(iterations):
+        start = time.perf_counter()
+        response = client.get('/api/auctions/search?' + urlencode({**params, 'limit': 20}))
+        latencies.append(time.perf_counter() - start)
+        body = response.get_json()
+        hits = len(body['auctions'])
+        cursor = body['pagination']['next_cursor']
+        if cursor:
+            start = time.perf_counter()
+            client.get('/api/auctions/search?' + urlencode({**params, 'limit': 20, 'cursor': cursor}))
+            second_page.append(time.perf_counter() - start)
+    return {
+        'first_page_hits': hits,
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'second_page_p50_ms': percentile(second_page, 50) if second_page else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='全文搜索基准测试')
+    parser.add_argument('--auctions', type=int, default=1000000, help='拍卖数量')
+    parser.add_argument('--iterations', type=int, default=50, help='每类查询的请求次数')
+    parser.add_argument('--database', help='复用已写入数据的数据库文件（不再写入）')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    seed_seconds = None
+    if args.database:
+        Config.DATABASE_PATH = args.database
+    else:
+        workdir = tempfile.mkdtemp(prefix='bench-search-')
+        Config.DATABASE_PATH = os.path.join(workdir, 'auction.db')
+    from app import create_app
+    app = create_app()
+    if not args.database:
+        seed_seconds = round(seed(app, args.auctions), 1)
+
+    with app.app_context():
+        from database import get_db, release_db
+        conn = get_db()
+        auctions = conn.execute('SELECT COUNT(*) FROM auctions').fetchone()[0]
+        release_db(conn)
+
+    client = app.test_client()
+    report = {
+        'database': Config.DATABASE_PATH,
+        'auctions': auctions,
+        'seed_seconds': seed_seconds,
+        'database_mb': round(os.path.getsize(Config.DATABASE_PATH) / 1024 / 1024, 1),
+        'queries': {name: run_query(client, params, args.iterations) for name, params in QUERIES},
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
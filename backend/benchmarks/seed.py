@@ -0,0 +1,80 @@
+"""通过 models.User/Auction/Bid 写入合成测试数据"""
+import base64
+import io
+import random
+import time
+from datetime import datetime, timedelta
+
+from flask_jwt_extended import create_access_token
+
+PASSWORD = 'bench12345'
+
+
+def make_image(side):
+    """生成边长为 side 像素的随机噪点JPEG（data URL）；未安装Pillow时返回None"""
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    image = Image.effect_noise((side, side), 64).convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=85)
+    return 'data:image/jpeg;base64,' + base64.b64encode(buffer.getvalue()).decode()
+
+
+def seed_database(app, users=50, auctions=500, bids=2000, image_side=0, images_per_auction=1):
+    """写入用户、拍卖和出价，返回测试上下文
+
+    用户名为 user0..userN，密码均为 PASSWORD；返回的 tokens 可直接用于需要登录的接口。
+    """
+    from images import save_image
+    from models import Auction, Bid, User
+
+    started = time.perf_counter()
+    end_time = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%dT%H:%M:%S')
+    with app.app_context():
+        user_ids = []
+        for i in range(users):
+            user = User.create(f'user{i}', f'user{i}@bench.local', PASSWORD)
+            user_ids.append(user['id'])
+
+        image_keys = []
+        if image_side:
+            # 每张图片内容不同，避免内容寻址存储去重
+            data_urls = [make_image(image_side) for _ in range(max(1, images_per_auction) * 4)]
+            image_keys = [save_image(data_url) for data_url in data_urls if data_url]
+
+        auction_ids = []
+        sellers = {}
+        for i in range(auctions):
+            keys = random.sample(image_keys, min(images_per_auction, len(image_keys))) if image_keys else []
+            auction = Auction.create(f'Auction {i}', 'benchmark item ' * 10, 1, end_time,
+                                     user_ids[i % len(user_ids)], keys, 1)
+            auction_ids.append(auction['id'])
+            sellers[auction['id']] = auction['seller_id']
+
+        prices = {auction_id: 1 for auction_id in auction_ids}
+        placed = 0
+        for _ in range(bids):
+            auction_id = random.choice(auction_ids)
+            bidder_id = random.choice(user_ids)
+            if bidder_id == sellers[auction_id]:
+                continue
+            prices[auction_id] += 1
+            if Bid.place(auction_id, bidder_id, prices[auction_id]):
+                placed += 1
+
+        tokens = [create_access_token(identity=str(user_id)) for user_id in user_ids]
+
+    return {
+        'user_ids': user_ids,
+        'auction_ids': auction_ids,
+        'tokens': tokens,
+        'stats': {
+            'users': len(user_ids),
+            'auctions': len(auction_ids),
+            'bids': placed,
+            'images': len(image_keys),
+            'seconds': round(time.perf_counter() - started, 2),
+        },
+    }
@@ -0,0 +1,176 @@
+"""同步（WSGI）与异步（ASGI）服务模式对比测试
+
+分别以Flask多线程服务器（python app.py 的方式）和 uvicorn asgi:app 启动服务，
+先建立若干条保持打开的SSE连接，再并发请求拍卖列表和详情，
+输出每种模式的吞吐量、延迟百分位数以及服务进程的线程数（JSON）。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.serving_modes --duration 10 --clients 16 --streams 200
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.storage_profile import percentile, seed
+from config import Config
+
+HOST = '127.0.0.1'
+
+SERVER_COMMANDS = {
+    'sync': lambda port: [sys.executable, '-c',
+                          f"from app import create_app; create_app().run(host='{HOST}', port={port}, threaded=True)"],
+    'async': lambda port: [sys.executable, '-m', 'uvicorn', 'asgi:app',
+                           '--host', HOST, '--port', str(port), '--log-level', 'warning'],
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection(HOST, port, timeout=1)
+            conn.request('GET', '/')
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'server on port {port} did not start')
+
+
+def thread_count(pid):
+    """服务进程当前的线程数（仅Linux）"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('Threads:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def open_stream(port, auction_id, ready, stop):
+    """建立一条SSE连接并保持打开，直到压测结束"""
+    try:
+        conn = http.client.HTTPConnection(HOST, port, timeout=60)
+        conn.request('GET', f'/api/auctions/{auction_id}/stream')
+        response = conn.getresponse()
+        response.fp.readline()
+    except OSError:
+        return
+    finally:
+        ready.release()
+    stop.wait()
+    conn.close()
+
+
+def run_mode(mode, env, auction_ids, duration, clients, streams):
+    """启动指定模式的服务并压测，返回统计结果"""
+    port = free_port()
+    server = subprocess.Popen(SERVER_COMMANDS[mode](port), env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_ready(port)
+        stop = threading.Event()
+        ready = threading.Semaphore(0)
+        stream_threads = [threading.Thread(target=open_stream, args=(port, random.choice(auction_ids), ready, stop))
+                          for _ in range(streams)]
+        for thread in stream_threads:
+            thread.start()
+        for _ in range(streams):
+            ready.acquire()
+
+        latencies = []
+        errors = [0]
+        lock = threading.Lock()
+        load_stop = threading.Event()
+
+        def client():
+            while not load_stop.is_set():
+                if random.random() < 0.5:
+                    path = '/api/auctions?per_page=20'
+                else:
+                    path = f'/api/auctions/{random.choice(auction_ids)}'
+                start = time.perf_counter()
+                try:
+                    conn = http.client.HTTPConnection(HOST, port, timeout=30)
+                    conn.request('GET', path)
+                    response = conn.getresponse()
+                    response.read()
+                    conn.close()
+                    ok = response.status == 200
+                except OSError:
+                    ok = False
+                elapsed = time.perf_counter() - start
+                with lock:
+                    if ok:
+                        latencies.append(elapsed)
+                    else:
+                        errors[0] += 1
+
+        client_threads = [threading.Thread(target=client) for _ in range(clients)]
+        for thread in client_threads:
+            thread.start()
+        time.sleep(duration / 2)
+        server_threads = thread_count(server.pid)
+        time.sleep(duration / 2)
+        load_stop.set()
+        for thread in client_threads:
+            thread.join()
+        stop.set()
+        for thread in stream_threads:
+            thread.join()
+    finally:
+        server.terminate()
+        server.wait()
+
+    return {
+        'requests_per_sec': round(len(latencies) / duration, 1),
+        'p50_ms': percentile(latencies, 50),
+        'p99_ms': percentile(latencies, 99),
+        'errors': errors[0],
+        'open_streams': streams,
+        'server_threads': server_threads,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='对比同步与异步服务模式')
+    parser.add_argument('--duration', type=float, default=10, help='每轮压测时长（秒）')
+    parser.add_argument('--clients', type=int, default=16, help='并发请求线程数')
+    parser.add_argument('--streams', type=int, default=200, help='保持打开的SSE连接数')
+    parser.add_argument('--auctions', type=int, default=200, help='预置拍卖数量')
+    parser.add_argument('--modes', nargs='+', default=['sync', 'async'], choices=sorted(SERVER_COMMANDS))
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    workdir = tempfile.mkdtemp(prefix='bench-serving-')
+    Config.DATABASE_PATH = os.path.join(workdir, 'auction.db')
+    from app import create_app
+    auction_ids, _ = seed(create_app(), args.auctions, 1)
+
+    env = dict(os.environ, DATABASE_PATH=Config.DATABASE_PATH, UPLOAD_FOLDER=os.path.join(workdir, 'uploads'),
+               SSE_MAX_SUBSCRIBERS_PER_AUCTION=str(max(args.streams, Config.SSE_MAX_SUBSCRIBERS_PER_AUCTION)))
+    results = {}
+    for mode in args.modes:
+        results[mode] = run_mode(mode, env, auction_ids, args.duration, args.clients, args.streams)
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""存储配置方案对比测试
+
+在并发出价写入的同时压测 GET /api/auctions 的读吞吐，
+分别使用 default（回滚日志）和 wal 两种存储方案，输出JSON结果。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.storage_profile --duration 10 --readers 4 --writers 4
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask_jwt_extended import create_access_token
+
+from config import Config
+
+
+def percentile(values, pct):
+    """计算百分位数（毫秒）"""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return round(values[index] * 1000, 2)
+
+
+def seed(app, auctions, bidders):
+    """写入测试数据，返回拍卖ID列表和出价者token"""
+    from database import get_db, release_db
+    end_time = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%dT%H:%M:%S')
+    with app.app_context():
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute('INSERT INTO users (username, email, password) VALUES (?, ?, ?)',
+                       ('seller', 'seller@bench.local', 'x'))
+        seller_id = cursor.lastrowid
+        bidder_ids = []
+        for i in range(bidders):
+            cursor.execute('INSERT INTO users (username, email, password) VALUES (?, ?, ?)',
+                           (f'bidder{i}', f'bidder{i}@bench.local', 'x'))
+            bidder_ids.append(cursor.lastrowid)
+        auction_ids = []
+        for i in range(auctions):
+            cursor.execute('''
+                INSERT INTO auctions (title, description, starting_price, current_price,
+                                      seller_id, end_time, images, min_increment)
+                VALUES (?, ?, 1, 1, ?, ?, '[]', 1)
+            ''', (f'Auction {i}', 'benchmark item ' * 10, seller_id, end_time))
+            auction_ids.append(cursor.lastrowid)
+        conn.commit()
+        release_db(conn)
+        tokens = [create_access_token(identity=str(bidder_id)) for bidder_id in bidder_ids]
+    return auction_ids, tokens
+
+
+def run_profile(profile, duration, readers, writers, auctions):
+    """在指定存储方案下运行一轮读写混合压测"""
+    from app import create_app
+
+    workdir = tempfile.mkdtemp(prefix=f'bench-{profile}-')
+    Config.DATABASE_PATH = os.path.join(workdir, 'auction.db')
+    Config.DB_STORAGE_PROFILE = profile
+    app = create_app()
+    auction_ids, tokens = seed(app, auctions, writers)
+
+    amounts = itertools.count(10, 10)
+    stop = threading.Event()
+    read_latencies, write_latencies = [], []
+    counters = {'write_ok': 0, 'write_rejected': 0, 'write_errors': 0, 'read_errors': 0}
+    lock = threading.Lock()
+
+    def reader():
+        client = app.test_client()
+        while not stop.is_set():
+            start = time.perf_counter()
+            response = client.get('/api/auctions?per_page=20')
+            elapsed = time.perf_counter() - start
+            with lock:
+                if response.status_code == 200:
+                    read_latencies.append(elapsed)
+                else:
+                    counters['read_errors'] += 1
+
+    def writer(token):
+        client = app.test_client()
+        headers = {'Authorization': f'Bearer {token}'}
+        while not stop.is_set():
+            auction_id = random.choice(auction_ids)
+            start = time.perf_counter()
+            response = client.post(f'/api/auctions/{auction_id}/bids',
+                                   json={'amount': next(amounts)}, headers=headers)
+            elapsed = time.perf_counter() - start
+            with lock:
+                if response.status_code == 201:
+                    counters['write_ok'] += 1
+                    write_latencies.append(elapsed)
+                elif response.status_code < 500:
+                    counters['write_rejected'] += 1
+                else:
+                    counters['write_errors'] += 1
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer, args=(token,)) for token in tokens]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    return {
+        'reads_per_sec': round(len(read_latencies) / duration, 1),
+        'read_p50_ms': percentile(read_latencies, 50),
+        'read_p99_ms': percentile(read_latencies, 99),
+        'read_mean_ms': round(statistics.mean(read_latencies) * 1000, 2) if read_latencies else 0.0,
+        'writes_per_sec': round(counters['write_ok'] / duration, 1),
+        'write_p99_ms': percentile(write_latencies, 99),
+        **counters,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='对比不同存储方案下的读写并发性能')
+    parser.add_argument('--duration', type=float, default=10, help='每轮压测时长（秒）')
+    parser.add_argument('--readers', type=int, default=4, help='并发读线程数')
+    parser.add_argument('--writers', type=int, default=4, help='并发出价线程数')
+    parser.add_argument('--auctions', type=int, default=200, help='预置拍卖数量')
+    parser.add_argument('--profiles', nargs='+', default=['default', 'wal'],
+                        choices=sorted(Config.DB_STORAGE_PROFILES), help='参与对比的存储方案')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    results = {}
+    for profile in args.profiles:
+        results[profile] = run_profile(profile, args.duration, args.readers, args.writers, args.auctions)
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
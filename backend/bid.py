@@ -1,10 +1,113 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import Auction, Bid, User
+from events import hub
+from scheduler import schedule_settlement
+from orderbook import BidRejected, get_order_book
+from auction import format_bid_history, get_viewer_id
+from config import Config
 from datetime import datetime
 
 bid_bp = Blueprint('bid', __name__, url_prefix='/api/auctions')
 
+def check_open(auction, bidder_id):
+    """校验拍卖是否可以由该用户出价（不是自己的拍卖且仍在进行中），返回错误信息或None"""
+    # 检查是否是自己的拍卖
+    if auction['seller_id'] == bidder_id:
+        return '不能对自己的拍卖出价'
+    
+    # 检查拍卖状态
+    if auction['status'] != 'active':
+        return '拍卖已结束或已流拍'
+    
+    # 检查是否已到结束时间
+    end_time = datetime.fromisoformat(auction['end_time'].replace('Z', '+00:00'))
+    now = datetime.now(end_time.tzinfo) if end_time.tzinfo else datetime.now()
+    if (end_time - now).total_seconds() <= 0:
+        return '拍卖已结束'
+    return None
+
+def check_bid(auction, bidder_id, amount):
+    """校验出价，返回错误信息；可以出价时返回None"""
+    error = check_open(auction, bidder_id)
+    if error:
+        return error
+    
+    # 验证出价金额
+    current_price = auction['current_price']
+    min_increment = auction.get('min_increment', 0.01)
+    min_bid_amount = current_price + min_increment
+    
+    if amount < min_bid_amount:
+        return f'出价金额必须至少为当前最高价加上最低加价幅度，即 {min_bid_amount:.2f}'
+    return None
+
+def check_proxy(auction, bidder_id, max_amount, current_max):
+    """校验代理出价的最高价（current_max 为已登记的最高价），返回错误信息；可以登记时返回None"""
+    error = check_open(auction, bidder_id)
+    if error:
+        return error
+    
+    if current_max is not None and max_amount <= current_max:
+        return f'新的最高价必须高于已设置的最高价 {current_max:.2f}'
+    
+    # 当前最高出价者设置的最高价只需高于当前价，其他用户需至少能出价一次
+    if auction['current_bidder_id'] == bidder_id:
+        if max_amount <= auction['current_price']:
+            return f'最高价必须高于当前价 {auction["current_price"]:.2f}'
+        return None
+    min_bid_amount = auction['current_price'] + auction.get('min_increment', 0.01)
+    if max_amount < min_bid_amount:
+        return f'最高价必须至少为当前最高价加上最低加价幅度，即 {min_bid_amount:.2f}'
+    return None
+
+def publish_bid(auction_id, bid, bidder, stats):
+    """推送新出价给正在查看该拍卖的客户端（金额统一为浮点数，见 format_bid_created）"""
+    bidder_name = bidder['username'] if len(bidder['username']) > 1 else '***'
+    hub.publish(auction_id, 'bid', {
+        'auction_id': auction_id,
+        'status': 'active',
+        'current_price': float(bid['amount']),
+        'current_bidder': {'username': bidder_name},
+        'bid_count': stats['bid_count'],
+        'bidder_count': stats['bidder_count'],
+        'end_time': bid['auction_end_time'],
+        'bid': {
+            'id': bid['id'],
+            'amount': float(bid['amount']),
+            'created_at': bid['created_at'],
+            'bidder': bidder_name
+        }
+    })
+
+def format_bid_created(bid):
+    """出价成功的响应；被其他用户的代理出价立即超过时 is_leading 为False
+    
+    金额统一为浮点数：SQL出价引擎从REAL列读出浮点数，内存出价引擎返回请求中的原值（可能是整数）。
+    """
+    leader = (bid['proxy_bids'] or [bid])[-1]
+    return {
+        'message': '出价成功' if leader is bid else '出价成功，但已被其他用户的自动出价超过',
+        'bid': {
+            'id': bid['id'],
+            'amount': float(bid['amount']),
+            'created_at': bid['created_at']
+        },
+        'current_price': float(leader['amount']),
+        'is_leading': leader['bidder_id'] == bid['bidder_id']
+    }
+
+def format_proxy(bidder_id, max_amount, bids, auction):
+    """登记代理出价的响应；auction 为登记前的最高价和最高出价者（没有写入出价时不变）"""
+    leader = bids[-1] if bids else auction
+    return {
+        'message': '自动出价已设置',
+        'proxy': {'max_amount': max_amount},
+        'current_price': float(leader['amount'] if bids else leader['current_price']),
+        'is_leading': (leader['bidder_id'] if bids else leader['current_bidder_id']) == bidder_id,
+        'bids': [{'amount': float(bid['amount']), 'created_at': bid['created_at']} for bid in bids]
+    }
+
 @bid_bp.route('/<int:auction_id>/bids', methods=['POST'])
 @jwt_required()
 def create_bid(auction_id):
@@ -19,104 +122,193 @@ def create_bid(auction_id):
     # 将字符串ID转换回整数用于数据库查询和比较
     bidder_id = int(bidder_id)
     
+    book = get_order_book()
+    if book:
+        # 内存出价引擎：在内存中校验并更新最高价，出价合并提交后返回
+        try:
+            bid, stats, extended = book.place(auction_id, bidder_id, amount, check_bid)
+        except BidRejected as e:
+            return jsonify({'error': str(e)}), e.status
+        if extended:
+            schedule_settlement(auction_id, bid['auction_end_time'])
+        for written in (bid, *bid['proxy_bids']):
+            publish_bid(auction_id, written, User.get_profile(written['bidder_id']), stats)
+        return jsonify(format_bid_created(bid)), 201
+    
     # 获取拍卖信息
     auction = Auction.get_by_id(auction_id)
     if not auction:
         return jsonify({'error': '拍卖不存在'}), 404
     
-    # 检查是否是自己的拍卖
-    if auction['seller_id'] == bidder_id:
-        return jsonify({'error': '不能对自己的拍卖出价'}), 400
-    
-    # 检查拍卖状态
-    if auction['status'] != 'active':
-        return jsonify({'error': '拍卖已结束或已流拍'}), 400
+    error = check_bid(auction, bidder_id, amount)
+    if error:
+        return jsonify({'error': error}), 400
     
-    # 检查是否已到结束时间
-    end_time = datetime.fromisoformat(auction['end_time'].replace('Z', '+00:00'))
-    now = datetime.now(end_time.tzinfo) if end_time.tzinfo else datetime.now()
-    if (end_time - now).total_seconds() <= 0:
-        return jsonify({'error': '拍卖已结束'}), 400
+    # 在同一事务中更新最高价并创建出价记录
+    bid = Bid.place(auction_id, bidder_id, amount)
+    if not bid:
+        # 校验通过后条件不再满足，说明有其他出价抢先或拍卖刚刚结束
+        return jsonify({'error': '出价已被超过或拍卖已结束，请刷新后重试'}), 409
     
-    # 验证出价金额
-    current_price = auction['current_price']
-    min_increment = auction.get('min_increment', 0.01)
-    min_bid_amount = current_price + min_increment
+    if bid['auction_end_time'] != auction['end_time']:
+        # 软结束顺延了结束时间，按新的结束时间重新安排结算
+        schedule_settlement(auction_id, bid['auction_end_time'])
+    stats = Bid.get_stats(auction_id)
+    for written in (bid, *bid['proxy_bids']):
+        publish_bid(auction_id, written, User.get_profile(written['bidder_id']), stats)
     
-    if amount < min_bid_amount:
-        return jsonify({'error': f'出价金额必须至少为当前最高价加上最低加价幅度，即 {min_bid_amount:.2f}'}), 400
+    return jsonify(format_bid_created(bid)), 201
+
+@bid_bp.route('/<int:auction_id>/bids', methods=['GET'])
+def get_bids(auction_id):
+    """获取拍卖的出价记录
     
-    # 创建出价记录
-    bid = Bid.create(auction_id, bidder_id, amount)
-    if not bid:
-        return jsonify({'error': '出价失败，请重试'}), 500
+    默认按时间倒序游标分页（limit/cursor，首页与拍卖详情中的 bid_history 相同）；
+    传入 since_id 时只返回该出价之后的新出价（按时间正序），用于轮询。
+    出价者的可见范围与拍卖详情相同，auction 中附带当前价、状态、结束时间和出价统计
+    （统计与拍卖详情共用缓存，有新出价后才重新计算）。
+    """
+    auction = Auction.get_by_id(auction_id)
+    if not auction:
+        return jsonify({'error': '拍卖不存在'}), 404
+    limit = request.args.get('limit', 20, type=int)
+    if limit < 1 or limit > 100:
+        limit = 20
+    since_id = request.args.get('since_id', None, type=int)
     
-    # 更新拍卖当前最高价
-    Auction.update_current_price(auction_id, amount, bidder_id)
+    if since_id is not None:
+        bids, has_more = Bid.get_since(auction_id, since_id, limit)
+        next_cursor = None
+    else:
+        try:
+            bids, next_cursor = Bid.get_page(auction_id, limit, request.args.get('cursor', None))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        has_more = next_cursor is not None
+    recent = Bid.get_recent(auction_id, Config.BID_HISTORY_DETAIL_SIZE)
     
     return jsonify({
-        'message': '出价成功',
-        'bid': {
-            'id': bid['id'],
-            'amount': bid['amount'],
-            'created_at': bid['created_at']
+        'bids': format_bid_history(auction, bids, get_viewer_id()),
+        'next_cursor': next_cursor,
+        'has_more': has_more,
+        'auction': {
+            'current_price': auction['current_price'],
+            'status': auction['status'],
+            'end_time': auction['end_time'],
+            'bid_count': recent['bid_count'],
+            'bidder_count': recent['bidder_count']
         }
-    }), 201
+    }), 200
+
+@bid_bp.route('/<int:auction_id>/proxy', methods=['POST'])
+@jwt_required()
+def set_proxy(auction_id):
+    """设置自动出价（代理出价）：登记愿意支付的最高价，由系统在其他用户出价时自动加价应对"""
+    data = request.get_json()
+    max_amount = data.get('max_amount')
+    
+    if not isinstance(max_amount, (int, float)) or max_amount <= 0:
+        return jsonify({'error': '最高价必须大于0'}), 400
+    max_amount = round(max_amount, 2)
+    
+    bidder_id = int(get_jwt_identity())
+    before = {}
+    
+    def validate(auction, bidder_id, max_amount, current_max):
+        before.update(current_price=auction['current_price'], current_bidder_id=auction['current_bidder_id'],
+                      end_time=auction['end_time'])
+        return check_proxy(auction, bidder_id, max_amount, current_max)
+    
+    book = get_order_book()
+    if book:
+        try:
+            bids, stats, extended = book.place_proxy(auction_id, bidder_id, max_amount, validate)
+        except BidRejected as e:
+            return jsonify({'error': str(e)}), e.status
+    else:
+        bids, error = Bid.place_proxy(auction_id, bidder_id, max_amount, validate)
+        if error:
+            return jsonify({'error': error}), 404 if error == '拍卖不存在' else 400
+        stats = Bid.get_stats(auction_id) if bids else None
+        extended = bool(bids) and bids[-1]['auction_end_time'] != before['end_time']
+    
+    if extended:
+        # 软结束可能顺延了结束时间，按新的结束时间重新安排结算
+        schedule_settlement(auction_id, bids[-1]['auction_end_time'])
+    for written in bids:
+        publish_bid(auction_id, written, User.get_profile(written['bidder_id']), stats)
+    
+    return jsonify(format_proxy(bidder_id, max_amount, bids, before)), 201
+
+@bid_bp.route('/<int:auction_id>/proxy', methods=['GET'])
+@jwt_required()
+def get_proxy(auction_id):
+    """获取我在该拍卖上设置的自动出价（只对本人可见）"""
+    bidder_id = int(get_jwt_identity())
+    return jsonify({'proxy': Bid.get_proxy(auction_id, bidder_id)}), 200
 
 @bid_bp.route('/my/bids', methods=['GET'])
 @jwt_required()
 def get_my_bids():
-    """获取我的竞拍记录"""
+    """获取我的竞拍记录：每个参与过的拍卖一条汇总，按最近出价时间倒序游标分页
+    
+    传入 auction_id 时只返回该拍卖的汇总；传入 include_history=1 时附带我在每个拍卖上的全部出价记录
+    （前端只在展开某个拍卖时用 auction_id + include_history 加载该拍卖的记录）。
+    """
     bidder_id = get_jwt_identity()
     # 将字符串ID转换回整数用于数据库查询
     bidder_id = int(bidder_id)
-    bids = Bid.get_by_bidder(bidder_id)
+    cursor = request.args.get('cursor', None)
+    limit = request.args.get('limit', 20, type=int)
+    if limit < 1 or limit > 100:
+        limit = 20
+    auction_id = request.args.get('auction_id', None, type=int)
+    include_history = request.args.get('include_history', '') in ('1', 'true')
+    try:
+        participations, next_cursor = Bid.get_participation(bidder_id, limit, cursor, auction_id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    history = Bid.get_history(bidder_id, [row['auction_id'] for row in participations]) if include_history else {}
     
     # 格式化输出
     result = []
-    for bid in bids:
+    for row in participations:
         # 计算剩余时间
-        end_time = datetime.fromisoformat(bid['end_time'].replace('Z', '+00:00'))
+        end_time = datetime.fromisoformat(row['end_time'].replace('Z', '+00:00'))
         now = datetime.now(end_time.tzinfo) if end_time.tzinfo else datetime.now()
         time_left = (end_time - now).total_seconds()
         
-        # 判断状态
-        original_status = bid['status']
-        status = original_status
-        
-        # 如果拍卖状态是 active 但时间已过，需要检查实际状态
+        # 判断状态：拍卖状态是 active 但时间已过、尚未结算时，
+        # 有最高出价者（用户出过价，所以总是有）则为 ended，否则为 no_bid
+        status = row['status']
+        in_progress = status == 'active' and time_left > 0
         if status == 'active' and time_left <= 0:
-            # 时间已过，检查是否有出价（通过检查 current_bidder_id 或 bids 数量）
-            # 如果有出价，应该是 ended；如果没有出价，应该是 no_bid
-            # 检查是否有出价记录
-            bids_count = len(Bid.get_by_auction(bid['auction_id']))
-            if bids_count == 0:
-                status = 'no_bid'
-            else:
-                status = 'ended'
-        
-        # 判断用户是否是最终中标者（当拍卖结束时）
-        # 只有最高出价的那个记录才标记为中标
-        is_winner = False
-        if status == 'ended' and bid.get('current_bidder_id') == bidder_id:
-            # 拍卖已结束，且当前用户是最高出价者
-            # 只有出价金额等于当前最高价的记录才是中标记录
-            if bid['amount'] == bid['current_price']:
-                is_winner = True
+            status = 'ended' if row['current_bidder_id'] is not None else 'no_bid'
         
-        result.append({
-            'id': bid['id'],
-            'auction_id': bid['auction_id'],
-            'title': bid['title'],
-            'amount': bid['amount'],
-            'current_price': bid['current_price'],
-            'is_highest': bid.get('is_highest', False) and original_status == 'active' and time_left > 0,
-            'is_winner': is_winner,  # 是否中标
+        # 当前最高出价者是我，且我的最高出价就是当前价
+        leading = row['current_bidder_id'] == bidder_id and row['max_amount'] == row['current_price']
+        item = {
+            'auction_id': row['auction_id'],
+            'title': row['title'],
+            'amount': row['max_amount'],  # 我在该拍卖上的最高出价
+            'bid_count': row['bid_count'],  # 我在该拍卖上的出价次数
+            'current_price': row['current_price'],
+            'is_highest': leading and in_progress,
+            'is_winner': leading and status == 'ended',  # 是否中标
             'status': status,
-            'end_time': bid['end_time'],
-            'time_left': max(0, int(time_left)) if original_status == 'active' and time_left > 0 else 0,
-            'created_at': bid['created_at']
-        })
+            'end_time': row['end_time'],
+            'time_left': max(0, int(time_left)) if in_progress else 0,
+            'last_bid_at': row['last_bid_at'],
+            'created_at': row['last_bid_at']  # 兼容旧版客户端：最近一次出价时间
+        }
+        if include_history:
+            item['history'] = [{
+                'id': bid['id'],
+                'amount': bid['amount'],
+                'created_at': bid['created_at'],
+                'is_highest': item['is_highest'] and bid['amount'] == row['current_price'],
+                'is_winner': item['is_winner'] and bid['amount'] == row['current_price']
+            } for bid in history[row['auction_id']]]
+        result.append(item)
     
-    return jsonify({'bids': result}), 200
-
+    return jsonify({'bids': result, 'next_cursor': next_cursor, 'has_more': next_cursor is not None}), 200
@@ -0,0 +1,209 @@
+from collections import OrderedDict
+from config import Config
+import copy
+import logging
+import pickle
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class MemoryCache:
+    """进程内LRU缓存，每个条目带过期时间
+    
+    存取时复制对象，调用方修改返回值不会影响缓存中的数据。
+    """
+    
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # 键 -> (过期时间戳, 值)
+        self._counters = {}  # 计数器单独保存，不参与淘汰
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        """返回 (是否命中, 值)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+        return True, copy.deepcopy(value)
+    
+    def set(self, key, value, ttl):
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+    
+    def incr(self, key):
+        """递增计数器，返回新值"""
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+    
+    def get_counter(self, key):
+        with self._lock:
+            return self._counters.get(key, 0)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+class RedisCache:
+    """基于Redis协议的缓存（可用于多进程共享），值使用pickle序列化"""
+    
+    def __init__(self, url, prefix='auction:'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+    
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return False, None
+        return True, pickle.loads(raw)
+    
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=max(1, int(ttl)))
+    
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*(self.prefix + key for key in keys))
+    
+    def incr(self, key):
+        return self.client.incr(self.prefix + key)
+    
+    def get_counter(self, key):
+        return int(self.client.get(self.prefix + key) or 0)
+    
+    def clear(self):
+        for key in self.client.scan_iter(match=self.prefix + '*'):
+            self.client.delete(key)
+
+class NullCache:
+    """不缓存（CACHE_BACKEND=none 时使用）"""
+    
+    def get(self, key):
+        return False, None
+    
+    def set(self, key, value, ttl):
+        pass
+    
+    def delete(self, *keys):
+        pass
+    
+    def incr(self, key):
+        return 0
+    
+    def get_counter(self, key):
+        return 0
+    
+    def clear(self):
+        pass
+
+class Cache:
+    """读穿透缓存，按命名空间统计命中/未命中次数
+    
+    缓存键中带有所依赖数据的版本号，写操作提交后递增版本号即可使相关条目失效，
+    旧版本的条目不再被读取，随LRU淘汰或过期自然清除。版本号在加载数据之前读取，
+    因此加载期间发生的写入不会让旧数据以新版本号写入缓存。
+    """
+    
+    def __init__(self, backend, ttl):
+        self.backend = backend
+        self.ttl = ttl
+        self._stats = {}  # 命名空间 -> {'hits': 次数, 'misses': 次数}
+        self._lock = threading.Lock()
+    
+    def get_or_load(self, namespace, key, loader, depends_on, ttl=None):
+        """命中时返回缓存的值，否则调用loader加载并写入缓存（None不缓存）"""
+        try:
+            version = self.backend.get_counter(f'version:{depends_on}')
+            full_key = f'{namespace}:{key}:v{version}'
+            hit, value = self.backend.get(full_key)
+        except Exception as e:
+            # 缓存不可用时直接读取数据库
+            logger.warning(f"Cache get failed for {namespace}:{key}: {e}")
+            self._count(namespace, 'misses')
+            return loader()
+        self._count(namespace, 'hits' if hit else 'misses')
+        if hit:
+            return value
+        
+        value = loader()
+        if value is not None:
+            try:
+                self.backend.set(full_key, value, ttl or self.ttl)
+            except Exception as e:
+                logger.warning(f"Cache set failed for {full_key}: {e}")
+        return value
+    
+    def bump(self, *names):
+        """递增版本号，使依赖这些数据的缓存条目失效"""
+        try:
+            for name in names:
+                self.backend.incr(f'version:{name}')
+        except Exception as e:
+            logger.warning(f"Cache invalidation failed for {names}: {e}")
+    
+    def invalidate_auction(self, auction_id, lists=False):
+        """拍卖信息或出价变化：使该拍卖的详情和出价记录失效
+        
+        出价只改变列表中的当前价和出价数，不使列表失效（列表条目按较短的 CACHE_LIST_TTL_SECONDS 过期），
+        否则任意拍卖上的出价都会清空所有列表缓存；状态变化（结算）会改变按状态筛选的列表，传入 lists=True。
+        """
+        if lists:
+            self.bump(f'auction:{auction_id}', 'auction_list')
+        else:
+            self.bump(f'auction:{auction_id}')
+    
+    def invalidate_lists(self):
+        """新拍卖发布：只需使列表失效"""
+        self.bump('auction_list')
+    
+    def put(self, namespace, key, value, depends_on, ttl=None):
+        """直接写入已知的最新值（如登录时已查询到的用户资料）"""
+        try:
+            version = self.backend.get_counter(f'version:{depends_on}')
+            self.backend.set(f'{namespace}:{key}:v{version}', value, ttl or self.ttl)
+        except Exception as e:
+            logger.warning(f"Cache set failed for {namespace}:{key}: {e}")
+    
+    def stats(self):
+        """各命名空间的命中/未命中次数及命中率"""
+        with self._lock:
+            result = {}
+            for namespace, counts in self._stats.items():
+                total = counts['hits'] + counts['misses']
+                result[namespace] = {**counts, 'hit_rate': round(counts['hits'] / total, 4) if total else 0.0}
+            return result
+    
+    def _count(self, namespace, field):
+        with self._lock:
+            counts = self._stats.setdefault(namespace, {'hits': 0, 'misses': 0})
+            counts[field] += 1
+
+def create_backend():
+    """根据配置创建缓存后端"""
+    if Config.CACHE_BACKEND == 'redis':
+        return RedisCache(Config.CACHE_REDIS_URL)
+    if Config.CACHE_BACKEND == 'none':
+        return NullCache()
+    if Config.WEB_CONCURRENCY > 1:
+        # 写操作只能使本进程的缓存失效，其他进程会返回旧的详情、列表和当前价（出价校验也会据此误拒）
+        logger.warning("CACHE_BACKEND=memory is per process; caching disabled with multiple workers, use CACHE_BACKEND=redis")
+        return NullCache()
+    return MemoryCache(Config.CACHE_MAX_ENTRIES)
+
+cache = Cache(create_backend(), Config.CACHE_TTL_SECONDS)
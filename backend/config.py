@@ -12,6 +12,93 @@ class Config:
     JWT_ALGORITHM = 'HS256'  # 使用HS256算法
     # 支持 Docker 环境的数据库路径
     DATABASE_PATH = os.environ.get('DATABASE_PATH') or os.path.join(os.path.dirname(__file__), 'auction.db')
-    UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), 'uploads')
+    # 数据库连接池配置
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE') or 10)  # 池中保留的最大空闲连接数
+    DB_PRAGMAS = {
+        'foreign_keys': 'ON',
+    }
+    # 存储配置方案：default 为SQLite默认的回滚日志模式，wal 适合读写并发
+    DB_STORAGE_PROFILE = os.environ.get('DB_STORAGE_PROFILE') or 'wal'
+    DB_STORAGE_PROFILES = {
+        'default': {
+            'journal_mode': 'DELETE',
+            'synchronous': 'FULL',
+        },
+        'wal': {
+            'journal_mode': 'WAL',  # 读写互不阻塞
+            'synchronous': 'NORMAL',  # WAL模式下仅在检查点时fsync
+            'busy_timeout': 5000,  # 写锁等待5秒，避免 database is locked
+            'mmap_size': 268435456,  # 256MB内存映射读
+            'cache_size': -65536,  # 64MB页缓存（负数单位为KB）
+            'temp_store': 'MEMORY',
+        },
+    }
+    UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or os.path.join(os.path.dirname(__file__), 'uploads')
+    # 拍卖结算配置
+    SETTLEMENT_SYNC_SECONDS = 30  # 增量同步其他进程新发布拍卖的间隔
+    SETTLEMENT_RETRY_SECONDS = 5  # 结算失败后的重试间隔
+    # 多进程部署时通过租约选举执行结算任务的进程
+    LEADER_LEASE_SECONDS = 15  # 租约有效期，持有进程退出后其他进程最多等待该时间接管
+    LEADER_HEARTBEAT_SECONDS = 5  # 续约/尝试接管的间隔
+    # 实时推送（SSE）配置
+    SSE_HEARTBEAT_SECONDS = 15  # 心跳间隔，需小于反向代理的读超时
+    SSE_MAX_SUBSCRIBERS_PER_AUCTION = int(os.environ.get('SSE_MAX_SUBSCRIBERS_PER_AUCTION') or 500)
+    SSE_HISTORY_SIZE = 100  # 断线重连时最多补发的事件数，错过更多事件时改为发送完整快照
+    SSE_EVENT_POLL_SECONDS = 0.2  # 轮询事件表的间隔，即其他工作进程发布的事件到达本进程连接的最大延迟
+    SSE_EVENT_RETENTION_SECONDS = 600  # 事件表中保留事件的时长，更早的事件不再补发
+    SSE_QUEUE_SIZE = 100  # 每个连接的待发送事件上限，超过后断开由客户端重连
+    SSE_RETRY_MILLISECONDS = 3000  # 客户端重连间隔
+    # 缩略图配置：尺寸名 -> 最长边像素
+    IMAGE_VARIANTS = {
+        'small': 320,
+        'medium': 800,
+    }
+    THUMBNAIL_QUALITY = 80
+    THUMBNAIL_WORKERS = int(os.environ.get('THUMBNAIL_WORKERS') or 2)
+    THUMBNAIL_CACHE_MAX_BYTES = int(os.environ.get('THUMBNAIL_CACHE_MAX_BYTES') or 512 * 1024 * 1024)  # 缩略图磁盘缓存上限
+    # gunicorn工作进程数（见 gunicorn.conf.py），用于检查只在单个进程内有效的配置
+    WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY') or 1)
+    # 读缓存配置：memory 为进程内LRU（只用于单个工作进程，多进程时改为不缓存），
+    # redis 为Redis兼容服务（多进程共享），none 为不缓存
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND') or 'memory'
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL') or 'redis://localhost:6379/0'
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES') or 10000)
+    CACHE_TTL_SECONDS = int(os.environ.get('CACHE_TTL_SECONDS') or 60)  # 兜底过期时间，限制其他进程写入后的不一致时长
+    CACHE_LIST_TTL_SECONDS = int(os.environ.get('CACHE_LIST_TTL_SECONDS') or 5)  # 列表缓存时间，出价不使列表失效，列表中的当前价最多滞后这么久
+    USER_CACHE_TTL_SECONDS = int(os.environ.get('USER_CACHE_TTL_SECONDS') or 300)  # 用户公开资料缓存时间
+    # 密码哈希配置：在独立的线程池（或进程池）中计算，避免登录高峰占满请求线程
+    PASSWORD_HASH_EXECUTOR = os.environ.get('PASSWORD_HASH_EXECUTOR') or 'thread'  # thread 或 process
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS') or 2)  # 同时计算的上限，都在计算中时返回429
+    # 登录/注册限流：每个IP在时间窗口内的最大失败登录次数（注册按全部尝试计数，单独统计）
+    LOGIN_RATE_LIMIT = int(os.environ.get('LOGIN_RATE_LIMIT') or 10)
+    LOGIN_RATE_WINDOW_SECONDS = 60
+    # 可信的反向代理地址（逗号分隔）：只有来自这些地址的请求才使用其写入的X-Real-IP作为客户端IP
+    TRUSTED_PROXIES = [ip.strip() for ip in (os.environ.get('TRUSTED_PROXIES') or '127.0.0.1,::1').split(',') if ip.strip()]
+    # 软结束（防狙击）：结束前 soft_close_window 秒内有出价时，结束时间顺延到出价后 soft_close_extension 秒
+    SOFT_CLOSE_MAX_SECONDS = 3600  # 两项设置的上限
+    # 出价引擎：sql 为每次出价在数据库中校验并提交；memory 为在内存中维护进行中拍卖的最高价，
+    # 接受的出价由后台写线程合并提交（内存状态不在进程间共享，只适用于单个工作进程）
+    BID_ENGINE = os.environ.get('BID_ENGINE') or 'sql'
+    BID_WRITE_WINDOW_MS = float(os.environ.get('BID_WRITE_WINDOW_MS') or 2)  # 合并提交的等待窗口，窗口内的出价一次提交、一次fsync
+    BID_WRITE_MAX_BATCH = 500  # 每次提交的最大出价数
+    BID_WRITE_SYNCHRONOUS = os.environ.get('BID_WRITE_SYNCHRONOUS') or 'FULL'  # 写线程连接的synchronous，FULL为每次提交都fsync
+    # 批量导入：每个事务插入的行数，以及单次请求的最大行数
+    BULK_IMPORT_CHUNK_SIZE = 500
+    BULK_IMPORT_MAX_ROWS = int(os.environ.get('BULK_IMPORT_MAX_ROWS') or 10000)
+    # 拍卖详情中返回的最近出价条数，更早的出价通过出价记录接口分页读取
+    BID_HISTORY_DETAIL_SIZE = int(os.environ.get('BID_HISTORY_DETAIL_SIZE') or 20)
+    # 批量获取拍卖详情：单次请求的最大拍卖数，以及每个拍卖返回的最近出价条数（默认值和上限）
+    BATCH_DETAIL_MAX_IDS = 50
+    BATCH_DETAIL_BIDS = 10
+    BATCH_DETAIL_MAX_BIDS = 50
+    # 日志配置：请求线程只把日志放入队列，由后台线程批量写出
+    LOG_FORMAT = os.environ.get('LOG_FORMAT') or 'json'  # json（每行一条JSON）或 text
+    LOG_LEVEL = os.environ.get('LOG_LEVEL') or 'INFO'
+    LOG_QUEUE_SIZE = 10000  # 队列已满时丢弃日志，不阻塞请求
+    LOG_BATCH_SIZE = 100  # 每次写出的最大条数
+    ACCESS_LOG_SAMPLE_RATE = float(os.environ.get('ACCESS_LOG_SAMPLE_RATE') or 1)  # 成功的GET请求的访问日志采样比例，其他请求总是记录
+    # 采样分析：每 PROFILE_SAMPLE_RATE 个请求用cProfile分析一次并写入 PROFILE_DIR，0为关闭
+    PROFILE_SAMPLE_RATE = int(os.environ.get('PROFILE_SAMPLE_RATE') or 0)
+    PROFILE_DIR = os.environ.get('PROFILE_DIR') or os.path.join(os.path.dirname(__file__), 'profiles')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
 
@@ -1,13 +1,145 @@
 import sqlite3
 import os
+import queue
+import threading
+import time
+from flask import g, has_app_context
 from config import Config
+from utils import normalize_end_time
+import metrics
 
-def get_db():
-    """获取数据库连接"""
-    conn = sqlite3.connect(Config.DATABASE_PATH)
+class TimedCursor(sqlite3.Cursor):
+    """记录每条SQL执行次数和耗时的游标"""
+    
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            metrics.record_query(time.perf_counter() - start)
+    
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            metrics.record_query(time.perf_counter() - start)
+
+class PooledConnection(sqlite3.Connection):
+    """记录所属连接池的连接，归还时回到创建它的池"""
+    pool = None
+    
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+    
+    # Connection.execute 在C层直接执行，不经过游标的execute，需要单独转到 TimedCursor
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+    
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+class ConnectionPool:
+    """SQLite连接池，复用长连接，避免每次查询都重新建立连接"""
+    
+    def __init__(self, database, size, profile):
+        self.database = database
+        self.size = size
+        self.profile = profile
+        self._idle = queue.LifoQueue(maxsize=size)
+    
+    def _connect(self):
+        """建立新连接，并且只在建立时执行一次PRAGMA"""
+        conn = connect(self.database)
+        conn.pool = self
+        return conn
+    
+    def acquire(self):
+        """从池中取出一个空闲连接，没有空闲连接时新建"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+    
+    def release(self, conn):
+        """归还连接，回滚未提交的事务；池已满时直接关闭"""
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+    
+    def close_all(self):
+        """关闭池中所有空闲连接"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+def get_pragmas():
+    """合并当前存储方案与通用PRAGMA设置"""
+    profile = Config.DB_STORAGE_PROFILES.get(Config.DB_STORAGE_PROFILE)
+    if profile is None:
+        raise ValueError(f'未知的存储配置方案: {Config.DB_STORAGE_PROFILE}')
+    return {**profile, **Config.DB_PRAGMAS}
+
+def connect(database, **pragmas):
+    """建立新连接并执行PRAGMA，pragmas 覆盖存储方案中的同名设置
+    
+    不经过连接池的连接（如后台写线程长期持有的连接）由调用方负责关闭。
+    """
+    # 连接会在线程之间复用，但同一时刻只会被一个线程持有
+    conn = sqlite3.connect(database, check_same_thread=False, factory=PooledConnection)
     conn.row_factory = sqlite3.Row
+    for name, value in {**get_pragmas(), **pragmas}.items():
+        conn.execute(f'PRAGMA {name} = {value}')
     return conn
 
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """获取全局连接池（数据库路径或存储方案变化时重建）"""
+    global _pool
+    with _pool_lock:
+        if (_pool is None or _pool.database != Config.DATABASE_PATH
+                or _pool.profile != Config.DB_STORAGE_PROFILE):
+            if _pool is not None:
+                _pool.close_all()
+            _pool = ConnectionPool(Config.DATABASE_PATH, Config.DB_POOL_SIZE, Config.DB_STORAGE_PROFILE)
+        return _pool
+
+def get_db():
+    """获取数据库连接
+    
+    在Flask应用上下文中，同一个请求内的所有查询共用一个连接，
+    由teardown_appcontext统一归还；在上下文之外（如定时任务线程），
+    调用方需在使用完毕后调用release_db归还连接。
+    """
+    if has_app_context():
+        if 'db' not in g:
+            g.db = get_pool().acquire()
+        return g.db
+    return get_pool().acquire()
+
+def release_db(conn):
+    """归还数据库连接（应用上下文中的连接在请求结束时统一归还）"""
+    if has_app_context() and g.get('db') is conn:
+        return
+    conn.pool.release(conn)
+
+def close_db(exception=None):
+    """请求结束时归还当前上下文持有的连接"""
+    conn = g.pop('db', None)
+    if conn is not None:
+        conn.pool.release(conn)
+
+def init_app(app):
+    """在Flask应用上注册连接的清理钩子"""
+    app.teardown_appcontext(close_db)
+
 def init_db():
     """初始化数据库表"""
     conn = get_db()
@@ -34,6 +166,8 @@ def init_db():
             starting_price REAL NOT NULL,
             current_price REAL NOT NULL,
             min_increment REAL DEFAULT 0.01,
+            soft_close_window INTEGER DEFAULT 0,
+            soft_close_extension INTEGER DEFAULT 0,
             current_bidder_id INTEGER,
             seller_id INTEGER NOT NULL,
             end_time TIMESTAMP NOT NULL,
@@ -53,6 +187,26 @@ def init_db():
         # 字段已存在，忽略错误
         pass
     
+    # 为现有表添加软结束（防狙击）字段（如果不存在）
+    for column in ('soft_close_window', 'soft_close_extension'):
+        try:
+            cursor.execute(f'ALTER TABLE auctions ADD COLUMN {column} INTEGER DEFAULT 0')
+        except sqlite3.OperationalError:
+            pass
+    
+    # 把旧数据中带时区、空格分隔或带小数秒的结束时间统一为存储格式（与出价、结算中的字符串比较一致）
+    cursor.execute('''
+        SELECT id, end_time FROM auctions
+        WHERE end_time NOT GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]T[0-9][0-9]:[0-9][0-9]:[0-9][0-9]'
+    ''')
+    normalized = []
+    for row in cursor.fetchall():
+        try:
+            normalized.append((normalize_end_time(row[1]), row[0]))
+        except ValueError:
+            pass
+    cursor.executemany('UPDATE auctions SET end_time = ? WHERE id = ?', normalized)
+    
     # 创建出价记录表
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS bids (
@@ -66,15 +220,145 @@ def init_db():
         )
     ''')
     
+    # 创建代理出价表（每个用户在每个拍卖上一条，最高价只对本人可见）
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS proxy_bids (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            auction_id INTEGER NOT NULL,
+            bidder_id INTEGER NOT NULL,
+            max_amount REAL NOT NULL,
+            placed_at TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (auction_id, bidder_id),
+            FOREIGN KEY (auction_id) REFERENCES auctions(id),
+            FOREIGN KEY (bidder_id) REFERENCES users(id)
+        )
+    ''')
+    
+    # 创建拍卖图片表（图片文件按内容哈希存储在上传目录中）
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS auction_images (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            auction_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            image_key TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (auction_id) REFERENCES auctions(id)
+        )
+    ''')
+    
+    # 创建用户参与记录表（每个用户在每个拍卖上的出价汇总，出价时在同一事务中维护）
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user_auction_participation'")
+    backfill_participation = cursor.fetchone() is None
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_auction_participation (
+            user_id INTEGER NOT NULL,
+            auction_id INTEGER NOT NULL,
+            max_amount REAL NOT NULL,
+            bid_count INTEGER NOT NULL,
+            last_bid_at TIMESTAMP NOT NULL,
+            PRIMARY KEY (user_id, auction_id),
+            FOREIGN KEY (user_id) REFERENCES users(id),
+            FOREIGN KEY (auction_id) REFERENCES auctions(id)
+        )
+    ''')
+    if backfill_participation:
+        # 新建表时从已有的出价记录生成汇总
+        cursor.execute('''
+            INSERT INTO user_auction_participation (user_id, auction_id, max_amount, bid_count, last_bid_at)
+            SELECT bidder_id, auction_id, MAX(amount), COUNT(*), MAX(created_at)
+            FROM bids GROUP BY bidder_id, auction_id
+        ''')
+    
+    # 创建全文搜索索引（外部内容表，只保存索引；trigram分词可以匹配中文词语的任意片段）
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'auctions_fts'")
+    rebuild_search = cursor.fetchone() is None
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS auctions_fts USING fts5(
+            title, description,
+            content='auctions', content_rowid='id', tokenize='trigram'
+        )
+    ''')
+    # 通过触发器与 auctions 表保持同步；只在标题或描述变化时更新索引，出价和结算不会触发
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS auctions_fts_insert AFTER INSERT ON auctions BEGIN
+            INSERT INTO auctions_fts (rowid, title, description) VALUES (new.id, new.title, new.description);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS auctions_fts_delete AFTER DELETE ON auctions BEGIN
+            INSERT INTO auctions_fts (auctions_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS auctions_fts_update AFTER UPDATE OF title, description ON auctions BEGIN
+            INSERT INTO auctions_fts (auctions_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+            INSERT INTO auctions_fts (rowid, title, description) VALUES (new.id, new.title, new.description);
+        END
+    ''')
+    if rebuild_search:
+        # 新建索引时为已有的拍卖建立索引
+        cursor.execute("INSERT INTO auctions_fts (auctions_fts) VALUES ('rebuild')")
+    
+    # 创建租约表（多进程部署时选举唯一执行结算任务的进程）
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS leases (
+            name TEXT PRIMARY KEY,
+            holder TEXT NOT NULL,
+            expires_at REAL NOT NULL,
+            heartbeat_at REAL NOT NULL
+        )
+    ''')
+    
+    # 创建拍卖事件表：实时推送的事件经此表在工作进程间共享，并用于断线重连补发（只保留最近的事件）
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS auction_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            auction_id INTEGER NOT NULL,
+            type TEXT NOT NULL,
+            data TEXT NOT NULL,
+            created_at REAL NOT NULL
+        )
+    ''')
+    
     # 创建索引
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_auctions_status ON auctions(status)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_auctions_end_time ON auctions(end_time)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_bids_auction_id ON bids(auction_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_auctions_status_end_time ON auctions(status, end_time)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_bids_bidder_id ON bids(bidder_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_bids_auction_bidder ON bids(auction_id, bidder_id)')
+    # 键集分页使用的复合索引（SQLite索引末尾隐含rowid，即 (…, id)）
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_auctions_created_at ON auctions(created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_auctions_status_created_at ON auctions(status, created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_auctions_seller_created_at ON auctions(seller_id, created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_bids_bidder_created_at ON bids(bidder_id, created_at)')
+    # 出价历史按 (created_at, id) 分页，包含出价者和金额，分页时不需要回表读取出价行
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_bids_auction_created_at ON bids(auction_id, created_at, id, bidder_id, amount)')
+    # 按拍卖查找出价由以上两个以 auction_id 开头的索引支持，单列索引只会增加每次出价的写入
+    cursor.execute('DROP INDEX IF EXISTS idx_bids_auction_id')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_auction_images_auction ON auction_images(auction_id, position)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_proxy_bids_auction_max ON proxy_bids(auction_id, max_amount DESC, placed_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_auction_events_auction ON auction_events(auction_id, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_auction_events_created_at ON auction_events(created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_participation_user_last_bid ON user_auction_participation(user_id, last_bid_at, auction_id)')
     
     conn.commit()
-    conn.close()
+    release_db(conn)
     
     # 创建上传目录
     os.makedirs(Config.UPLOAD_FOLDER, exist_ok=True)
 
+def rebuild_search_index():
+    """根据 auctions 表重建全文搜索索引（索引损坏或与数据不一致时使用），返回索引的拍卖数量"""
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO auctions_fts (auctions_fts) VALUES ('rebuild')")
+    cursor.execute("INSERT INTO auctions_fts (auctions_fts) VALUES ('optimize')")
+    conn.commit()
+    cursor.execute('SELECT COUNT(*) FROM auctions')
+    count = cursor.fetchone()[0]
+    release_db(conn)
+    return count
+
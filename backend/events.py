@@ -0,0 +1,213 @@
+from config import Config
+from models import Event
+import asyncio
+import json
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class SubscriberLimitExceeded(Exception):
+    """单个拍卖的订阅者数量已达上限"""
+
+class Subscription:
+    """一个SSE连接的订阅，事件通过有界队列传递"""
+    
+    def __init__(self, auction_id, queue_size):
+        self.auction_id = auction_id
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.closed = False
+    
+    def deliver(self, event):
+        """投递事件；消费过慢导致队列已满时关闭订阅，由客户端带Last-Event-ID重连"""
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.closed = True
+    
+    def get(self, timeout):
+        """等待下一个事件，超时返回None"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+class AsyncSubscription(Subscription):
+    """ASGI模式下的订阅：事件由发布线程转交给事件循环，等待时不占用线程"""
+    
+    def __init__(self, auction_id, queue_size, loop):
+        self.auction_id = auction_id
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.closed = False
+        self.loop = loop
+    
+    def deliver(self, event):
+        self.loop.call_soon_threadsafe(self._put, event)
+    
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.closed = True
+    
+    async def get(self, timeout):
+        """等待下一个事件，超时返回None"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+class EventHub:
+    """拍卖事件发布/订阅中心，事件经数据库中的 auction_events 表在工作进程间共享
+    
+    发布的事件先放入队列，由后台线程写入 auction_events（事件ID为自增主键，所有进程共用一个序列），
+    同一线程再按ID顺序轮询新事件，投递给本进程中订阅了该拍卖的连接；
+    因此在任一工作进程中发布的出价和结算事件，都会推送给连接在其他进程上的客户端。
+    断线重连时按Last-Event-ID从事件表中补发。进程内只保存订阅者，不保存各拍卖的事件历史，
+    事件表只保留最近 retention_seconds 秒的事件。
+    """
+    
+    def __init__(self, max_subscribers, history_size, queue_size, poll_seconds, retention_seconds):
+        self.max_subscribers = max_subscribers
+        self.history_size = history_size
+        self.queue_size = queue_size
+        self.poll_seconds = poll_seconds
+        self.retention_seconds = retention_seconds
+        self._subscribers = {}  # 拍卖ID -> 订阅集合
+        self._pending = queue.Queue()  # 等待写入事件表的事件
+        self._last_id = None  # 已投递的最新事件ID
+        self._thread = None
+        self._lock = threading.Lock()
+    
+    def subscribe(self, auction_id, loop=None):
+        """订阅拍卖事件，超过订阅者上限时抛出SubscriberLimitExceeded
+        
+        传入事件循环时返回在该循环中等待事件的AsyncSubscription。
+        """
+        self._ensure_started()
+        with self._lock:
+            subscribers = self._subscribers.setdefault(auction_id, set())
+            if len(subscribers) >= self.max_subscribers:
+                raise SubscriberLimitExceeded(auction_id)
+            if loop is not None:
+                subscription = AsyncSubscription(auction_id, self.queue_size, loop)
+            else:
+                subscription = Subscription(auction_id, self.queue_size)
+            subscribers.add(subscription)
+            return subscription
+    
+    def unsubscribe(self, subscription):
+        """取消订阅"""
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.auction_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.auction_id]
+    
+    def subscriber_count(self, auction_id):
+        """当前订阅者数量"""
+        with self._lock:
+            return len(self._subscribers.get(auction_id, ()))
+    
+    def publish(self, auction_id, event_type, data):
+        """发布事件：由后台线程写入事件表后推送给所有进程中该拍卖的订阅者，不等待写入"""
+        self._ensure_started()
+        self._pending.put((auction_id, event_type, json.dumps(data, ensure_ascii=False)))
+    
+    def snapshot(self, auction_id, data):
+        """构造完整状态快照事件（不写入事件表），事件ID取该拍卖最新事件的ID"""
+        sequence = Event.get_latest_id(auction_id)
+        return {'id': str(sequence), 'seq': sequence, 'type': 'snapshot', 'data': data}
+    
+    def replay(self, auction_id, last_event_id):
+        """返回 last_event_id 之后的事件；无法确定客户端错过了哪些事件时返回None"""
+        if not last_event_id or not last_event_id.isdigit():
+            return None
+        last_id = int(last_event_id)
+        latest = Event.get_latest_id()
+        if last_id > latest:
+            return None
+        oldest = Event.get_oldest_id()
+        # 事件表已清空时，下一个事件即最早可补发的事件
+        if last_id + 1 < (oldest if oldest is not None else latest + 1):
+            # 中间的事件可能已从事件表中清理，需要重新发送完整快照
+            return None
+        rows = Event.get_after(last_id, self.history_size + 1, auction_id)
+        if len(rows) > self.history_size:
+            return None
+        return [self._to_event(row) for row in rows]
+    
+    def _ensure_started(self):
+        """首次发布或订阅时启动后台线程（在工作进程fork之后启动）"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='event-hub', daemon=True)
+                self._thread.start()
+    
+    def _run(self):
+        next_prune = 0
+        while True:
+            batch = self._drain()
+            try:
+                if self._last_id is None:
+                    # 只投递启动之后的事件，之前的事件由新连接的补发或快照覆盖
+                    self._last_id = Event.get_latest_id()
+                if batch:
+                    Event.append_many(batch)
+                self._dispatch()
+                if time.monotonic() >= next_prune:
+                    Event.prune(time.time() - self.retention_seconds)
+                    next_prune = time.monotonic() + self.retention_seconds / 10
+            except Exception as e:
+                logger.error(f"Event hub failed, {len(batch)} events dropped: {e}")
+                time.sleep(self.poll_seconds)
+    
+    def _drain(self):
+        """等待待写入的事件（最多等待一个轮询间隔），返回当前排队的全部事件"""
+        batch = []
+        try:
+            batch.append(self._pending.get(timeout=self.poll_seconds))
+            while True:
+                batch.append(self._pending.get_nowait())
+        except queue.Empty:
+            return batch
+    
+    def _dispatch(self):
+        """按ID顺序读取新事件，投递给本进程中的订阅者"""
+        while True:
+            rows = Event.get_after(self._last_id, 500)
+            for row in rows:
+                self._last_id = row['id']
+                with self._lock:
+                    subscribers = list(self._subscribers.get(row['auction_id'], ()))
+                if subscribers:
+                    event = self._to_event(row)
+                    for subscription in subscribers:
+                        subscription.deliver(event)
+            if len(rows) < 500:
+                return
+    
+    @staticmethod
+    def _to_event(row):
+        return {'id': str(row['id']), 'seq': row['id'], 'type': row['type'], 'data': json.loads(row['data'])}
+
+def format_sse(event):
+    """将事件格式化为SSE文本"""
+    data = json.dumps(event['data'], ensure_ascii=False)
+    lines = []
+    if event.get('id') is not None:
+        lines.append(f"id: {event['id']}")
+    lines.append(f"event: {event['type']}")
+    lines.append(f'data: {data}')
+    return '\n'.join(lines) + '\n\n'
+
+hub = EventHub(
+    max_subscribers=Config.SSE_MAX_SUBSCRIBERS_PER_AUCTION,
+    history_size=Config.SSE_HISTORY_SIZE,
+    queue_size=Config.SSE_QUEUE_SIZE,
+    poll_seconds=Config.SSE_EVENT_POLL_SECONDS,
+    retention_seconds=Config.SSE_EVENT_RETENTION_SECONDS,
+)
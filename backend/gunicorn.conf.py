@@ -0,0 +1,18 @@
+"""gunicorn配置，可通过环境变量调整
+
+使用 uvicorn 工作进程运行 asgi:app：实时推送（SSE）连接在事件循环中等待，不占用线程，
+打开的详情页再多也不会阻塞出价和其他请求；其余接口由 asgi.py 交给Flask处理。
+"""
+import os
+
+bind = os.environ.get('BIND') or '0.0.0.0:3000'
+# 多个工作进程时需要设置 CACHE_BACKEND=redis 才能使用读缓存（进程内缓存会被停用，见 cache.create_backend）
+workers = int(os.environ.get('WEB_CONCURRENCY') or 1)
+worker_class = 'uvicorn.workers.UvicornWorker'
+# SSE连接会长时间保持，超时只用于检测卡死的工作进程
+timeout = 60
+graceful_timeout = 30
+# 不预加载应用：每个工作进程在fork之后各自创建连接池和定时任务线程
+preload_app = False
+# 访问日志由应用按请求写出（含耗时，见 logs.log_access），不再重复记录
+accesslog = None
@@ -0,0 +1,167 @@
+from flask import Blueprint, jsonify, request, send_from_directory
+from database import get_db, release_db
+from config import Config
+import thumbnails
+import base64
+import binascii
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import threading
+
+image_bp = Blueprint('images', __name__, url_prefix='/api/images')
+
+# 允许存储的图片类型及对应扩展名
+ALLOWED_IMAGE_TYPES = {
+    'image/jpeg': 'jpg',
+    'image/png': 'png',
+    'image/gif': 'gif',
+    'image/webp': 'webp',
+    'image/bmp': 'bmp',
+}
+
+DATA_URL_PATTERN = re.compile(r'^data:(?P<mime>image/[a-zA-Z0-9.+-]+);base64,(?P<data>.+)$', re.DOTALL)
+IMAGE_KEY_PATTERN = re.compile(r'^[0-9a-f]{64}\.[a-z]+$')
+IMAGE_URL_PREFIX = '/api/images/'
+EXTERNAL_URL_PATTERN = re.compile(r'^https?://', re.IGNORECASE)
+
+def get_image_folder():
+    """获取图片存储目录"""
+    return os.path.join(Config.UPLOAD_FOLDER, 'images')
+
+def image_url(image_key):
+    """根据图片键生成访问URL"""
+    return IMAGE_URL_PREFIX + image_key
+
+def thumbnail_url(image_key, size='small'):
+    """根据图片键生成缩略图URL"""
+    return f'{IMAGE_URL_PREFIX}{image_key}?size={size}'
+
+def is_external_url(value):
+    """是否为外部图片链接（原样保存在 auctions.images 中，不进入图片存储）"""
+    return bool(EXTERNAL_URL_PATTERN.match(value))
+
+def generate_thumbnails(images):
+    """在后台为新上传的图片生成缩略图，不阻塞当前请求（外部链接跳过）"""
+    thumbnails.schedule(get_image_folder(), [image for image in images if not is_external_url(image)])
+
+def save_image(value):
+    """保存图片并返回图片键（内容哈希+扩展名）
+    
+    支持base64 data URL；已经是本站图片URL的直接返回对应的键；
+    http(s) 外部链接与原来一样原样返回，不下载。
+    相同内容的图片只会保存一份。格式不正确时抛出ValueError。
+    """
+    if not isinstance(value, str):
+        raise ValueError('图片格式不正确')
+    
+    if is_external_url(value):
+        return value
+    
+    if value.startswith(IMAGE_URL_PREFIX):
+        image_key = value[len(IMAGE_URL_PREFIX):]
+        if IMAGE_KEY_PATTERN.match(image_key) and os.path.exists(os.path.join(get_image_folder(), image_key)):
+            return image_key
+        raise ValueError('图片不存在')
+    
+    match = DATA_URL_PATTERN.match(value)
+    if not match or match.group('mime').lower() not in ALLOWED_IMAGE_TYPES:
+        raise ValueError('图片格式不正确')
+    
+    try:
+        data = base64.b64decode(match.group('data'), validate=True)
+    except (binascii.Error, ValueError):
+        raise ValueError('图片数据无法解析')
+    
+    extension = ALLOWED_IMAGE_TYPES[match.group('mime').lower()]
+    image_key = f'{hashlib.sha256(data).hexdigest()}.{extension}'
+    folder = get_image_folder()
+    path = os.path.join(folder, image_key)
+    if not os.path.exists(path):
+        os.makedirs(folder, exist_ok=True)
+        # 先写临时文件再原子替换，避免并发写入时读到不完整的文件；
+        # 临时文件名包含线程ID，同一进程中并发上传相同图片时各自写入自己的临时文件
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return image_key
+
+def migrate_inline_images():
+    """将 auctions.images 中内联的base64图片迁移到图片存储
+    
+    迁移后图片记录写入 auction_images 表，auctions.images 中只保留
+    无法迁移的外部链接。返回迁移的拍卖数量。
+    """
+    conn = get_db()
+    cursor = conn.cursor()
+    migrated = 0
+    try:
+        cursor.execute("SELECT id, images FROM auctions WHERE images LIKE '%data:image/%'")
+        rows = cursor.fetchall()
+        for row in rows:
+            images = json.loads(row['images']) if row['images'] else []
+            cursor.execute('SELECT COALESCE(MAX(position) + 1, 0) AS next FROM auction_images WHERE auction_id = ?',
+                           (row['id'],))
+            position = cursor.fetchone()['next']
+            remaining = []
+            for image in images:
+                if not isinstance(image, str) or is_external_url(image):
+                    remaining.append(image)
+                    continue
+                try:
+                    image_key = save_image(image)
+                except ValueError:
+                    remaining.append(image)
+                    continue
+                cursor.execute('''
+                    INSERT INTO auction_images (auction_id, position, image_key)
+                    VALUES (?, ?, ?)
+                ''', (row['id'], position, image_key))
+                position += 1
+            cursor.execute('UPDATE auctions SET images = ? WHERE id = ?', (json.dumps(remaining), row['id']))
+            conn.commit()
+            migrated += 1
+    finally:
+        release_db(conn)
+    return migrated
+
+@image_bp.route('/<image_key>', methods=['GET'])
+def get_image(image_key):
+    """获取图片（内容寻址，可长期缓存），size参数可获取缩略图"""
+    if not IMAGE_KEY_PATTERN.match(image_key):
+        return jsonify({'error': '图片不存在'}), 404
+    
+    folder = get_image_folder()
+    source_path = os.path.join(folder, image_key)
+    if not os.path.exists(source_path):
+        return jsonify({'error': '图片不存在'}), 404
+    
+    size = request.args.get('size')
+    if size and size not in Config.IMAGE_VARIANTS:
+        return jsonify({'error': '不支持的图片尺寸'}), 400
+    
+    filename, mimetype, etag = image_key, mimetypes.guess_type(image_key)[0], image_key.split('.')[0]
+    if size:
+        # 旧拍卖没有预先生成缩略图，首次请求时生成；无法生成时返回原图
+        variant_path = thumbnails.get_variant(source_path, image_key, size)
+        if variant_path:
+            folder = os.path.dirname(variant_path)
+            filename = os.path.basename(variant_path)
+            mimetype = thumbnails.get_variant_format()[2]
+            etag = f'{etag}-{size}'
+    
+    # 图片键即内容哈希，内容不会变化，因此可以用作ETag并设置长期缓存
+    response = send_from_directory(
+        folder,
+        filename,
+        mimetype=mimetype,
+        etag=etag,
+        max_age=31536000,
+        conditional=True,
+    )
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
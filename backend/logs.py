@@ -0,0 +1,158 @@
+from logging.handlers import QueueHandler, QueueListener
+from config import Config
+import atexit
+import json
+import logging
+import metrics
+import queue
+import random
+import sys
+import threading
+import time
+
+access_logger = logging.getLogger('access')
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出为一行JSON；访问日志直接输出各字段"""
+    
+    def format(self, record):
+        entry = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created)) + f'.{int(record.msecs):03d}',
+            'level': record.levelname,
+            'logger': record.name,
+        }
+        access = getattr(record, 'access', None)
+        if access is not None:
+            entry.update(access)
+        else:
+            entry['message'] = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class DroppingQueueHandler(QueueHandler):
+    """把日志放入有界队列，队列已满时丢弃而不是阻塞请求线程"""
+    
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+    
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class BatchStreamHandler(logging.StreamHandler):
+    """把一批日志合并为一次写入和一次flush"""
+    
+    def emit_batch(self, records):
+        lines = []
+        for record in records:
+            try:
+                lines.append(self.format(record))
+            except Exception:
+                self.handleError(record)
+        if not lines:
+            return
+        self.acquire()
+        try:
+            self.stream.write('\n'.join(lines) + self.terminator)
+            self.flush()
+        except Exception:
+            self.handleError(records[-1])
+        finally:
+            self.release()
+
+class BatchingQueueListener(QueueListener):
+    """后台线程一次取出队列中已有的多条日志（最多 batch_size 条），批量交给处理器写出"""
+    
+    def __init__(self, log_queue, handler, batch_size):
+        super().__init__(log_queue, handler, respect_handler_level=True)
+        self.batch_size = batch_size
+    
+    def enqueue_sentinel(self):
+        # 队列已满时也要等待放入结束标记，保证退出前已有的日志全部写出
+        self.queue.put(self._sentinel)
+    
+    def _monitor(self):
+        while True:
+            record = self.queue.get()
+            batch = []
+            stopping = False
+            while True:
+                if record is self._sentinel:
+                    stopping = True
+                    break
+                batch.append(self.prepare(record))
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    record = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                self.handle_batch(batch)
+            if stopping:
+                return
+    
+    def handle_batch(self, records):
+        for handler in self.handlers:
+            accepted = [record for record in records if record.levelno >= handler.level]
+            if accepted:
+                handler.emit_batch(accepted)
+
+_listener = None
+_queue_handler = None
+_lock = threading.Lock()
+
+def configure_logging():
+    """配置根日志：请求线程只把日志放入队列，由后台线程格式化并批量写到stderr"""
+    global _listener, _queue_handler
+    with _lock:
+        if _listener is not None:
+            return
+        handler = BatchStreamHandler(sys.stderr)
+        if Config.LOG_FORMAT == 'json':
+            handler.setFormatter(JsonFormatter())
+        else:
+            handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                                                   datefmt='%Y-%m-%d %H:%M:%S'))
+        _queue_handler = DroppingQueueHandler(queue.Queue(Config.LOG_QUEUE_SIZE))
+        root = logging.getLogger()
+        for existing in root.handlers[:]:
+            root.removeHandler(existing)
+        root.addHandler(_queue_handler)
+        root.setLevel(Config.LOG_LEVEL)
+        _listener = BatchingQueueListener(_queue_handler.queue, handler, Config.LOG_BATCH_SIZE)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+def log_access(method, path, status, seconds, client_ip, user_agent):
+    """记录一条访问日志（每个请求一条）；成功的GET请求按 ACCESS_LOG_SAMPLE_RATE 抽样"""
+    if (method == 'GET' and status < 400 and Config.ACCESS_LOG_SAMPLE_RATE < 1
+            and random.random() >= Config.ACCESS_LOG_SAMPLE_RATE):
+        return
+    if not access_logger.isEnabledFor(logging.INFO):
+        return
+    duration_ms = round(seconds * 1000, 1)
+    access_logger.info('[%s] %s %s - Status: %s - %sms', client_ip, method, path, status, duration_ms, extra={
+        'access': {
+            'client_ip': client_ip,
+            'method': method,
+            'path': path,
+            'status': status,
+            'duration_ms': duration_ms,
+            'user_agent': user_agent,
+        },
+    })
+
+def _collect_logging():
+    return [
+        ('log_records_dropped_total', 'counter', '日志队列已满时丢弃的日志条数',
+         [([], _queue_handler.dropped if _queue_handler else 0)]),
+    ]
+
+metrics.register_collector(_collect_logging)
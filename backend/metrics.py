@@ -0,0 +1,205 @@
+from contextvars import ContextVar
+from cache import cache
+from config import Config
+import bisect
+import cProfile
+import logging
+import os
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# 请求耗时（秒）的默认分桶
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_metrics = []
+_collectors = []
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+class Counter:
+    """只增不减的计数器"""
+    
+    kind = 'counter'
+    
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}  # 标签值 -> 计数
+        self._lock = threading.Lock()
+        _metrics.append(self)
+    
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [(self.name, list(zip(self.labelnames, key)), value) for key, value in items]
+
+class Histogram:
+    """分桶统计的直方图，输出累计分桶、总和与次数"""
+    
+    kind = 'histogram'
+    
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # 标签值 -> [各分桶的计数（不累计）, 总和, 次数]
+        self._lock = threading.Lock()
+        _metrics.append(self)
+    
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+    
+    def samples(self):
+        with self._lock:
+            items = sorted((key, ([*counts], total, count)) for key, (counts, total, count) in self._values.items())
+        result = []
+        for key, (counts, total, count) in items:
+            labels = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, float('inf')), counts):
+                cumulative += bucket_count
+                result.append((f'{self.name}_bucket', [*labels, ('le', _format_value(float(bound)))], cumulative))
+            result.append((f'{self.name}_sum', labels, total))
+            result.append((f'{self.name}_count', labels, count))
+        return result
+
+def register_collector(collector):
+    """注册在抓取时才计算的指标
+    
+    collector() 返回 [(指标名, 类型, 说明, [(标签列表, 值)])]，用于读取其他模块已有的统计数据。
+    """
+    _collectors.append(collector)
+
+def render():
+    """按Prometheus文本格式输出当前进程的所有指标"""
+    lines = []
+    for metric in _metrics:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        for name, labels, value in metric.samples():
+            lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+    for collector in _collectors:
+        try:
+            families = collector()
+        except Exception as e:
+            logger.error(f"Metrics collector {collector.__name__} failed: {e}")
+            continue
+        for name, kind, documentation, samples in families:
+            lines.append(f'# HELP {name} {documentation}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+REQUEST_SECONDS = Histogram('http_request_duration_seconds', '请求处理耗时（流式响应只计算到开始发送）',
+                            ('method', 'endpoint', 'status'))
+REQUEST_QUERIES = Histogram('http_request_db_queries', '每个请求执行的SQL语句数', ('endpoint',),
+                            buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100))
+REQUEST_QUERY_SECONDS = Histogram('http_request_db_seconds', '每个请求执行SQL的总耗时', ('endpoint',))
+DB_QUERIES = Counter('db_queries_total', '执行的SQL语句总数（包括定时任务）')
+DB_QUERY_SECONDS = Counter('db_query_seconds_total', '执行SQL的总耗时（包括定时任务）')
+JOB_SECONDS = Histogram('scheduler_job_duration_seconds', '定时任务单次执行耗时', ('job',))
+SETTLED = Counter('auctions_settled_total', '已结算的拍卖数量', ('status',))
+BID_WRITE_BATCH = Histogram('bid_write_batch_size', '出价引擎每次合并提交的出价数',
+                            buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500))
+BID_WRITE_SECONDS = Histogram('bid_write_duration_seconds', '出价引擎每次合并提交的耗时')
+
+class QueryStats:
+    """当前请求执行的SQL次数和耗时"""
+    
+    __slots__ = ('count', 'seconds')
+    
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+_query_stats = ContextVar('query_stats', default=None)
+
+def record_query(seconds):
+    """记录一条SQL的执行耗时（由数据库连接调用）"""
+    DB_QUERIES.inc()
+    DB_QUERY_SECONDS.inc(seconds)
+    stats = _query_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += seconds
+
+def start_request():
+    """开始统计当前请求的SQL次数和耗时"""
+    _query_stats.set(QueryStats())
+
+def finish_request(method, endpoint, status, seconds):
+    """记录请求耗时；在 start_request 之后调用时同时记录该请求的SQL次数和耗时"""
+    REQUEST_SECONDS.observe(seconds, method=method, endpoint=endpoint, status=status)
+    stats = _query_stats.get()
+    if stats is not None:
+        _query_stats.set(None)
+        REQUEST_QUERIES.observe(stats.count, endpoint=endpoint)
+        REQUEST_QUERY_SECONDS.observe(stats.seconds, endpoint=endpoint)
+
+def start_profile():
+    """按 1/PROFILE_SAMPLE_RATE 的比例对当前请求启用cProfile，未被抽中时返回None"""
+    if Config.PROFILE_SAMPLE_RATE <= 0 or random.randrange(Config.PROFILE_SAMPLE_RATE):
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # 同一线程上已有其他分析器在运行
+        return None
+    return profiler
+
+def finish_profile(profiler, method, endpoint, seconds):
+    """停止分析并把结果写入 PROFILE_DIR（可用 python -m pstats 或 snakeviz 查看）"""
+    profiler.disable()
+    now = time.time()
+    filename = (f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}.{int(now * 1000) % 1000:03d}"
+                f"-{os.getpid()}-{threading.get_native_id()}-{method}-{endpoint}-{int(seconds * 1000)}ms.prof")
+    try:
+        os.makedirs(Config.PROFILE_DIR, exist_ok=True)
+        profiler.dump_stats(os.path.join(Config.PROFILE_DIR, filename))
+    except OSError as e:
+        logger.error(f"Failed to write profile {filename}: {e}")
+
+def _collect_cache():
+    stats = cache.stats()
+    return [
+        ('cache_requests_total', 'counter', '读缓存查询次数',
+         [([('namespace', namespace), ('result', result)], counts[field])
+          for namespace, counts in sorted(stats.items()) for result, field in (('hit', 'hits'), ('miss', 'misses'))]),
+        ('cache_hit_ratio', 'gauge', '读缓存命中率',
+         [([('namespace', namespace)], counts['hit_rate']) for namespace, counts in sorted(stats.items())]),
+    ]
+
+register_collector(_collect_cache)
@@ -1,8 +1,239 @@
-from database import get_db
-from werkzeug.security import generate_password_hash, check_password_hash
+from database import get_db, release_db
+from cache import cache
+from config import Config
+from images import image_url, is_external_url, thumbnail_url
+from utils import END_TIME_FORMAT, normalize_end_time
+import passwords
+import base64
+import binascii
 import json
 import sqlite3
-from datetime import datetime
+import time
+from datetime import datetime, timedelta, timezone
+
+# 用户资料中可以缓存和返回给前端的字段（不含密码哈希）
+USER_PUBLIC_FIELDS = ('id', 'username', 'email', 'created_at')
+
+# 出价统计（由 idx_bids_auction_bidder 覆盖索引支持，每行只扫描该拍卖的出价）
+BID_STATS_COLUMNS = '''
+    (SELECT COUNT(*) FROM bids b WHERE b.auction_id = a.id) AS bid_count,
+    (SELECT COUNT(DISTINCT b.bidder_id) FROM bids b WHERE b.auction_id = a.id) AS bidder_count
+'''
+
+# 列表排序方式：排序字段及方向（id作为相同时间的次序，保证游标分页稳定）
+AUCTION_ORDERS = {
+    'created_at': ('a.created_at', 'DESC'),
+    'end_time': ('a.end_time', 'ASC'),
+}
+
+def encode_cursor(*values):
+    """将最后一行的排序键编码为不透明的分页游标"""
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor, size=2):
+    """解码分页游标，格式不正确时抛出ValueError
+    
+    排序键只能是字符串或数字（时间、相关度），最后一项为行ID（整数），其他类型无法作为SQL参数绑定。
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        raise ValueError('分页游标无效')
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError('分页游标无效')
+    if any(isinstance(value, bool) or not isinstance(value, (str, int, float)) for value in values):
+        raise ValueError('分页游标无效')
+    if not isinstance(values[-1], int):
+        raise ValueError('分页游标无效')
+    return values
+
+def _keyset_clause(column, direction, id_column=None):
+    """生成 (排序字段, id) 的键集分页条件"""
+    operator = '<' if direction == 'DESC' else '>'
+    id_column = id_column or f'{column.split(".")[0]}.id'
+    return f' AND ({column}, {id_column}) {operator} (?, ?)'
+
+def _fetch_keyset_page(cursor, query, params, limit, sort_field, id_field='id'):
+    """执行已带排序的查询，多取一行判断是否还有下一页，返回 (行, 下一页游标)"""
+    cursor.execute(query + ' LIMIT ?', [*params, limit + 1])
+    rows = cursor.fetchall()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][sort_field], rows[-1][id_field])
+    return rows, next_cursor
+
+def is_due(end_time, now=None):
+    """拍卖是否已到结束时间（按存储格式与服务器本地时间比较，与出价、软结束的SQL条件一致；格式不正确时视为已到期）"""
+    try:
+        end_time = normalize_end_time(end_time)
+    except ValueError:
+        return True
+    return end_time <= (now or datetime.now()).strftime(END_TIME_FORMAT)
+
+def soft_close_end_time(auction, now=None):
+    """按软结束规则计算出价后的结束时间：结束前 soft_close_window 秒内出价时，
+    结束时间顺延到出价后 soft_close_extension 秒（已更晚时不变），未启用或不在窗口内时返回原结束时间
+    
+    与 SOFT_CLOSE_END_TIME 的规则一致。
+    """
+    end_time = normalize_end_time(auction['end_time'])
+    window = auction.get('soft_close_window') or 0
+    extension = auction.get('soft_close_extension') or 0
+    if window <= 0 or extension <= 0:
+        return end_time
+    now = now or datetime.now()
+    if end_time > (now + timedelta(seconds=window)).strftime(END_TIME_FORMAT):
+        return end_time
+    return max(end_time, (now + timedelta(seconds=extension)).strftime(END_TIME_FORMAT))
+
+# 软结束规则的SQL版本（参数依次为两次出价时间，均为存储格式的本地时间），与 soft_close_end_time 一致；
+# 按字符串比较，依赖 end_time 已统一为存储格式（见 utils.normalize_end_time）
+SOFT_CLOSE_END_TIME = f'''
+    CASE
+        WHEN soft_close_window > 0 AND soft_close_extension > 0
+             AND end_time <= strftime('{END_TIME_FORMAT}', ?, '+' || soft_close_window || ' seconds')
+        THEN MAX(end_time, strftime('{END_TIME_FORMAT}', ?, '+' || soft_close_extension || ' seconds'))
+        ELSE end_time
+    END
+'''
+
+def proxy_timestamp():
+    """代理出价的登记时间（UTC，精确到微秒），最高价相同时先登记的优先"""
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S.%f')
+
+def resolve_proxies(price, leader_id, increment, proxies):
+    """一次计算出代理出价之间的竞争结果，返回需要写入的出价 [(出价者ID, 金额)]（按写入顺序，最多两条）
+    
+    price/leader_id 为当前最高价和最高出价者，proxies 为该拍卖的代理出价，
+    按 (最高价从高到低, 登记时间从早到晚) 排序，至少包含前三名及当前最高出价者的代理。
+    胜出的代理出价为第二名的最高价（或当前价）加一个最低加价幅度，且不超过自己的最高价；
+    第二名若是代理出价，则先以其最高价出价一次。不再逐次加价，写入的出价数与代理数量无关。
+    """
+    leader_proxy = next((proxy for proxy in proxies if proxy['bidder_id'] == leader_id), None)
+    challengers = [proxy for proxy in proxies
+                   if proxy['bidder_id'] != leader_id and proxy['max_amount'] >= price + increment]
+    if not challengers:
+        return []
+    challenger = challengers[0]
+    if leader_proxy is not None and proxies.index(leader_proxy) < proxies.index(challenger):
+        # 当前最高出价者的代理排在前面：挑战者出到最高价，最高出价者自动加价应对
+        return [(challenger['bidder_id'], challenger['max_amount']),
+                (leader_id, round(min(leader_proxy['max_amount'], challenger['max_amount'] + increment), 2))]
+    # 挑战者胜出：第二名是当前最高出价者（按其代理最高价或当前价）与其余挑战者中较高的一方
+    runner_id, runner_amount = leader_id, price
+    if leader_proxy is not None and leader_proxy['max_amount'] > price:
+        runner_amount = leader_proxy['max_amount']
+    if len(challengers) > 1 and challengers[1]['max_amount'] > runner_amount:
+        runner_id, runner_amount = challengers[1]['bidder_id'], challengers[1]['max_amount']
+    bids = []
+    if runner_id is not None and runner_amount >= price + increment:
+        bids.append((runner_id, runner_amount))
+    bids.append((challenger['bidder_id'], round(min(challenger['max_amount'], runner_amount + increment), 2)))
+    return bids
+
+def _load_proxies(cursor, auction_id, leader_id):
+    """读取竞争需要的代理出价：最高的三个及当前最高出价者的代理（已排序）"""
+    cursor.execute('''
+        SELECT bidder_id, max_amount, placed_at FROM proxy_bids
+        WHERE auction_id = ?
+        ORDER BY max_amount DESC, placed_at, id
+        LIMIT 3
+    ''', (auction_id,))
+    proxies = [dict(row) for row in cursor.fetchall()]
+    if leader_id is not None and all(proxy['bidder_id'] != leader_id for proxy in proxies):
+        cursor.execute('''
+            SELECT bidder_id, max_amount, placed_at FROM proxy_bids
+            WHERE auction_id = ? AND bidder_id = ?
+        ''', (auction_id, leader_id))
+        row = cursor.fetchone()
+        if row:
+            # 排在前三名之后，最高价不高于第三名
+            proxies.append(dict(row))
+    return proxies
+
+def _write_proxy_bids(cursor, auction_id, resolved, now):
+    """在当前事务中写入代理出价产生的出价，并更新最高价（按软结束规则顺延结束时间）
+    
+    返回 (写入的出价记录, 出价后拍卖的结束时间)，没有需要写入的出价时结束时间为None。
+    """
+    bids = []
+    for bidder_id, amount in resolved:
+        cursor.execute('''
+            INSERT INTO bids (auction_id, bidder_id, amount)
+            VALUES (?, ?, ?)
+            RETURNING *
+        ''', (auction_id, bidder_id, amount))
+        bid = dict(cursor.fetchone())
+        _record_participation(cursor, bid)
+        bids.append(bid)
+    if not bids:
+        return bids, None
+    cursor.execute(f'''
+        UPDATE auctions
+        SET current_price = ?, current_bidder_id = ?, updated_at = CURRENT_TIMESTAMP,
+            end_time = {SOFT_CLOSE_END_TIME}
+        WHERE id = ?
+        RETURNING end_time
+    ''', (bids[-1]['amount'], bids[-1]['bidder_id'], now, now, auction_id))
+    return bids, cursor.fetchone()['end_time']
+
+def _record_participation(cursor, bid):
+    """在出价的事务中更新该用户在该拍卖上的出价汇总"""
+    cursor.execute('''
+        INSERT INTO user_auction_participation (user_id, auction_id, max_amount, bid_count, last_bid_at)
+        VALUES (?, ?, ?, 1, ?)
+        ON CONFLICT(user_id, auction_id) DO UPDATE
+        SET max_amount = MAX(max_amount, excluded.max_amount),
+            bid_count = bid_count + 1,
+            last_bid_at = excluded.last_bid_at
+    ''', (bid['bidder_id'], bid['auction_id'], bid['amount'], bid['created_at']))
+
+# 搜索排序：bm25相关度（越小越相关），标题的权重高于描述
+SEARCH_RANK = 'bm25(auctions_fts, 5.0, 1.0)'
+# trigram分词只能匹配至少3个字符的关键词，更短的关键词（如两个字的中文词）用LIKE过滤
+SEARCH_MIN_MATCH_LENGTH = 3
+
+def _fts_phrase(term):
+    """把关键词转为FTS5短语，避免其中的引号和运算符被当作查询语法"""
+    return '"' + term.replace('"', '""') + '"'
+
+def _like_pattern(term):
+    return '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+def _split_images(images):
+    """把发布时的图片分为图片存储中的图片键和外部链接（外部链接保存在 auctions.images 中）"""
+    images = images or []
+    return ([image for image in images if not is_external_url(image)],
+            json.dumps([image for image in images if is_external_url(image)]))
+
+def _attach_images(cursor, auctions, first_only=False):
+    """批量为拍卖附加图片URL（图片存储中的图片在前，未迁移的外部链接在后）及首图缩略图URL"""
+    for auction in auctions:
+        auction['images'] = json.loads(auction['images']) if auction['images'] else []
+        auction['thumbnail'] = auction['images'][0] if auction['images'] else None
+    if not auctions:
+        return auctions
+    by_id = {auction['id']: auction for auction in auctions}
+    placeholders = ','.join('?' * len(by_id))
+    query = f'''
+        SELECT auction_id, image_key FROM auction_images
+        WHERE auction_id IN ({placeholders})
+    '''
+    if first_only:
+        query += ' AND position = (SELECT MIN(position) FROM auction_images i WHERE i.auction_id = auction_images.auction_id)'
+    query += ' ORDER BY auction_id, position'
+    cursor.execute(query, list(by_id))
+    stored = {}
+    for row in cursor.fetchall():
+        if row['auction_id'] not in stored:
+            by_id[row['auction_id']]['thumbnail'] = thumbnail_url(row['image_key'])
+        stored.setdefault(row['auction_id'], []).append(image_url(row['image_key']))
+    for auction_id, urls in stored.items():
+        by_id[auction_id]['images'] = urls + by_id[auction_id]['images']
+    return auctions
 
 class User:
     @staticmethod
@@ -10,7 +241,7 @@ class User:
         """创建新用户"""
         conn = get_db()
         cursor = conn.cursor()
-        hashed_password = generate_password_hash(password)
+        hashed_password = passwords.hash_password(password)
         try:
             cursor.execute('''
                 INSERT INTO users (username, email, password)
@@ -22,7 +253,7 @@ class User:
         except sqlite3.IntegrityError:
             return None
         finally:
-            conn.close()
+            release_db(conn)
     
     @staticmethod
     def get_by_id(user_id):
@@ -31,9 +262,42 @@ class User:
         cursor = conn.cursor()
         cursor.execute('SELECT * FROM users WHERE id = ?', (user_id,))
         row = cursor.fetchone()
-        conn.close()
+        release_db(conn)
         return dict(row) if row else None
     
+    @staticmethod
+    def get_profile(user_id):
+        """获取用户公开资料（经过缓存，不含密码哈希）"""
+        return cache.get_or_load('user', user_id, lambda: User.public_profile(User.get_by_id(user_id)),
+                                 depends_on=f'user:{user_id}', ttl=Config.USER_CACHE_TTL_SECONDS)
+    
+    @staticmethod
+    def get_profiles(user_ids):
+        """批量获取用户公开资料，返回 {用户ID: 资料}（一条IN查询，不经过缓存）"""
+        user_ids = set(user_ids)
+        if not user_ids:
+            return {}
+        conn = get_db()
+        cursor = conn.cursor()
+        placeholders = ','.join('?' * len(user_ids))
+        cursor.execute(f'SELECT * FROM users WHERE id IN ({placeholders})', list(user_ids))
+        profiles = {row['id']: User.public_profile(dict(row)) for row in cursor.fetchall()}
+        release_db(conn)
+        return profiles
+    
+    @staticmethod
+    def public_profile(user):
+        """只保留用户的公开字段"""
+        if not user:
+            return None
+        return {field: user[field] for field in USER_PUBLIC_FIELDS}
+    
+    @staticmethod
+    def cache_profile(user):
+        """登录/注册时已查询到用户，直接写入资料缓存"""
+        cache.put('user', user['id'], User.public_profile(user),
+                  depends_on=f"user:{user['id']}", ttl=Config.USER_CACHE_TTL_SECONDS)
+    
     @staticmethod
     def get_by_username(username):
         """根据用户名获取用户"""
@@ -41,7 +305,7 @@ class User:
         cursor = conn.cursor()
         cursor.execute('SELECT * FROM users WHERE username = ?', (username,))
         row = cursor.fetchone()
-        conn.close()
+        release_db(conn)
         return dict(row) if row else None
     
     @staticmethod
@@ -51,36 +315,133 @@ class User:
         cursor = conn.cursor()
         cursor.execute('SELECT * FROM users WHERE email = ?', (email,))
         row = cursor.fetchone()
-        conn.close()
+        release_db(conn)
         return dict(row) if row else None
     
     @staticmethod
     def verify_password(user, password):
-        """验证密码"""
-        return check_password_hash(user['password'], password)
+        """验证密码（在密码哈希线程池中计算，繁忙时抛出HashingBusy）"""
+        return passwords.verify_password(user['password'], password)
 
 class Auction:
     @staticmethod
-    def create(title, description, starting_price, end_time, seller_id, images=None, min_increment=0.01):
-        """创建拍卖标的"""
+    def create(title, description, starting_price, end_time, seller_id, images=None, min_increment=0.01,
+               soft_close_window=0, soft_close_extension=0):
+        """创建拍卖标的（images为图片存储中的图片键或外部链接列表，soft_close_* 为0时不启用软结束）"""
+        end_time = normalize_end_time(end_time)
+        image_keys, links = _split_images(images)
         conn = get_db()
         cursor = conn.cursor()
-        images_json = json.dumps(images) if images else '[]'
         try:
             cursor.execute('''
-                INSERT INTO auctions (title, description, starting_price, current_price, 
-                                   seller_id, end_time, images, min_increment)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (title, description, starting_price, starting_price, seller_id, end_time, images_json, min_increment))
-            conn.commit()
+                INSERT INTO auctions (title, description, starting_price, current_price,
+                                   seller_id, end_time, images, min_increment, soft_close_window, soft_close_extension)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (title, description, starting_price, starting_price, seller_id, end_time, links, min_increment,
+                  soft_close_window, soft_close_extension))
             auction_id = cursor.lastrowid
+            cursor.executemany('''
+                INSERT INTO auction_images (auction_id, position, image_key)
+                VALUES (?, ?, ?)
+            ''', [(auction_id, position, image_key) for position, image_key in enumerate(image_keys)])
+            conn.commit()
+            cache.invalidate_lists()
             return Auction.get_by_id(auction_id)
         finally:
-            conn.close()
+            release_db(conn)
+    
+    @staticmethod
+    def create_many(seller_id, rows):
+        """在一个事务中批量创建拍卖（rows 为已校验的字段字典列表），返回 [(拍卖ID, 结束时间)]
+        
+        用 executemany 一次插入；事务持有写锁，同一语句插入的自增ID是连续的，
+        由 last_insert_rowid() 倒推每行的ID。
+        """
+        if not rows:
+            return []
+        rows = [{**row, 'end_time': normalize_end_time(row['end_time'])} for row in rows]
+        images = [_split_images(row['images']) for row in rows]
+        conn = get_db()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.executemany('''
+                INSERT INTO auctions (title, description, starting_price, current_price,
+                                   seller_id, end_time, images, min_increment, soft_close_window, soft_close_extension)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [(row['title'], row['description'], row['starting_price'], row['starting_price'],
+                   seller_id, row['end_time'], links, row['min_increment'], row['soft_close_window'],
+                   row['soft_close_extension']) for row, (_, links) in zip(rows, images)])
+            cursor.execute('SELECT last_insert_rowid()')
+            first_id = cursor.fetchone()[0] - len(rows) + 1
+            ids = range(first_id, first_id + len(rows))
+            cursor.executemany('''
+                INSERT INTO auction_images (auction_id, position, image_key)
+                VALUES (?, ?, ?)
+            ''', [(auction_id, position, image_key)
+                  for auction_id, (image_keys, _) in zip(ids, images) for position, image_key in enumerate(image_keys)])
+            conn.commit()
+            cache.invalidate_lists()
+            return [(auction_id, row['end_time']) for auction_id, row in zip(ids, rows)]
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            release_db(conn)
+    
+    @staticmethod
+    def export_by_seller(seller_id, batch_size=500):
+        """逐行导出用户发布的拍卖及其出价（生成器）
+        
+        按拍卖的发布时间排序，每个拍卖先产生 ('auction', 拍卖) 再产生其所有 ('bid', 出价)；
+        每次只从游标取 batch_size 行，不会把全部结果读入内存。
+        连接在生成器结束或被关闭时归还。
+        """
+        conn = get_db()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT a.id, a.title, a.description, a.starting_price, a.current_price, a.min_increment,
+                       a.soft_close_window, a.soft_close_extension, a.current_bidder_id, a.end_time, a.status, a.created_at,
+                       b.id AS bid_id, b.bidder_id, u.username AS bidder_username, b.amount, b.created_at AS bid_created_at
+                FROM auctions a
+                LEFT JOIN bids b ON b.auction_id = a.id
+                LEFT JOIN users u ON b.bidder_id = u.id
+                WHERE a.seller_id = ?
+                ORDER BY a.created_at, a.id, b.id
+            ''', (seller_id,))
+            current_id = None
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    if row['id'] != current_id:
+                        current_id = row['id']
+                        yield 'auction', {key: row[key] for key in (
+                            'id', 'title', 'description', 'starting_price', 'current_price', 'min_increment',
+                            'soft_close_window', 'soft_close_extension', 'current_bidder_id', 'end_time', 'status',
+                            'created_at')}
+                    if row['bid_id'] is not None:
+                        yield 'bid', {
+                            'id': row['bid_id'],
+                            'auction_id': row['id'],
+                            'bidder_id': row['bidder_id'],
+                            'bidder_username': row['bidder_username'],
+                            'amount': row['amount'],
+                            'created_at': row['bid_created_at']
+                        }
+        finally:
+            release_db(conn)
     
     @staticmethod
     def get_by_id(auction_id):
-        """根据ID获取拍卖标的"""
+        """根据ID获取拍卖标的（经过缓存）"""
+        return cache.get_or_load('auction', auction_id, lambda: Auction._query_by_id(auction_id),
+                                 depends_on=f'auction:{auction_id}')
+    
+    @staticmethod
+    def _query_by_id(auction_id):
         conn = get_db()
         cursor = conn.cursor()
         cursor.execute('''
@@ -90,21 +451,58 @@ class Auction:
             WHERE a.id = ?
         ''', (auction_id,))
         row = cursor.fetchone()
-        conn.close()
+        auction = None
         if row:
-            auction = dict(row)
-            auction['images'] = json.loads(auction['images']) if auction['images'] else []
-            return auction
-        return None
+            auction = _attach_images(cursor, [dict(row)])[0]
+        release_db(conn)
+        return auction
     
     @staticmethod
-    def get_list(page=1, per_page=20, status=None, order_by='created_at'):
-        """获取拍卖列表"""
+    def get_many(auction_ids):
+        """批量获取拍卖标的（含发布者用户名、图片和出价统计），返回 {拍卖ID: 拍卖}，不存在的ID不在结果中
+        
+        拍卖和图片各一条IN查询，查询次数与拍卖数量无关；不经过缓存。
+        """
+        auction_ids = set(auction_ids)
+        if not auction_ids:
+            return {}
         conn = get_db()
         cursor = conn.cursor()
+        placeholders = ','.join('?' * len(auction_ids))
+        cursor.execute(f'''
+            SELECT a.*, u.username as seller_username, {BID_STATS_COLUMNS}
+            FROM auctions a
+            JOIN users u ON a.seller_id = u.id
+            WHERE a.id IN ({placeholders})
+        ''', list(auction_ids))
+        auctions = _attach_images(cursor, [dict(row) for row in cursor.fetchall()])
+        release_db(conn)
+        return {auction['id']: auction for auction in auctions}
+    
+    @staticmethod
+    def get_list(page=1, per_page=20, status=None, order_by='created_at', after=None, include_total=False):
+        """获取拍卖列表（经过缓存）
         
-        query = '''
-            SELECT a.*, u.username as seller_username 
+        after 为上一页返回的游标（首页为空字符串）时使用键集分页，不再扫描并丢弃
+        前面的行；此时只有 include_total 为True时才统计总数。
+        返回 (拍卖列表, 总数或None, 下一页游标或None)。
+        """
+        key = f'{page}:{per_page}:{status}:{order_by}:{after}:{include_total}'
+        return cache.get_or_load(
+            'auction_list', key,
+            lambda: Auction._query_list(page, per_page, status, order_by, after, include_total),
+            depends_on='auction_list', ttl=Config.CACHE_LIST_TTL_SECONDS
+        )
+    
+    @staticmethod
+    def _query_list(page, per_page, status, order_by, after, include_total):
+        column, direction = AUCTION_ORDERS.get(order_by, AUCTION_ORDERS['created_at'])
+        keyset = decode_cursor(after) if after else None
+        conn = get_db()
+        cursor = conn.cursor()
+        
+        query = f'''
+            SELECT a.*, u.username as seller_username, {BID_STATS_COLUMNS}
             FROM auctions a
             JOIN users u ON a.seller_id = u.id
             WHERE 1=1
@@ -115,62 +513,138 @@ class Auction:
             query += ' AND a.status = ?'
             params.append(status)
         
-        if order_by == 'created_at':
-            query += ' ORDER BY a.created_at DESC'
-        elif order_by == 'end_time':
-            query += ' ORDER BY a.end_time ASC'
+        if keyset:
+            query += _keyset_clause(column, direction)
+            params.extend(keyset)
         
-        query += ' LIMIT ? OFFSET ?'
-        params.extend([per_page, (page - 1) * per_page])
+        query += f' ORDER BY {column} {direction}, a.id {direction}'
         
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
+        next_cursor = None
+        if after is None:
+            query += ' LIMIT ? OFFSET ?'
+            params.extend([per_page, (page - 1) * per_page])
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+        else:
+            rows, next_cursor = _fetch_keyset_page(cursor, query, params, per_page, column.split('.')[1])
         
-        auctions = []
-        for row in rows:
-            auction = dict(row)
-            auction['images'] = json.loads(auction['images']) if auction['images'] else []
-            auctions.append(auction)
+        # 列表页只需要第一张图片
+        auctions = _attach_images(cursor, [dict(row) for row in rows], first_only=True)
         
         # 获取总数
-        count_query = 'SELECT COUNT(*) as total FROM auctions WHERE 1=1'
-        count_params = []
-        if status:
-            count_query += ' AND status = ?'
-            count_params.append(status)
-        cursor.execute(count_query, count_params)
-        total = cursor.fetchone()['total']
+        total = None
+        if after is None or include_total:
+            count_query = 'SELECT COUNT(*) as total FROM auctions WHERE 1=1'
+            count_params = []
+            if status:
+                count_query += ' AND status = ?'
+                count_params.append(status)
+            cursor.execute(count_query, count_params)
+            total = cursor.fetchone()['total']
         
-        conn.close()
-        return auctions, total
+        release_db(conn)
+        return auctions, total, next_cursor
     
     @staticmethod
-    def get_by_seller(seller_id):
-        """获取用户发布的拍卖"""
+    def get_by_seller(seller_id, limit=None, after=None):
+        """获取用户发布的拍卖
+        
+        指定 limit 时按 (created_at, id) 键集分页，after 为上一页返回的游标。
+        返回 (拍卖列表, 下一页游标或None)。
+        """
+        keyset = decode_cursor(after) if after else None
         conn = get_db()
         cursor = conn.cursor()
-        cursor.execute('SELECT * FROM auctions WHERE seller_id = ? ORDER BY created_at DESC', (seller_id,))
-        rows = cursor.fetchall()
-        auctions = []
-        for row in rows:
-            auction = dict(row)
-            auction['images'] = json.loads(auction['images']) if auction['images'] else []
-            auctions.append(auction)
-        conn.close()
-        return auctions
+        query = f'''
+            SELECT a.*, {BID_STATS_COLUMNS}
+            FROM auctions a
+            WHERE a.seller_id = ?
+        '''
+        params = [seller_id]
+        if keyset:
+            query += _keyset_clause('a.created_at', 'DESC')
+            params.extend(keyset)
+        query += ' ORDER BY a.created_at DESC, a.id DESC'
+        next_cursor = None
+        if limit is None:
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+        else:
+            rows, next_cursor = _fetch_keyset_page(cursor, query, params, limit, 'created_at')
+        auctions = _attach_images(cursor, [dict(row) for row in rows])
+        release_db(conn)
+        return auctions, next_cursor
     
     @staticmethod
-    def update_current_price(auction_id, new_price, bidder_id):
-        """更新当前最高价"""
+    def search(terms, status=None, min_price=None, max_price=None, limit=20, after=None):
+        """按关键词搜索拍卖标题和描述（所有关键词都需出现）
+        
+        先在 auctions_fts 全文索引中按bm25相关度取出一页ID，再只为这一页读取拍卖详情和出价统计。
+        按 (相关度, id) 键集分页，after 为上一页返回的游标。
+        返回 (拍卖列表, 下一页游标或None)。
+        """
+        keyset = decode_cursor(after) if after else None
+        match_terms = [term for term in terms if len(term) >= SEARCH_MIN_MATCH_LENGTH]
+        like_terms = [term for term in terms if len(term) < SEARCH_MIN_MATCH_LENGTH]
         conn = get_db()
         cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE auctions 
-            SET current_price = ?, current_bidder_id = ?, updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-        ''', (new_price, bidder_id, auction_id))
-        conn.commit()
-        conn.close()
+        
+        filtered = bool(like_terms) or status or min_price is not None or max_price is not None
+        if match_terms and not filtered:
+            # 没有过滤条件时只查全文索引，不为每个匹配行读取 auctions 表
+            rank, id_column = SEARCH_RANK, 'auctions_fts.rowid'
+            query = f'SELECT auctions_fts.rowid AS id, {rank} AS rank FROM auctions_fts WHERE auctions_fts MATCH ?'
+        elif match_terms:
+            rank, id_column = SEARCH_RANK, 'a.id'
+            query = f'''
+                SELECT a.id, {rank} AS rank
+                FROM auctions_fts CROSS JOIN auctions a ON a.id = auctions_fts.rowid
+                WHERE auctions_fts MATCH ?
+            '''
+        else:
+            # 只有短关键词时无法使用全文索引，按ID倒序扫描
+            rank, id_column = '0.0', 'a.id'
+            query = f'SELECT a.id, {rank} AS rank FROM auctions a WHERE 1=1'
+        params = [' '.join(_fts_phrase(term) for term in match_terms)] if match_terms else []
+        for term in like_terms:
+            query += " AND (a.title LIKE ? ESCAPE '\\' OR a.description LIKE ? ESCAPE '\\')"
+            params.extend([_like_pattern(term)] * 2)
+        if status:
+            query += ' AND a.status = ?'
+            params.append(status)
+        if min_price is not None:
+            query += ' AND a.current_price >= ?'
+            params.append(min_price)
+        if max_price is not None:
+            query += ' AND a.current_price <= ?'
+            params.append(max_price)
+        if keyset:
+            query += f' AND ({rank} > ? OR ({rank} = ? AND {id_column} < ?))'
+            params.extend([keyset[0], keyset[0], keyset[1]])
+        # 只有短关键词时相关度为常数，直接按主键倒序扫描，找到一页即停止
+        query += f' ORDER BY rank, {id_column} DESC LIMIT ?' if match_terms else ' ORDER BY a.id DESC LIMIT ?'
+        params.append(limit + 1)
+        cursor.execute(query, params)
+        hits = cursor.fetchall()
+        next_cursor = None
+        if len(hits) > limit:
+            hits = hits[:limit]
+            next_cursor = encode_cursor(hits[-1]['rank'], hits[-1]['id'])
+        
+        auctions = []
+        if hits:
+            placeholders = ','.join('?' * len(hits))
+            cursor.execute(f'''
+                SELECT a.*, u.username as seller_username, {BID_STATS_COLUMNS}
+                FROM auctions a
+                JOIN users u ON a.seller_id = u.id
+                WHERE a.id IN ({placeholders})
+            ''', [hit['id'] for hit in hits])
+            by_id = {row['id']: dict(row) for row in cursor.fetchall()}
+            auctions = [by_id[hit['id']] for hit in hits if hit['id'] in by_id]
+            _attach_images(cursor, auctions, first_only=True)
+        release_db(conn)
+        return auctions, next_cursor
     
     @staticmethod
     def update_status(auction_id, status):
@@ -183,39 +657,297 @@ class Auction:
             WHERE id = ?
         ''', (status, auction_id))
         conn.commit()
-        conn.close()
+        release_db(conn)
+        cache.invalidate_auction(auction_id, lists=True)
     
     @staticmethod
-    def get_active_auctions():
-        """获取所有进行中的拍卖"""
+    def get_active_end_times(after_id=0):
+        """获取进行中拍卖的ID和结束时间（只读取 idx_auctions_status_end_time 索引）
+        
+        after_id 用于增量获取该ID之后新发布的拍卖。
+        """
         conn = get_db()
         cursor = conn.cursor()
-        cursor.execute('SELECT * FROM auctions WHERE status = ?', ('active',))
-        rows = cursor.fetchall()
-        auctions = []
-        for row in rows:
-            auction = dict(row)
-            auction['images'] = json.loads(auction['images']) if auction['images'] else []
-            auctions.append(auction)
-        conn.close()
-        return auctions
+        cursor.execute('''
+            SELECT id, end_time FROM auctions
+            WHERE status = 'active' AND id > ?
+        ''', (after_id,))
+        rows = [dict(row) for row in cursor.fetchall()]
+        release_db(conn)
+        return rows
+    
+    @staticmethod
+    def get_end_times(auction_ids):
+        """获取指定拍卖中仍在进行中的拍卖的ID和结束时间"""
+        if not auction_ids:
+            return []
+        conn = get_db()
+        cursor = conn.cursor()
+        placeholders = ','.join('?' * len(auction_ids))
+        cursor.execute(f'''
+            SELECT id, end_time FROM auctions
+            WHERE id IN ({placeholders}) AND status = 'active'
+        ''', list(auction_ids))
+        rows = [dict(row) for row in cursor.fetchall()]
+        release_db(conn)
+        return rows
+    
+    @staticmethod
+    def settle(auction_ids):
+        """批量结算拍卖：有出价的标记为已结束，无出价的标记为流拍
+        
+        只处理仍为进行中状态且已到结束时间的拍卖（软结束延长了结束时间的拍卖不结算），
+        返回 {拍卖ID: 新状态}。
+        """
+        if not auction_ids:
+            return {}
+        conn = get_db()
+        cursor = conn.cursor()
+        placeholders = ','.join('?' * len(auction_ids))
+        try:
+            # 立即获取写锁，保证读取到的待结算拍卖与更新在同一事务中（出价不会在两者之间延长结束时间）
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute(f'''
+                SELECT id, end_time FROM auctions WHERE id IN ({placeholders}) AND status = 'active'
+            ''', list(auction_ids))
+            settled_ids = [row['id'] for row in cursor.fetchall() if is_due(row['end_time'])]
+            if not settled_ids:
+                return {}
+            placeholders = ','.join('?' * len(settled_ids))
+            cursor.execute(f'''
+                UPDATE auctions
+                SET status = CASE
+                        WHEN EXISTS (SELECT 1 FROM bids b WHERE b.auction_id = auctions.id) THEN 'ended'
+                        ELSE 'no_bid'
+                    END,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id IN ({placeholders}) AND status = 'active'
+            ''', settled_ids)
+            cursor.execute(f'''
+                SELECT id, status FROM auctions WHERE id IN ({placeholders})
+            ''', settled_ids)
+            result = {row['id']: row['status'] for row in cursor.fetchall()}
+            conn.commit()
+            for auction_id in result:
+                cache.invalidate_auction(auction_id, lists=True)
+            return result
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            release_db(conn)
 
 class Bid:
     @staticmethod
-    def create(auction_id, bidder_id, amount):
-        """创建出价记录"""
+    def place(auction_id, bidder_id, amount):
+        """在同一事务中校验并更新最高价、写入出价记录
+        
+        通过带条件的UPDATE实现乐观并发控制：只有当出价仍满足最低加价要求、
+        拍卖仍在进行中且未到结束时间时才会更新成功。
+        启用软结束的拍卖在同一条UPDATE中顺延结束时间（规则见 soft_close_end_time）。
+        其他用户的代理出价在同一事务中一次性应对（见 resolve_proxies）。
+        返回新的出价记录（auction_end_time 为出价后拍卖的结束时间，proxy_bids 为代理出价随之写入的出价）；
+        若条件已不满足（如被其他出价抢先），返回None。
+        """
         conn = get_db()
         cursor = conn.cursor()
+        now = datetime.now().strftime(END_TIME_FORMAT)
         try:
+            cursor.execute(f'''
+                UPDATE auctions
+                SET current_price = ?, current_bidder_id = ?, updated_at = CURRENT_TIMESTAMP,
+                    end_time = {SOFT_CLOSE_END_TIME}
+                WHERE id = ? AND status = 'active' AND end_time > ?
+                  AND seller_id != ? AND current_price + min_increment <= ?
+                RETURNING end_time, min_increment
+            ''', (amount, bidder_id, now, now, auction_id, now, bidder_id, amount))
+            updated = cursor.fetchone()
+            if updated is None:
+                conn.rollback()
+                return None
             cursor.execute('''
                 INSERT INTO bids (auction_id, bidder_id, amount)
                 VALUES (?, ?, ?)
             ''', (auction_id, bidder_id, amount))
-            conn.commit()
             bid_id = cursor.lastrowid
-            return Bid.get_by_id(bid_id)
+            cursor.execute('SELECT * FROM bids WHERE id = ?', (bid_id,))
+            bid = dict(cursor.fetchone())
+            _record_participation(cursor, bid)
+            resolved = resolve_proxies(amount, bidder_id, updated['min_increment'],
+                                       _load_proxies(cursor, auction_id, bidder_id))
+            proxy_bids, end_time = _write_proxy_bids(cursor, auction_id, resolved, now)
+            conn.commit()
+            cache.invalidate_auction(auction_id)
+            bid['proxy_bids'] = proxy_bids
+            for written in (bid, *proxy_bids):
+                written['auction_end_time'] = end_time or updated['end_time']
+            return bid
+        except Exception:
+            conn.rollback()
+            raise
         finally:
-            conn.close()
+            release_db(conn)
+    
+    @staticmethod
+    def place_proxy(auction_id, bidder_id, max_amount, validate):
+        """登记（或提高）代理出价，并在同一事务中计算代理之间的竞争结果
+        
+        validate(auction, bidder_id, max_amount, current_max) 返回错误信息或None，
+        在持有写锁读取拍卖后调用。返回 (写入的出价记录, 错误信息)；写入的出价中最后一条为新的最高出价，
+        每条记录的 auction_end_time 为出价后拍卖的结束时间。
+        """
+        conn = get_db()
+        cursor = conn.cursor()
+        now = datetime.now().strftime(END_TIME_FORMAT)
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('''
+                SELECT id, seller_id, status, end_time, current_price, current_bidder_id, min_increment
+                FROM auctions WHERE id = ?
+            ''', (auction_id,))
+            row = cursor.fetchone()
+            if not row:
+                conn.rollback()
+                return None, '拍卖不存在'
+            auction = dict(row)
+            cursor.execute('''
+                SELECT max_amount FROM proxy_bids WHERE auction_id = ? AND bidder_id = ?
+            ''', (auction_id, bidder_id))
+            current = cursor.fetchone()
+            error = validate(auction, bidder_id, max_amount, current['max_amount'] if current else None)
+            if error:
+                conn.rollback()
+                return None, error
+            cursor.execute('''
+                INSERT INTO proxy_bids (auction_id, bidder_id, max_amount, placed_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(auction_id, bidder_id) DO UPDATE
+                SET max_amount = excluded.max_amount, placed_at = excluded.placed_at, updated_at = CURRENT_TIMESTAMP
+            ''', (auction_id, bidder_id, max_amount, proxy_timestamp()))
+            resolved = resolve_proxies(auction['current_price'], auction['current_bidder_id'], auction['min_increment'],
+                                       _load_proxies(cursor, auction_id, auction['current_bidder_id']))
+            bids, end_time = _write_proxy_bids(cursor, auction_id, resolved, now)
+            conn.commit()
+            if bids:
+                cache.invalidate_auction(auction_id)
+            for bid in bids:
+                bid['auction_end_time'] = end_time
+            return bids, None
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            release_db(conn)
+    
+    @staticmethod
+    def get_proxy(auction_id, bidder_id):
+        """获取用户在拍卖上登记的代理出价（只对本人可见）"""
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT max_amount, placed_at FROM proxy_bids WHERE auction_id = ? AND bidder_id = ?
+        ''', (auction_id, bidder_id))
+        row = cursor.fetchone()
+        release_db(conn)
+        return dict(row) if row else None
+    
+    @staticmethod
+    def create_many(bids, conn=None, proxies=()):
+        """在一个事务中写入一批已接受的出价（出价引擎的合并提交）
+        
+        bids 为按接受顺序排列的 {'auction_id', 'bidder_id', 'amount', 'created_at', 'auction_end_time'}，
+        写入后填入各自的ID。同一事务中更新出价汇总，并把每个拍卖的最高价和结束时间更新为该批中最后一条出价的值。
+        proxies 为同一批中登记或提高的代理出价 {'auction_id', 'bidder_id', 'max_amount', 'placed_at'}。
+        conn 为调用方持有的连接（如写线程的独立连接），不传时从连接池获取。
+        """
+        if not bids and not proxies:
+            return bids
+        pooled = conn is None
+        if pooled:
+            conn = get_db()
+        cursor = conn.cursor()
+        latest = {}
+        try:
+            # 事务持有写锁，同一语句插入的自增ID是连续的，由 last_insert_rowid() 倒推每行的ID
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.executemany('''
+                INSERT INTO proxy_bids (auction_id, bidder_id, max_amount, placed_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(auction_id, bidder_id) DO UPDATE
+                SET max_amount = excluded.max_amount, placed_at = excluded.placed_at, updated_at = CURRENT_TIMESTAMP
+            ''', [(proxy['auction_id'], proxy['bidder_id'], proxy['max_amount'], proxy['placed_at']) for proxy in proxies])
+            cursor.executemany('''
+                INSERT INTO bids (auction_id, bidder_id, amount, created_at)
+                VALUES (?, ?, ?, ?)
+            ''', [(bid['auction_id'], bid['bidder_id'], bid['amount'], bid['created_at']) for bid in bids])
+            cursor.execute('SELECT last_insert_rowid()')
+            first_id = cursor.fetchone()[0] - len(bids) + 1
+            for offset, bid in enumerate(bids):
+                bid['id'] = first_id + offset
+                _record_participation(cursor, bid)
+                latest[bid['auction_id']] = bid
+            cursor.executemany('''
+                UPDATE auctions
+                SET current_price = ?, current_bidder_id = ?, end_time = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND current_price < ?
+            ''', [(bid['amount'], bid['bidder_id'], bid['auction_end_time'], auction_id, bid['amount'])
+                  for auction_id, bid in latest.items()])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            if pooled:
+                release_db(conn)
+        for auction_id in latest:
+            cache.invalidate_auction(auction_id)
+        return bids
+    
+    @staticmethod
+    def get_book_state(auction_id):
+        """从出价表重建拍卖的出价状态（出价引擎首次接受该拍卖的出价或重启后使用）
+        
+        最高价和最高出价者取自出价表中的最高出价（金额相同时为后写入的一条，即代理出价以同样金额应对的最高出价者），
+        出价次数和竞拍者也由出价表统计，
+        不依赖 auctions 表中的 current_price；proxies 为全部代理出价（已排序）。拍卖不存在时返回None。
+        """
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT id, seller_id, status, end_time, starting_price, min_increment,
+                   soft_close_window, soft_close_extension
+            FROM auctions WHERE id = ?
+        ''', (auction_id,))
+        row = cursor.fetchone()
+        if not row:
+            release_db(conn)
+            return None
+        state = dict(row)
+        cursor.execute('''
+            SELECT bidder_id, amount FROM bids
+            WHERE auction_id = ?
+            ORDER BY amount DESC, id DESC
+            LIMIT 1
+        ''', (auction_id,))
+        top = cursor.fetchone()
+        state['current_price'] = top['amount'] if top else state['starting_price']
+        state['current_bidder_id'] = top['bidder_id'] if top else None
+        cursor.execute('''
+            SELECT bidder_id, COUNT(*) AS bid_count FROM bids
+            WHERE auction_id = ?
+            GROUP BY bidder_id
+        ''', (auction_id,))
+        counts = {row['bidder_id']: row['bid_count'] for row in cursor.fetchall()}
+        cursor.execute('''
+            SELECT bidder_id, max_amount, placed_at FROM proxy_bids
+            WHERE auction_id = ?
+            ORDER BY max_amount DESC, placed_at, id
+        ''', (auction_id,))
+        state['proxies'] = [dict(row) for row in cursor.fetchall()]
+        release_db(conn)
+        state['bid_count'] = sum(counts.values())
+        state['bidder_ids'] = set(counts)
+        return state
     
     @staticmethod
     def get_by_id(bid_id):
@@ -224,46 +956,279 @@ class Bid:
         cursor = conn.cursor()
         cursor.execute('SELECT * FROM bids WHERE id = ?', (bid_id,))
         row = cursor.fetchone()
-        conn.close()
+        release_db(conn)
         return dict(row) if row else None
     
     @staticmethod
-    def get_by_auction(auction_id):
-        """获取拍卖的所有出价记录"""
+    def get_recent(auction_id, limit):
+        """获取拍卖最近的 limit 条出价记录及出价统计（经过缓存）
+        
+        返回 {'bids', 'next_cursor', 'bid_count', 'bidder_count'}，next_cursor 用于 get_page 继续读取更早的出价。
+        """
+        return cache.get_or_load('bids', f'{auction_id}:{limit}', lambda: Bid._query_recent(auction_id, limit),
+                                 depends_on=f'auction:{auction_id}')
+    
+    @staticmethod
+    def _query_recent(auction_id, limit):
+        bids, next_cursor = Bid.get_page(auction_id, limit)
+        return {'bids': bids, 'next_cursor': next_cursor, **Bid.get_stats(auction_id)}
+    
+    @staticmethod
+    def get_page(auction_id, limit, after=None):
+        """按时间倒序分页获取拍卖的出价记录
+        
+        按 (created_at, id) 键集分页，after 为上一页返回的游标；由 idx_bids_auction_created_at 支持，
+        每页只读取 limit 条索引项，与该拍卖的出价总数无关。返回 (出价记录, 下一页游标或None)。
+        """
+        keyset = decode_cursor(after) if after else None
         conn = get_db()
         cursor = conn.cursor()
-        cursor.execute('''
-            SELECT b.*, u.username 
+        query = '''
+            SELECT b.id, b.auction_id, b.bidder_id, b.amount, b.created_at, u.username
             FROM bids b
             JOIN users u ON b.bidder_id = u.id
             WHERE b.auction_id = ?
-            ORDER BY b.created_at DESC, b.amount DESC
-        ''', (auction_id,))
-        rows = cursor.fetchall()
-        bids = [dict(row) for row in rows]
-        conn.close()
-        return bids
+        '''
+        params = [auction_id]
+        if keyset:
+            query += _keyset_clause('b.created_at', 'DESC')
+            params.extend(keyset)
+        query += ' ORDER BY b.created_at DESC, b.id DESC'
+        rows, next_cursor = _fetch_keyset_page(cursor, query, params, limit, 'created_at')
+        release_db(conn)
+        return [dict(row) for row in rows], next_cursor
     
     @staticmethod
-    def get_by_bidder(bidder_id):
-        """获取用户的所有出价记录"""
+    def get_since(auction_id, since_id, limit):
+        """获取拍卖中ID大于 since_id 的出价记录（按时间正序，最多 limit 条），用于轮询时只读取新出价
+        
+        从 since_id 那条出价的时间开始读取 idx_bids_auction_created_at，读取量与新出价数量相关，
+        与该拍卖的出价总数无关。返回 (出价记录, 是否还有更多)。
+        """
         conn = get_db()
         cursor = conn.cursor()
         cursor.execute('''
-            SELECT b.*, a.title, a.status, a.end_time, a.current_price, a.current_bidder_id
+            SELECT b.id, b.auction_id, b.bidder_id, b.amount, b.created_at, u.username
             FROM bids b
-            JOIN auctions a ON b.auction_id = a.id
-            WHERE b.bidder_id = ?
-            ORDER BY b.created_at DESC, b.amount DESC
-        ''', (bidder_id,))
-        rows = cursor.fetchall()
-        bids = []
-        for row in rows:
+            JOIN users u ON b.bidder_id = u.id
+            WHERE b.auction_id = ?
+              AND b.created_at >= COALESCE((SELECT created_at FROM bids WHERE id = ? AND auction_id = ?), '')
+              AND b.id > ?
+            ORDER BY b.created_at, b.id
+            LIMIT ?
+        ''', (auction_id, since_id, auction_id, since_id, limit + 1))
+        rows = [dict(row) for row in cursor.fetchall()]
+        release_db(conn)
+        return rows[:limit], len(rows) > limit
+    
+    @staticmethod
+    def get_latest(auction_ids, limit):
+        """批量获取每个拍卖最近的 limit 条出价记录，返回 {拍卖ID: [出价记录]}
+        
+        一条查询用窗口函数按拍卖分组编号，排序与 get_page 相同（按时间倒序）。
+        """
+        latest = {auction_id: [] for auction_id in auction_ids}
+        if not latest or limit <= 0:
+            return latest
+        conn = get_db()
+        cursor = conn.cursor()
+        placeholders = ','.join('?' * len(latest))
+        cursor.execute(f'''
+            SELECT b.*, u.username
+            FROM (
+                SELECT *, ROW_NUMBER() OVER (
+                    PARTITION BY auction_id ORDER BY created_at DESC, id DESC
+                ) AS position
+                FROM bids
+                WHERE auction_id IN ({placeholders})
+            ) b
+            JOIN users u ON b.bidder_id = u.id
+            WHERE b.position <= ?
+            ORDER BY b.auction_id, b.position
+        ''', [*latest, limit])
+        for row in cursor.fetchall():
             bid = dict(row)
-            # 判断是否是最高出价者
-            bid['is_highest'] = (bid['amount'] == bid['current_price'] and 
-                               bid['current_bidder_id'] == bidder_id)
-            bids.append(bid)
-        conn.close()
-        return bids
+            del bid['position']
+            latest[bid['auction_id']].append(bid)
+        release_db(conn)
+        return latest
+    
+    @staticmethod
+    def get_stats(auction_id):
+        """获取拍卖的出价次数和竞拍者数量"""
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT COUNT(*) AS bid_count, COUNT(DISTINCT bidder_id) AS bidder_count
+            FROM bids WHERE auction_id = ?
+        ''', (auction_id,))
+        stats = dict(cursor.fetchone())
+        release_db(conn)
+        return stats
+    
+    @staticmethod
+    def get_participation(bidder_id, limit, after=None, auction_id=None):
+        """获取用户参与过的拍卖及其在每个拍卖上的出价汇总（按最近出价时间倒序）
+        
+        读取 user_auction_participation，每个拍卖一行，与出价次数无关。
+        按 (last_bid_at, auction_id) 键集分页，after 为上一页返回的游标；传入 auction_id 时只返回该拍卖的汇总。
+        返回 (汇总列表, 下一页游标或None)。
+        """
+        keyset = decode_cursor(after) if after else None
+        conn = get_db()
+        cursor = conn.cursor()
+        query = '''
+            SELECT p.auction_id, p.max_amount, p.bid_count, p.last_bid_at,
+                   a.title, a.status, a.end_time, a.current_price, a.current_bidder_id
+            FROM user_auction_participation p
+            JOIN auctions a ON p.auction_id = a.id
+            WHERE p.user_id = ?
+        '''
+        params = [bidder_id]
+        if auction_id is not None:
+            query += ' AND p.auction_id = ?'
+            params.append(auction_id)
+        if keyset:
+            query += _keyset_clause('p.last_bid_at', 'DESC', 'p.auction_id')
+            params.extend(keyset)
+        query += ' ORDER BY p.last_bid_at DESC, p.auction_id DESC'
+        rows, next_cursor = _fetch_keyset_page(cursor, query, params, limit, 'last_bid_at', 'auction_id')
+        release_db(conn)
+        return [dict(row) for row in rows], next_cursor
+    
+    @staticmethod
+    def get_history(bidder_id, auction_ids):
+        """批量获取用户在指定拍卖上的全部出价记录，返回 {拍卖ID: [出价记录]}（按时间倒序）
+        
+        先按 auction_id 排序，使查询按 idx_bids_auction_bidder 逐个拍卖查找，
+        而不是扫描该用户的全部出价。
+        """
+        history = {auction_id: [] for auction_id in auction_ids}
+        if not history:
+            return history
+        conn = get_db()
+        cursor = conn.cursor()
+        placeholders = ','.join('?' * len(history))
+        cursor.execute(f'''
+            SELECT id, auction_id, amount, created_at FROM bids
+            WHERE bidder_id = ? AND auction_id IN ({placeholders})
+            ORDER BY auction_id, created_at DESC, amount DESC
+        ''', [bidder_id, *history])
+        for row in cursor.fetchall():
+            history[row['auction_id']].append(dict(row))
+        release_db(conn)
+        return history
 
+class Lease:
+    @staticmethod
+    def acquire(name, holder, ttl):
+        """获取或续期租约，返回是否持有
+        
+        租约不存在、已过期或本来就由 holder 持有时成功，过期时间延长到 ttl 秒后；
+        由其他进程持有且未过期时返回False。
+        """
+        conn = get_db()
+        cursor = conn.cursor()
+        now = time.time()
+        try:
+            cursor.execute('''
+                INSERT INTO leases (name, holder, expires_at, heartbeat_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(name) DO UPDATE
+                SET holder = excluded.holder, expires_at = excluded.expires_at, heartbeat_at = excluded.heartbeat_at
+                WHERE leases.holder = excluded.holder OR leases.expires_at < excluded.heartbeat_at
+            ''', (name, holder, now + ttl, now))
+            acquired = cursor.rowcount == 1
+            conn.commit()
+            return acquired
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            release_db(conn)
+    
+    @staticmethod
+    def release(name, holder):
+        """释放自己持有的租约，使其他进程可以立即接管"""
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM leases WHERE name = ? AND holder = ?', (name, holder))
+        conn.commit()
+        release_db(conn)
+
+class Event:
+    @staticmethod
+    def append_many(events):
+        """写入待推送的拍卖事件 [(拍卖ID, 类型, JSON数据)]，事件ID由自增主键分配（所有进程共用一个序列）"""
+        conn = get_db()
+        cursor = conn.cursor()
+        now = time.time()
+        try:
+            cursor.executemany('''
+                INSERT INTO auction_events (auction_id, type, data, created_at)
+                VALUES (?, ?, ?, ?)
+            ''', [(auction_id, event_type, data, now) for auction_id, event_type, data in events])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            release_db(conn)
+    
+    @staticmethod
+    def get_after(after_id, limit, auction_id=None):
+        """按ID顺序读取 after_id 之后的事件，传入 auction_id 时只读取该拍卖的事件"""
+        conn = get_db()
+        cursor = conn.cursor()
+        if auction_id is None:
+            cursor.execute('''
+                SELECT id, auction_id, type, data FROM auction_events
+                WHERE id > ? ORDER BY id LIMIT ?
+            ''', (after_id, limit))
+        else:
+            cursor.execute('''
+                SELECT id, auction_id, type, data FROM auction_events
+                WHERE auction_id = ? AND id > ? ORDER BY id LIMIT ?
+            ''', (auction_id, after_id, limit))
+        rows = [dict(row) for row in cursor.fetchall()]
+        release_db(conn)
+        return rows
+    
+    @staticmethod
+    def get_latest_id(auction_id=None):
+        """最新的事件ID（传入 auction_id 时为该拍卖的最新事件），没有事件时返回0"""
+        conn = get_db()
+        cursor = conn.cursor()
+        if auction_id is None:
+            # 包括已清理的事件：自增序列记录在 sqlite_sequence 中
+            cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'auction_events'")
+        else:
+            cursor.execute('SELECT MAX(id) FROM auction_events WHERE auction_id = ?', (auction_id,))
+        row = cursor.fetchone()
+        release_db(conn)
+        return (row[0] if row else None) or 0
+    
+    @staticmethod
+    def get_oldest_id():
+        """仍保留的最早事件ID，没有事件时返回None"""
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute('SELECT MIN(id) FROM auction_events')
+        oldest = cursor.fetchone()[0]
+        release_db(conn)
+        return oldest
+    
+    @staticmethod
+    def prune(before):
+        """删除 before（时间戳）之前的事件，返回删除的数量"""
+        conn = get_db()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('DELETE FROM auction_events WHERE created_at < ?', (before,))
+            conn.commit()
+            return cursor.rowcount
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            release_db(conn)
@@ -0,0 +1,296 @@
+from database import connect
+from models import Bid, proxy_timestamp, resolve_proxies, soft_close_end_time
+from datetime import datetime
+from config import Config
+import atexit
+import logging
+import metrics
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class BidRejected(Exception):
+    """出价未被接受，status 为对应的HTTP状态码"""
+    
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+class AuctionBook:
+    """单个拍卖在内存中的出价状态，由 lock 保护"""
+    
+    __slots__ = ('lock', 'auction', 'bid_count', 'bidder_ids', 'proxies', 'stale')
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.auction = None  # 首次出价时从出价表加载
+        self.bid_count = 0
+        self.bidder_ids = set()
+        self.proxies = []  # 按 (最高价从高到低, 登记时间) 排序
+        self.stale = False  # 已被移出（结算或写入失败），持有者需重新获取
+
+class PendingWrite:
+    """等待写线程提交的出价及代理出价；bids 为None时是只用于等待之前的出价全部提交的屏障"""
+    
+    __slots__ = ('bids', 'proxy', 'done', 'failed')
+    
+    def __init__(self, bids=None, proxy=None):
+        self.bids = bids
+        self.proxy = proxy
+        self.done = threading.Event()
+        self.failed = False
+
+class OrderBook:
+    """内存出价引擎
+    
+    进行中拍卖的最高价和最高出价者以内存中的状态为准，每个拍卖一把锁，出价的校验和接受不访问数据库。
+    接受的出价放入队列，由写线程在 window 秒内合并为一个事务提交（一次fsync），
+    提交完成后出价请求才返回（持久化屏障），返回成功的出价都已写入数据库。
+    """
+    
+    def __init__(self, window, max_batch):
+        self.window = window
+        self.max_batch = max_batch
+        self._books = {}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._conn = None
+        self._database = None
+        self._thread = None
+    
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='bid-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+    
+    def stop(self):
+        """提交队列中剩余的出价后停止写线程"""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+    
+    def place(self, auction_id, bidder_id, amount, validate):
+        """在内存中校验并接受出价，等待写入数据库后返回 (出价记录, 出价统计, 是否延长了结束时间)
+        
+        validate(auction, bidder_id, amount) 返回错误信息或None，在拍卖的锁内调用，
+        校验与更新最高价（及软结束顺延结束时间）之间不会有其他出价插入。出价未被接受时抛出 BidRejected。
+        其他用户的代理出价随之一次性应对，产生的出价在 proxy_bids 中，与该出价一起提交。
+        """
+        def accept(book):
+            auction = book.auction
+            error = validate(auction, bidder_id, amount)
+            if error:
+                return error
+            resolved = resolve_proxies(amount, bidder_id, auction['min_increment'], book.proxies)
+            return [(bidder_id, amount), *resolved], None
+        
+        bids, stats, extended = self._submit(auction_id, accept)
+        bid = bids[0]
+        bid['proxy_bids'] = bids[1:]
+        return bid, stats, extended
+    
+    def place_proxy(self, auction_id, bidder_id, max_amount, validate):
+        """登记（或提高）代理出价，等待写入数据库后返回 (写入的出价记录, 出价统计, 是否延长了结束时间)
+        
+        validate(auction, bidder_id, max_amount, current_max) 的含义同 Bid.place_proxy。
+        """
+        def accept(book):
+            auction = book.auction
+            current = next((proxy for proxy in book.proxies if proxy['bidder_id'] == bidder_id), None)
+            error = validate(auction, bidder_id, max_amount, current['max_amount'] if current else None)
+            if error:
+                return error
+            proxy = {'auction_id': auction_id, 'bidder_id': bidder_id, 'max_amount': max_amount,
+                     'placed_at': proxy_timestamp()}
+            book.proxies = sorted([*(other for other in book.proxies if other is not current), proxy],
+                                  key=lambda other: (-other['max_amount'], other['placed_at']))
+            resolved = resolve_proxies(auction['current_price'], auction['current_bidder_id'],
+                                       auction['min_increment'], book.proxies)
+            return resolved, proxy
+        
+        return self._submit(auction_id, accept)
+    
+    def _submit(self, auction_id, accept):
+        """在拍卖的锁内调用 accept(book)，把返回的出价应用到内存状态并放入写入队列，等待提交
+        
+        accept 返回错误信息，或 ([(出价者ID, 金额)], 登记的代理出价或None)。
+        """
+        while True:
+            book = self._get_book(auction_id)
+            with book.lock:
+                if book.stale:
+                    continue
+                if book.auction is None:
+                    self._load(auction_id, book)
+                auction = book.auction
+                result = accept(book)
+                if isinstance(result, str):
+                    if auction['status'] != 'active':
+                        self._discard(auction_id, book)
+                    raise BidRejected(result)
+                resolved, proxy = result
+                end_time = soft_close_end_time(auction, datetime.now()) if resolved else auction['end_time']
+                extended = end_time != auction['end_time']
+                created_at = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())  # 与 CURRENT_TIMESTAMP 相同（UTC）
+                bids = [{
+                    'auction_id': auction_id,
+                    'bidder_id': bidder_id,
+                    'amount': amount,
+                    'created_at': created_at,
+                    'auction_end_time': end_time,
+                } for bidder_id, amount in resolved]
+                if bids:
+                    auction['end_time'] = end_time
+                    auction['current_price'] = bids[-1]['amount']
+                    auction['current_bidder_id'] = bids[-1]['bidder_id']
+                    book.bid_count += len(bids)
+                    book.bidder_ids.update(bid['bidder_id'] for bid in bids)
+                stats = {'bid_count': book.bid_count, 'bidder_count': len(book.bidder_ids)}
+                pending = PendingWrite(bids, proxy)
+                self._queue.put(pending)
+            break
+        pending.done.wait()
+        if pending.failed:
+            raise BidRejected('出价保存失败，请稍后重试', 503)
+        return bids, stats, extended
+    
+    def close(self, auction_ids):
+        """结算前调用：移出这些拍卖的内存状态，并等待已接受的出价全部写入"""
+        for auction_id in auction_ids:
+            self._evict(auction_id)
+        self.flush()
+    
+    def flush(self):
+        """等待此前接受的出价全部提交"""
+        if self._thread is None:
+            return
+        fence = PendingWrite()
+        self._queue.put(fence)
+        fence.done.wait()
+    
+    def book_count(self):
+        with self._lock:
+            return len(self._books)
+    
+    def queue_size(self):
+        return self._queue.qsize()
+    
+    def _get_book(self, auction_id):
+        with self._lock:
+            book = self._books.get(auction_id)
+            if book is None:
+                book = self._books[auction_id] = AuctionBook()
+            return book
+    
+    def _discard(self, auction_id, book):
+        """移出内存状态（调用方持有 book.lock），下一次出价时重新从数据库加载"""
+        book.stale = True
+        with self._lock:
+            if self._books.get(auction_id) is book:
+                del self._books[auction_id]
+    
+    def _evict(self, auction_id):
+        """移出内存状态，并等待正在进行的出价放入队列"""
+        with self._lock:
+            book = self._books.pop(auction_id, None)
+        if book is not None:
+            with book.lock:
+                book.stale = True
+    
+    def _load(self, auction_id, book):
+        state = Bid.get_book_state(auction_id)
+        if state is None:
+            self._discard(auction_id, book)
+            raise BidRejected('拍卖不存在', 404)
+        book.bid_count = state.pop('bid_count')
+        book.bidder_ids = state.pop('bidder_ids')
+        book.proxies = state.pop('proxies')
+        book.auction = state
+    
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            batch = []
+            deadline = time.monotonic() + self.window
+            while True:
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+                # 屏障要求立即提交，不再等待窗口结束
+                if item.bids is None or len(batch) >= self.max_batch:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+            if batch:
+                self._write(batch)
+    
+    def _connection(self):
+        """写线程独立持有的连接（数据库路径变化时重新建立）"""
+        if self._conn is not None and self._database != Config.DATABASE_PATH:
+            self._close_connection()
+        if self._conn is None:
+            self._conn = connect(Config.DATABASE_PATH, synchronous=Config.BID_WRITE_SYNCHRONOUS)
+            self._database = Config.DATABASE_PATH
+        return self._conn
+    
+    def _close_connection(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+    
+    def _write(self, batch):
+        bids = [bid for item in batch if item.bids for bid in item.bids]
+        proxies = [item.proxy for item in batch if item.proxy is not None]
+        if bids or proxies:
+            started = time.perf_counter()
+            try:
+                Bid.create_many(bids, self._connection(), proxies)
+            except Exception as e:
+                logger.error(f"Failed to write {len(bids)} bids and {len(proxies)} proxy bids: {e}")
+                for item in batch:
+                    item.failed = item.bids is not None
+                # 内存中的最高价已包含未写入的出价，移出相关拍卖，下一次出价时从出价表重新加载
+                for auction_id in {bid['auction_id'] for bid in [*bids, *proxies]}:
+                    self._evict(auction_id)
+                self._close_connection()
+            metrics.BID_WRITE_BATCH.observe(len(bids))
+            metrics.BID_WRITE_SECONDS.observe(time.perf_counter() - started)
+        for item in batch:
+            item.done.set()
+
+_order_book = None
+_order_book_lock = threading.Lock()
+
+def get_order_book():
+    """获取内存出价引擎（BID_ENGINE 不为 memory 时为None）"""
+    return _order_book
+
+def start_order_book():
+    """BID_ENGINE=memory 时启动内存出价引擎及其写线程"""
+    global _order_book
+    if Config.BID_ENGINE != 'memory':
+        return None
+    with _order_book_lock:
+        if _order_book is None:
+            if Config.WEB_CONCURRENCY > 1:
+                logger.warning("BID_ENGINE=memory keeps auction state per process; run a single worker process")
+            _order_book = OrderBook(Config.BID_WRITE_WINDOW_MS / 1000, Config.BID_WRITE_MAX_BATCH)
+            _order_book.start()
+        return _order_book
+
+def _collect_order_book():
+    book = get_order_book()
+    return [
+        ('bid_engine_auctions', 'gauge', '出价引擎在内存中维护的拍卖数量', [([], book.book_count() if book else 0)]),
+        ('bid_write_queue_size', 'gauge', '等待写线程提交的出价数量', [([], book.queue_size() if book else 0)]),
+    ]
+
+metrics.register_collector(_collect_order_book)
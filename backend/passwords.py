@@ -0,0 +1,47 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash
+from config import Config
+import threading
+
+class HashingBusy(Exception):
+    """所有密码哈希工作线程（进程）都在计算中"""
+
+_executor = None
+_executor_lock = threading.Lock()
+# 名额与工作线程数相同：任务提交后立即开始计算，不在线程池中排队
+_slots = threading.BoundedSemaphore(Config.PASSWORD_HASH_WORKERS)
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            if Config.PASSWORD_HASH_EXECUTOR == 'process':
+                # 进程池不受GIL限制，哈希计算不会拖慢处理出价的线程
+                _executor = ProcessPoolExecutor(max_workers=Config.PASSWORD_HASH_WORKERS)
+            else:
+                _executor = ThreadPoolExecutor(max_workers=Config.PASSWORD_HASH_WORKERS,
+                                               thread_name_prefix='password-hash')
+        return _executor
+
+def _run(func, *args):
+    """在哈希线程池中执行；没有空闲的工作线程时立即抛出HashingBusy（返回429），不排队等待
+    
+    请求线程只等待自己那一次哈希计算，不会因为排在其他登录之后而长时间被占用。
+    """
+    if not _slots.acquire(blocking=False):
+        raise HashingBusy()
+    try:
+        future = _get_executor().submit(func, *args)
+    except Exception:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    return future.result()
+
+def hash_password(password):
+    """计算密码哈希"""
+    return _run(generate_password_hash, password)
+
+def verify_password(password_hash, password):
+    """校验密码"""
+    return _run(check_password_hash, password_hash, password)
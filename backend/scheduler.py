@@ -1,45 +1,273 @@
 from apscheduler.schedulers.background import BackgroundScheduler
-from models import Auction
+from models import Auction, Lease
+from events import hub
+from orderbook import get_order_book
+from config import Config
 from datetime import datetime
+from collections import Counter
+import atexit
+import heapq
+import logging
+import metrics
+import os
+import socket
+import threading
 import time
+import uuid
 
-def check_and_settle_auctions():
-    """检查并结算到期的拍卖"""
-    # 获取所有进行中的拍卖
-    active_auctions = Auction.get_active_auctions()
-    now = datetime.now()
+logger = logging.getLogger(__name__)
+
+def parse_end_time(end_time):
+    """将拍卖结束时间转换为时间戳（不带时区的时间按服务器本地时间处理）"""
+    return datetime.fromisoformat(end_time.replace('Z', '+00:00')).timestamp()
+
+class SettlementEngine:
+    """事件驱动的拍卖结算引擎
+    
+    在内存中维护按结束时间排序的最小堆，只在最近一个拍卖到期时唤醒，
+    并用一条UPDATE批量结算所有已到期的拍卖。
+    """
+    
+    JOB_ID = 'settle_next'
+    SYNC_JOB_ID = 'sync_auctions'
+    
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+        self._heap = []
+        self._end_times = {}  # 拍卖ID -> 最新的结束时间戳，用于识别堆中过期的条目
+        self._last_seen_id = 0
+        self._lock = threading.Lock()
+    
+    def load(self):
+        """启动时从索引中重建堆"""
+        with self._lock:
+            self._heap = []
+            self._end_times = {}
+            self._last_seen_id = 0
+        self.sync()
+    
+    def sync(self):
+        """增量加载其他进程新发布的拍卖"""
+        started = time.perf_counter()
+        rows = Auction.get_active_end_times(self._last_seen_id)
+        with self._lock:
+            for row in rows:
+                self._push(row['id'], row['end_time'])
+                self._last_seen_id = max(self._last_seen_id, row['id'])
+        self._arm()
+        metrics.JOB_SECONDS.observe(time.perf_counter() - started, job=self.SYNC_JOB_ID)
+    
+    def stop(self):
+        """不再负责结算（失去租约时调用）"""
+        with self._lock:
+            self._heap = []
+            self._end_times = {}
+            self._last_seen_id = 0
+        for job_id in (self.JOB_ID, self.SYNC_JOB_ID):
+            if self.scheduler.get_job(job_id):
+                self.scheduler.remove_job(job_id)
     
-    for auction in active_auctions:
+    def start(self):
+        """开始负责结算：从索引中重建堆，并低频增量同步其他进程发布的拍卖"""
+        self.load()
+        # 只按主键范围读取索引
+        self.scheduler.add_job(
+            func=self.sync,
+            trigger="interval",
+            seconds=Config.SETTLEMENT_SYNC_SECONDS,
+            id=self.SYNC_JOB_ID,
+            name='同步新发布的拍卖',
+            replace_existing=True
+        )
+    
+    def add(self, auction_id, end_time):
+        """登记新发布（或结束时间变化）的拍卖"""
+        with self._lock:
+            self._push(auction_id, end_time)
+        self._arm()
+    
+    def add_many(self, items):
+        """批量登记 [(拍卖ID, 结束时间)]，只重新安排一次唤醒任务"""
+        with self._lock:
+            for auction_id, end_time in items:
+                self._push(auction_id, end_time)
+        self._arm()
+    
+    def _push(self, auction_id, end_time):
         try:
-            end_time = datetime.fromisoformat(auction['end_time'].replace('Z', '+00:00'))
-            # 如果结束时间已过
-            if (end_time - now).total_seconds() <= 0:
-                # 检查是否有出价
-                from models import Bid
-                bids = Bid.get_by_auction(auction['id'])
-                
-                if len(bids) == 0:
-                    # 没有出价，标记为流拍
-                    Auction.update_status(auction['id'], 'no_bid')
-                else:
-                    # 有出价，标记为已结束
-                    Auction.update_status(auction['id'], 'ended')
-        except Exception as e:
-            print(f"Error settling auction {auction['id']}: {e}")
-            continue
+            end_ts = parse_end_time(end_time)
+        except (ValueError, AttributeError):
+            logger.error(f"Invalid end_time for auction {auction_id}: {end_time}")
+            return
+        self._end_times[auction_id] = end_ts
+        heapq.heappush(self._heap, (end_ts, auction_id))
+    
+    def _arm(self):
+        """把唤醒任务安排在最近一个到期时间"""
+        with self._lock:
+            while self._heap and self._end_times.get(self._heap[0][1]) != self._heap[0][0]:
+                heapq.heappop(self._heap)
+            if not self._heap:
+                next_run = None
+            else:
+                next_run = datetime.fromtimestamp(self._heap[0][0])
+        if next_run is None:
+            if self.scheduler.get_job(self.JOB_ID):
+                self.scheduler.remove_job(self.JOB_ID)
+            return
+        self.scheduler.add_job(
+            func=self.settle_due,
+            trigger='date',
+            run_date=next_run,
+            id=self.JOB_ID,
+            name='结算到期拍卖',
+            replace_existing=True,
+            misfire_grace_time=None
+        )
+    
+    def settle_due(self):
+        """结算所有已到期的拍卖，返回 {拍卖ID: 新状态}"""
+        started = time.perf_counter()
+        now = time.time()
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                end_ts, auction_id = heapq.heappop(self._heap)
+                if self._end_times.get(auction_id) == end_ts:
+                    del self._end_times[auction_id]
+                    due.append(auction_id)
+        settled = {}
+        if due:
+            try:
+                book = get_order_book()
+                if book:
+                    # 先让已接受的出价全部写入，结算时才能看到最终的最高出价
+                    book.close(due)
+                settled = Auction.settle(due)
+                logger.info(f"Settled {len(settled)} auctions")
+                if len(settled) < len(due):
+                    # 软结束延长了结束时间（可能由其他进程的出价延长），按新的结束时间重新登记
+                    extended = Auction.get_end_times([auction_id for auction_id in due if auction_id not in settled])
+                    with self._lock:
+                        for row in extended:
+                            self._push(row['id'], row['end_time'])
+                for status, count in Counter(settled.values()).items():
+                    metrics.SETTLED.inc(count, status=status)
+                for auction_id, status in settled.items():
+                    hub.publish(auction_id, 'status', {'auction_id': auction_id, 'status': status})
+            except Exception as e:
+                logger.error(f"Error settling auctions {due}: {e}")
+                # 结算失败时放回堆中，稍后重试
+                retry_ts = now + Config.SETTLEMENT_RETRY_SECONDS
+                with self._lock:
+                    for auction_id in due:
+                        self._end_times[auction_id] = retry_ts
+                        heapq.heappush(self._heap, (retry_ts, auction_id))
+        self._arm()
+        metrics.JOB_SECONDS.observe(time.perf_counter() - started, job=self.JOB_ID)
+        return settled
+    
+    def pending_count(self):
+        """堆中等待结算的拍卖数量"""
+        with self._lock:
+            return len(self._end_times)
+
+class LeaderElection:
+    """通过 leases 表在多个进程中选出唯一的结算进程
+    
+    每个进程定期尝试获取或续期租约，持有租约的进程运行结算引擎；
+    持有进程退出或停止续约后，租约过期，其他进程在下一次心跳时接管。
+    结算本身是幂等的（只更新仍为进行中的拍卖），交接期间短暂重叠也不会重复结算。
+    """
+    
+    LEASE_NAME = 'settlement'
+    JOB_ID = 'leader_heartbeat'
+    
+    def __init__(self, scheduler, engine):
+        self.scheduler = scheduler
+        self.engine = engine
+        self.holder = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self.is_leader = False
+        self._lock = threading.Lock()
+    
+    def start(self):
+        self.heartbeat()
+        self.scheduler.add_job(
+            func=self.heartbeat,
+            trigger='interval',
+            seconds=Config.LEADER_HEARTBEAT_SECONDS,
+            id=self.JOB_ID,
+            name='结算进程租约心跳',
+            replace_existing=True
+        )
+        atexit.register(self.resign)
+    
+    def heartbeat(self):
+        """续约或尝试接管，并根据结果启动/停止结算引擎"""
+        with self._lock:
+            try:
+                acquired = Lease.acquire(self.LEASE_NAME, self.holder, Config.LEADER_LEASE_SECONDS)
+            except Exception as e:
+                logger.error(f"Lease heartbeat failed: {e}")
+                return
+            if acquired and not self.is_leader:
+                logger.info(f"Process {self.holder} became settlement leader")
+                self.is_leader = True
+                self.engine.start()
+            elif not acquired and self.is_leader:
+                logger.warning(f"Process {self.holder} lost settlement leadership")
+                self.is_leader = False
+                self.engine.stop()
+    
+    def resign(self):
+        """进程退出时释放租约，其他进程无需等待过期即可接管"""
+        with self._lock:
+            if not self.is_leader:
+                return
+            self.is_leader = False
+            try:
+                Lease.release(self.LEASE_NAME, self.holder)
+            except Exception as e:
+                logger.error(f"Failed to release lease: {e}")
+
+_engine = None
+_election = None
+
+def get_engine():
+    """获取当前进程的结算引擎（未启动时为None）"""
+    return _engine
+
+def is_leader():
+    """当前进程是否负责结算"""
+    return _election is not None and _election.is_leader
+
+def _collect_settlement():
+    engine = get_engine()
+    return [
+        ('settlement_leader', 'gauge', '当前进程是否负责结算', [([], 1 if is_leader() else 0)]),
+        ('settlement_pending_auctions', 'gauge', '等待到期结算的拍卖数量',
+         [([], engine.pending_count() if engine and is_leader() else 0)]),
+    ]
+
+metrics.register_collector(_collect_settlement)
+
+def schedule_settlement(auction_id, end_time):
+    """登记新拍卖的结束时间，使其到期时立即结算"""
+    # 非结算进程无需登记，结算进程会在下一次增量同步时加载
+    if is_leader():
+        _engine.add(auction_id, end_time)
+
+def schedule_settlements(items):
+    """批量登记新拍卖的结束时间 [(拍卖ID, 结束时间)]"""
+    if is_leader():
+        _engine.add_many(items)
 
 def start_scheduler():
-    """启动定时任务"""
+    """启动定时任务（多进程部署时只有持有租约的进程执行结算）"""
+    global _engine, _election
     scheduler = BackgroundScheduler()
-    # 每30秒检查一次
-    scheduler.add_job(
-        func=check_and_settle_auctions,
-        trigger="interval",
-        seconds=30,
-        id='settle_auctions',
-        name='结算到期拍卖',
-        replace_existing=True
-    )
     scheduler.start()
+    _engine = SettlementEngine(scheduler)
+    _election = LeaderElection(scheduler, _engine)
+    _election.start()
     return scheduler
-
@@ -0,0 +1,81 @@
+"""ASGI原生出价接口：请求体超过 MAX_CONTENT_LENGTH 时返回413，不再继续读取
+
+用法（在 backend 目录下）：
+    python -m unittest discover tests
+"""
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+os.environ['DATABASE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='test-asgi-'), 'auction.db')
+
+from asgi import app, flask_app
+from config import Config
+from utils import END_TIME_FORMAT
+
+
+def call(path, chunks, headers=()):
+    """以ASGI方式发送POST请求，返回 (状态码, 响应体, 读取的请求体分块数)"""
+    messages = [{'type': 'http.request', 'body': chunk, 'more_body': i < len(chunks) - 1}
+                for i, chunk in enumerate(chunks)]
+    received = []
+    sent = []
+
+    async def receive():
+        message = messages[len(received)]
+        received.append(message)
+        return message
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'method': 'POST', 'path': path, 'query_string': b'', 'client': ('127.0.0.1', 5000),
+             'headers': [(key.encode(), value.encode()) for key, value in headers]}
+    asyncio.run(app(scope, receive, send))
+    body = b''.join(message.get('body', b'') for message in sent if message['type'] == 'http.response.body')
+    return sent[0]['status'], json.loads(body), len(received)
+
+
+class BidBodyLimitTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        client = flask_app.test_client()
+        tokens = [client.post('/api/auth/register', json={
+            'username': name, 'email': f'{name}@test.local', 'password': 'abc12345'}).get_json()['token']
+            for name in ('asgi-seller', 'asgi-bidder')]
+        end_time = (datetime.now() + timedelta(hours=2)).strftime(END_TIME_FORMAT)
+        response = client.post('/api/auctions', json={
+            'title': 'ASGI', 'description': 'body limit', 'starting_price': 1, 'end_time': end_time},
+            headers={'Authorization': 'Bearer ' + tokens[0]})
+        cls.path = f"/api/auctions/{response.get_json()['auction']['id']}/bids"
+        cls.auth = ('authorization', 'Bearer ' + tokens[1])
+
+    def setUp(self):
+        patcher = mock.patch.object(Config, 'MAX_CONTENT_LENGTH', 64)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_small_body_is_accepted(self):
+        status, data, _ = call(self.path, [b'{"amount":', b' 5}'], [self.auth])
+        self.assertEqual(status, 201)
+        self.assertEqual(data['current_price'], 5.0)
+
+    def test_streamed_body_over_limit_stops_reading(self):
+        chunks = [b'{"amount": 5, "pad": "' + b'x' * 40, b'x' * 40, b'x' * 40, b'"}']
+        status, data, received = call(self.path, chunks, [self.auth])
+        self.assertEqual(status, 413)
+        self.assertEqual(data, {'error': '请求数据过大'})
+        self.assertEqual(received, 2)
+
+    def test_declared_length_over_limit_is_rejected_before_reading(self):
+        status, _, received = call(self.path, [b'{"amount": 5}'], [self.auth, ('content-length', '1000')])
+        self.assertEqual(status, 413)
+        self.assertEqual(received, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+"""批量导入：逐行校验JSON Lines，错误行返回行号和原因，不影响其他行；插入失败只影响所在的一批
+
+用法（在 backend 目录下）：
+    python -m unittest discover tests
+"""
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+os.environ['DATABASE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='test-bulk-'), 'auction.db')
+
+from app import create_app
+from config import Config
+from database import get_db, release_db
+from models import Auction
+from utils import END_TIME_FORMAT
+
+
+def auction_line(title, **fields):
+    end_time = (datetime.now() + timedelta(hours=2)).strftime(END_TIME_FORMAT)
+    return json.dumps({'title': title, 'description': 'bulk', 'starting_price': 10, 'end_time': end_time, **fields})
+
+
+class BulkImportTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = create_app()
+        cls.client = cls.app.test_client()
+        response = cls.client.post('/api/auth/register', json={
+            'username': 'bulk-seller', 'email': 'bulk-seller@test.local', 'password': 'abc12345'})
+        cls.headers = {'Authorization': 'Bearer ' + response.get_json()['token']}
+
+    def post(self, lines):
+        response = self.client.post('/api/auctions/bulk', data='\n'.join(lines) + '\n',
+                                    headers=self.headers, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()
+
+    def titles(self, ids):
+        conn = get_db()
+        placeholders = ','.join('?' * len(ids))
+        rows = conn.execute(f'SELECT id, title FROM auctions WHERE id IN ({placeholders})', list(ids)).fetchall()
+        release_db(conn)
+        return {row['id']: row['title'] for row in rows}
+
+    def test_invalid_lines_report_line_numbers(self):
+        lines = [
+            auction_line('Bulk ok 1'),
+            '{not json',
+            '',
+            json.dumps(['not', 'an', 'object']),
+            auction_line(''),
+            auction_line('Bulk bad price', starting_price='10'),
+            auction_line('Bulk past', end_time='2000-01-01T00:00:00'),
+            auction_line('Bulk bad time', end_time='tomorrow'),
+            auction_line(42),
+            auction_line('Bulk bad images', images='x.png'),
+            auction_line('Bulk ok 2', soft_close_window=60, soft_close_extension=120),
+        ]
+        data = self.post(lines)
+        self.assertEqual((data['created'], data['failed']), (2, 8))
+        errors = {result['line']: result['error'] for result in data['results'] if 'error' in result}
+        self.assertEqual(errors, {
+            2: '请求数据格式不正确',
+            4: '请求数据格式不正确',
+            5: '标的名称不能为空',
+            6: '请求数据格式不正确',
+            7: '拍卖结束时间必须至少在未来1小时后',
+            8: '结束时间格式不正确',
+            9: '请求数据格式不正确',
+            10: '图片格式不正确',
+        })
+        created = {result['line']: result['id'] for result in data['results'] if 'id' in result}
+        self.assertEqual(sorted(created), [1, 11])
+        self.assertEqual(self.titles(created.values()), {created[1]: 'Bulk ok 1', created[11]: 'Bulk ok 2'})
+        self.assertEqual(Auction.get_by_id(created[11])['soft_close_extension'], 120)
+
+    def test_failed_chunk_only_fails_its_rows(self):
+        original = Auction.create_many
+        calls = []
+
+        def fail_second_chunk(seller_id, rows):
+            calls.append(len(rows))
+            if len(calls) == 2:
+                raise sqlite3.OperationalError('database is locked')
+            return original(seller_id, rows)
+
+        lines = [auction_line(f'Bulk chunk {i}') for i in range(5)]
+        with mock.patch.object(Config, 'BULK_IMPORT_CHUNK_SIZE', 2):
+            with mock.patch.object(Auction, 'create_many', side_effect=fail_second_chunk):
+                data = self.post(lines)
+        self.assertEqual(calls, [2, 2, 1])
+        self.assertEqual((data['created'], data['failed']), (3, 2))
+        self.assertEqual([result['line'] for result in data['results']], [1, 2, 3, 4, 5])
+        self.assertEqual([result.get('error') for result in data['results'][2:4]], ['保存失败，请重试'] * 2)
+        created = [result['id'] for result in data['results'] if 'id' in result]
+        self.assertEqual(sorted(self.titles(created).values()), ['Bulk chunk 0', 'Bulk chunk 1', 'Bulk chunk 4'])
+
+    def test_rows_beyond_limit_are_not_processed(self):
+        lines = [auction_line(f'Bulk limit {i}') for i in range(5)]
+        with mock.patch.object(Config, 'BULK_IMPORT_MAX_ROWS', 3):
+            data = self.post(lines)
+        self.assertEqual((data['created'], data['failed']), (3, 1))
+        self.assertEqual(data['results'][-1], {'line': 4, 'error': '单次最多导入 3 条，其余行未处理'})
+
+    def test_requires_login(self):
+        response = self.client.post('/api/auctions/bulk', data=auction_line('Bulk anonymous') + '\n')
+        self.assertEqual(response.status_code, 401)
+
+    def test_export_returns_imported_rows(self):
+        data = self.post([auction_line('Bulk export')])
+        auction_id = data['results'][0]['id']
+        response = self.client.get('/api/auctions/my/export', headers=self.headers)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        exported = [record for record in records if record['type'] == 'auction' and record['id'] == auction_id]
+        self.assertEqual(len(exported), 1)
+        self.assertEqual(exported[0]['title'], 'Bulk export')
+
+
+if __name__ == '__main__':
+    unittest.main()
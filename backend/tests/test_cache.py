@@ -0,0 +1,143 @@
+"""读穿透缓存：按版本号失效，出价只使该拍卖的详情失效，结算和新发布的拍卖使列表失效
+
+用法（在 backend 目录下）：
+    python -m unittest discover tests
+"""
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+os.environ['DATABASE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='test-cache-'), 'auction.db')
+
+import cache as cache_module
+from cache import Cache, MemoryCache, NullCache, cache, create_backend
+from config import Config
+from database import get_db, init_db, release_db
+from models import Auction, Bid
+from utils import END_TIME_FORMAT
+
+
+class CacheVersioningTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = Cache(MemoryCache(100), ttl=60)
+        self.loads = 0
+
+    def load(self, value='v'):
+        self.loads += 1
+        return f'{value}{self.loads}'
+
+    def test_hit_until_version_bumped(self):
+        self.assertEqual(self.cache.get_or_load('auction', 1, self.load, depends_on='auction:1'), 'v1')
+        self.assertEqual(self.cache.get_or_load('auction', 1, self.load, depends_on='auction:1'), 'v1')
+        self.cache.bump('auction:2')
+        self.assertEqual(self.cache.get_or_load('auction', 1, self.load, depends_on='auction:1'), 'v1')
+        self.cache.bump('auction:1')
+        self.assertEqual(self.cache.get_or_load('auction', 1, self.load, depends_on='auction:1'), 'v2')
+        self.assertEqual(self.cache.stats()['auction'], {'hits': 2, 'misses': 2, 'hit_rate': 0.5})
+
+    def test_invalidate_auction_keeps_lists_unless_requested(self):
+        self.cache.get_or_load('auction', 1, self.load, depends_on='auction:1')
+        self.cache.get_or_load('auction_list', 'p1', self.load, depends_on='auction_list')
+        self.cache.invalidate_auction(1)
+        self.assertEqual(self.cache.get_or_load('auction', 1, self.load, depends_on='auction:1'), 'v3')
+        self.assertEqual(self.cache.get_or_load('auction_list', 'p1', self.load, depends_on='auction_list'), 'v2')
+
+        self.cache.invalidate_auction(1, lists=True)
+        self.assertEqual(self.cache.get_or_load('auction_list', 'p1', self.load, depends_on='auction_list'), 'v4')
+        self.cache.invalidate_lists()
+        self.assertEqual(self.cache.get_or_load('auction_list', 'p1', self.load, depends_on='auction_list'), 'v5')
+
+    def test_write_during_load_does_not_cache_stale_value_under_new_version(self):
+        def load_while_bidding():
+            # 加载期间发生写入：本次读到的是旧数据，只能缓存在写入前的版本号下
+            self.cache.invalidate_auction(1)
+            return 'stale'
+
+        self.assertEqual(self.cache.get_or_load('auction', 1, load_while_bidding, depends_on='auction:1'), 'stale')
+        self.assertEqual(self.cache.get_or_load('auction', 1, self.load, depends_on='auction:1'), 'v1')
+
+    def test_none_is_not_cached(self):
+        self.assertIsNone(self.cache.get_or_load('auction', 9, lambda: None, depends_on='auction:9'))
+        self.assertEqual(self.cache.get_or_load('auction', 9, self.load, depends_on='auction:9'), 'v1')
+
+    def test_backend_failure_falls_back_to_loader(self):
+        with mock.patch.object(self.cache.backend, 'get_counter', side_effect=ConnectionError('down')):
+            self.assertEqual(self.cache.get_or_load('auction', 1, self.load, depends_on='auction:1'), 'v1')
+        with mock.patch.object(self.cache.backend, 'incr', side_effect=ConnectionError('down')):
+            self.cache.invalidate_auction(1)
+
+    def test_memory_cache_copies_expires_and_evicts(self):
+        backend = MemoryCache(2)
+        value = {'bids': [1]}
+        backend.set('a', value, 60)
+        value['bids'].append(2)
+        hit, cached = backend.get('a')
+        self.assertEqual(cached, {'bids': [1]})
+        cached['bids'].append(3)
+        self.assertEqual(backend.get('a'), (True, {'bids': [1]}))
+
+        backend.set('b', 2, 60)
+        backend.get('a')
+        backend.set('c', 3, 60)
+        self.assertEqual(backend.get('b'), (False, None))
+        self.assertEqual(backend.get('a')[0], True)
+
+        backend.set('d', 4, -1)
+        self.assertEqual(backend.get('d'), (False, None))
+
+    def test_memory_backend_disabled_with_several_workers(self):
+        with mock.patch.object(Config, 'CACHE_BACKEND', 'memory'):
+            with mock.patch.object(Config, 'WEB_CONCURRENCY', 4), self.assertLogs(cache_module.logger, 'WARNING'):
+                self.assertIsInstance(create_backend(), NullCache)
+            with mock.patch.object(Config, 'WEB_CONCURRENCY', 1):
+                self.assertIsInstance(create_backend(), MemoryCache)
+
+
+@unittest.skipUnless(isinstance(cache.backend, MemoryCache), '需要进程内缓存（CACHE_BACKEND=memory）')
+class ModelCacheTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        init_db()
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute('INSERT INTO users (username, email, password) VALUES (?, ?, ?)',
+                       ('cache-seller', 'cache-seller@test.local', '-'))
+        cls.seller_id = cursor.lastrowid
+        cursor.execute('INSERT INTO users (username, email, password) VALUES (?, ?, ?)',
+                       ('cache-bidder', 'cache-bidder@test.local', '-'))
+        cls.bidder_id = cursor.lastrowid
+        conn.commit()
+        release_db(conn)
+
+    def create_auction(self):
+        end_time = (datetime.now() + timedelta(hours=2)).strftime(END_TIME_FORMAT)
+        return Auction.create('Cached', 'cache', 1, end_time, self.seller_id, [], 1)
+
+    def list_ids(self):
+        auctions, _, _ = Auction.get_list(per_page=100)
+        return {auction['id']: auction for auction in auctions}
+
+    def test_bid_refreshes_detail_but_not_lists(self):
+        auction = self.create_auction()
+        self.assertEqual(Auction.get_by_id(auction['id'])['current_price'], 1)
+        self.assertEqual(self.list_ids()[auction['id']]['current_price'], 1)
+
+        self.assertIsNotNone(Bid.place(auction['id'], self.bidder_id, 5))
+        self.assertEqual(Auction.get_by_id(auction['id'])['current_price'], 5)
+        # 列表条目不因出价失效，按 CACHE_LIST_TTL_SECONDS 过期
+        self.assertEqual(self.list_ids()[auction['id']]['current_price'], 1)
+
+    def test_new_auction_and_status_change_refresh_lists(self):
+        self.list_ids()
+        auction = self.create_auction()
+        self.assertEqual(self.list_ids()[auction['id']]['status'], 'active')
+
+        Auction.update_status(auction['id'], 'no_bid')
+        self.assertEqual(Auction.get_by_id(auction['id'])['status'], 'no_bid')
+        self.assertEqual(self.list_ids()[auction['id']]['status'], 'no_bid')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+"""键集游标分页：逐页取完与按排序键整体排序的结果一致（排序键相同时按ID区分），篡改的游标返回400
+
+用法（在 backend 目录下）：
+    python -m unittest discover tests
+"""
+import base64
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+os.environ['DATABASE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='test-cursor-'), 'auction.db')
+
+from app import create_app
+from database import get_db, release_db
+from models import Auction, decode_cursor, encode_cursor
+from utils import END_TIME_FORMAT
+
+
+def raw_cursor(values):
+    """按 encode_cursor 的格式编码任意JSON值（用于构造篡改的游标）"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+class CursorPaginationTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = create_app()
+        cls.client = cls.app.test_client()
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute('INSERT INTO users (username, email, password) VALUES (?, ?, ?)',
+                       ('cursor-seller', 'cursor-seller@test.local', '-'))
+        seller_id = cursor.lastrowid
+        cursor.execute('INSERT INTO users (username, email, password) VALUES (?, ?, ?)',
+                       ('cursor-bidder', 'cursor-bidder@test.local', '-'))
+        bidder_id = cursor.lastrowid
+        conn.commit()
+        release_db(conn)
+
+        # 同一秒内创建，created_at 全部相同；结束时间每三个拍卖相同
+        base = datetime.now() + timedelta(hours=2)
+        for i in range(23):
+            end_time = (base + timedelta(minutes=i // 3)).strftime(END_TIME_FORMAT)
+            Auction.create(f'Cursor {i}', 'pagination', 1, end_time, seller_id, [], 1)
+        cls.auction_id = Auction.create('Bids', 'pagination', 1, base.strftime(END_TIME_FORMAT), seller_id, [], 1)['id']
+        conn = get_db()
+        conn.executemany('INSERT INTO bids (auction_id, bidder_id, amount) VALUES (?, ?, ?)',
+                         [(cls.auction_id, bidder_id, 2 + i) for i in range(17)])
+        conn.commit()
+        release_db(conn)
+
+    def expected_ids(self, query, params=()):
+        conn = get_db()
+        ids = [row[0] for row in conn.execute(query, params).fetchall()]
+        release_db(conn)
+        return ids
+
+    def collect_auction_pages(self, order_by):
+        ids, cursor, pages = [], '', 0
+        while True:
+            response = self.client.get('/api/auctions', query_string={
+                'order_by': order_by, 'per_page': 5, 'cursor': cursor})
+            self.assertEqual(response.status_code, 200)
+            data = response.get_json()
+            ids.extend(auction['id'] for auction in data['auctions'])
+            pages += 1
+            if not data['pagination']['has_more']:
+                return ids, pages
+            cursor = data['pagination']['next_cursor']
+
+    def test_auction_list_round_trip_by_created_at(self):
+        ids, pages = self.collect_auction_pages('created_at')
+        self.assertEqual(ids, self.expected_ids('SELECT id FROM auctions ORDER BY created_at DESC, id DESC'))
+        self.assertEqual(pages, (len(ids) + 4) // 5)
+
+    def test_auction_list_round_trip_by_end_time_with_ties(self):
+        ids, _ = self.collect_auction_pages('end_time')
+        self.assertEqual(ids, self.expected_ids('SELECT id FROM auctions ORDER BY end_time ASC, id ASC'))
+
+    def test_bid_history_round_trip(self):
+        ids, cursor = [], None
+        while True:
+            query = {'limit': 4}
+            if cursor:
+                query['cursor'] = cursor
+            data = self.client.get(f'/api/auctions/{self.auction_id}/bids', query_string=query).get_json()
+            ids.extend(bid['id'] for bid in data['bids'])
+            if not data['has_more']:
+                break
+            cursor = data['next_cursor']
+        self.assertEqual(ids, self.expected_ids(
+            'SELECT id FROM bids WHERE auction_id = ? ORDER BY created_at DESC, id DESC', (self.auction_id,)))
+
+    def test_decode_round_trip(self):
+        for values in (['2030-01-01 10:00:00', 7], [-3.25, 12], [0, 1]):
+            self.assertEqual(decode_cursor(encode_cursor(*values)), values)
+
+    def test_tampered_cursors_are_rejected(self):
+        tampered = [
+            'not a cursor!',
+            base64.urlsafe_b64encode(b'\xff\xfe').decode(),
+            raw_cursor({'created_at': 'x', 'id': 1}),
+            raw_cursor(['2030-01-01 10:00:00']),
+            raw_cursor(['2030-01-01 10:00:00', 1, 2]),
+            raw_cursor(['2030-01-01 10:00:00', '1']),
+            raw_cursor(['2030-01-01 10:00:00', 1.5]),
+            raw_cursor(['2030-01-01 10:00:00', True]),
+            raw_cursor([['nested'], 1]),
+            raw_cursor([None, 1]),
+        ]
+        for cursor in tampered:
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(ValueError):
+                    decode_cursor(cursor)
+                response = self.client.get('/api/auctions', query_string={'cursor': cursor})
+                self.assertEqual(response.status_code, 400)
+                response = self.client.get(f'/api/auctions/{self.auction_id}/bids', query_string={'cursor': cursor})
+                self.assertEqual(response.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
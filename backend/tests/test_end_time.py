@@ -0,0 +1,82 @@
+"""带时区的结束时间：存储时统一为服务器本地时间，出价、软结束和结算按本地时间判断
+
+用法（在 backend 目录下）：
+    python -m unittest discover tests
+"""
+import os
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+
+# 服务器时区与UTC不同时，未统一的 'Z' 结束时间按字符串比较会出错
+os.environ['TZ'] = 'Asia/Shanghai'
+time.tzset()
+os.environ['DATABASE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='test-end-time-'), 'auction.db')
+
+from app import create_app
+from database import get_db, release_db
+from models import Auction, Bid, is_due, soft_close_end_time
+from utils import END_TIME_FORMAT, normalize_end_time
+
+
+def utc_after(seconds):
+    return (datetime.now(timezone.utc) + timedelta(seconds=seconds)).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def local_after(seconds):
+    return (datetime.now() + timedelta(seconds=seconds)).strftime(END_TIME_FORMAT)
+
+
+class EndTimeTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = create_app()
+        with cls.app.app_context():
+            conn = get_db()
+            conn.executemany('INSERT INTO users (username, email, password) VALUES (?, ?, ?)',
+                             [('seller', 'seller@test.local', '-'), ('bidder', 'bidder@test.local', '-')])
+            conn.commit()
+            cls.seller_id, cls.bidder_id = [row['id'] for row in conn.execute(
+                "SELECT id FROM users WHERE username IN ('seller', 'bidder') ORDER BY id")]
+            release_db(conn)
+
+    def setUp(self):
+        self.context = self.app.app_context()
+        self.context.push()
+
+    def tearDown(self):
+        self.context.pop()
+
+    def test_normalize_converts_offsets_to_local_time(self):
+        self.assertEqual(normalize_end_time('2030-01-01T02:00:00Z'), '2030-01-01T10:00:00')
+        self.assertEqual(normalize_end_time('2030-01-01T10:00:00+08:00'), '2030-01-01T10:00:00')
+        self.assertEqual(normalize_end_time('2030-01-01 10:00:00.5'), '2030-01-01T10:00:00')
+        with self.assertRaises(ValueError):
+            normalize_end_time('tomorrow')
+
+    def test_soft_close_end_time_with_utc_end_time(self):
+        auction = {'end_time': utc_after(30), 'soft_close_window': 60, 'soft_close_extension': 120}
+        self.assertGreaterEqual(soft_close_end_time(auction), local_after(110))
+        auction['end_time'] = utc_after(3 * 3600)
+        self.assertEqual(soft_close_end_time(auction), normalize_end_time(auction['end_time']))
+        self.assertFalse(is_due(auction['end_time']))
+
+    def test_bid_extends_auction_stored_with_utc_end_time(self):
+        auction = Auction.create('Z end', 'soft close', 1, utc_after(30), self.seller_id, [], 1,
+                                 soft_close_window=60, soft_close_extension=120)
+        self.assertEqual(auction['end_time'], normalize_end_time(auction['end_time']))
+        bid = Bid.place(auction['id'], self.bidder_id, 5)
+        self.assertIsNotNone(bid)
+        self.assertGreaterEqual(bid['auction_end_time'], local_after(110))
+
+    def test_settle_skips_auctions_ending_later(self):
+        later = Auction.create('Offset end', 'not due', 1, utc_after(3 * 3600), self.seller_id, [], 1)
+        due = Auction.create('Offset end', 'due', 1,
+                             (datetime.now(timezone(timedelta(hours=-5))) - timedelta(seconds=1)).isoformat(),
+                             self.seller_id, [], 1)
+        self.assertEqual(Auction.settle([later['id'], due['id']]), {due['id']: 'no_bid'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+"""图片存储：data URL 按内容哈希保存，本站图片URL返回图片键，外部链接原样保留
+
+用法（在 backend 目录下）：
+    python -m unittest discover tests
+"""
+import base64
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+os.environ['DATABASE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='test-images-'), 'auction.db')
+
+from config import Config
+from database import get_db, init_db, release_db
+from images import save_image
+from models import Auction
+from utils import END_TIME_FORMAT
+
+PNG = 'data:image/png;base64,' + base64.b64encode(b'\x89PNG\r\n\x1a\n' + b'0' * 32).decode()
+
+
+class SaveImageTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(Config, 'UPLOAD_FOLDER', tempfile.mkdtemp(prefix='test-uploads-'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_data_url_is_stored_once_by_content(self):
+        image_key = save_image(PNG)
+        self.assertRegex(image_key, r'^[0-9a-f]{64}\.png$')
+        self.assertEqual(save_image(PNG), image_key)
+        self.assertEqual(save_image('/api/images/' + image_key), image_key)
+        self.assertEqual(os.listdir(os.path.join(Config.UPLOAD_FOLDER, 'images')), [image_key])
+
+    def test_external_urls_are_kept_as_is(self):
+        for url in ('https://example.com/lamp.jpg', 'http://example.com/a.png?x=1', 'HTTPS://EXAMPLE.COM/B.PNG'):
+            self.assertEqual(save_image(url), url)
+        self.assertFalse(os.path.exists(os.path.join(Config.UPLOAD_FOLDER, 'images')))
+
+    def test_invalid_images_are_rejected(self):
+        for value in (42, 'ftp://example.com/a.png', 'data:text/plain;base64,aGk=', 'data:image/png;base64,@@',
+                      '/api/images/' + '0' * 64 + '.png'):
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    save_image(value)
+
+    def test_auction_lists_stored_images_before_external_links(self):
+        init_db()
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute('INSERT INTO users (username, email, password) VALUES (?, ?, ?)',
+                       ('images-seller', 'images-seller@test.local', '-'))
+        seller_id = cursor.lastrowid
+        conn.commit()
+        release_db(conn)
+
+        image_key = save_image(PNG)
+        end_time = (datetime.now() + timedelta(hours=2)).strftime(END_TIME_FORMAT)
+        auction = Auction.create('Images', 'images', 1, end_time, seller_id,
+                                 ['https://example.com/lamp.jpg', image_key], 1)
+        self.assertEqual(auction['images'], ['/api/images/' + image_key, 'https://example.com/lamp.jpg'])
+
+        [(auction_id, _)] = Auction.create_many(seller_id, [{
+            'title': 'Linked', 'description': 'images', 'starting_price': 1, 'end_time': end_time,
+            'images': ['https://example.com/lamp.jpg'], 'min_increment': 1,
+            'soft_close_window': 0, 'soft_close_extension': 0}])
+        auction = Auction.get_by_id(auction_id)
+        self.assertEqual(auction['images'], ['https://example.com/lamp.jpg'])
+        self.assertEqual(auction['thumbnail'], 'https://example.com/lamp.jpg')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+"""内存出价引擎：并发出价合并为一个事务提交，返回时已写入数据库；写入失败时移出拍卖并从出价表重新加载
+
+用法（在 backend 目录下）：
+    python -m unittest discover tests
+"""
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+os.environ['DATABASE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='test-orderbook-'), 'auction.db')
+
+from database import get_db, init_db, release_db
+from models import Auction, Bid
+from orderbook import BidRejected, OrderBook
+from utils import END_TIME_FORMAT
+
+
+def outbid(auction, bidder_id, amount):
+    """与出价接口相同的最低加价校验"""
+    if amount < auction['current_price'] + auction['min_increment']:
+        return '出价过低'
+    return None
+
+
+class OrderBookTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        init_db()
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute('INSERT INTO users (username, email, password) VALUES (?, ?, ?)',
+                       ('book-seller', 'book-seller@test.local', '-'))
+        cls.seller_id = cursor.lastrowid
+        cls.bidder_ids = []
+        for i in range(8):
+            cursor.execute('INSERT INTO users (username, email, password) VALUES (?, ?, ?)',
+                           (f'book-bidder-{i}', f'book-bidder-{i}@test.local', '-'))
+            cls.bidder_ids.append(cursor.lastrowid)
+        conn.commit()
+        release_db(conn)
+
+    def setUp(self):
+        self.book = OrderBook(window=0.2, max_batch=100)
+        self.book.start()
+
+    def tearDown(self):
+        self.book.stop()
+
+    def create_auction(self):
+        end_time = (datetime.now() + timedelta(hours=2)).strftime(END_TIME_FORMAT)
+        return Auction.create('Book', 'order book', 1, end_time, self.seller_id, [], 1)['id']
+
+    def stored_bids(self, auction_id):
+        conn = get_db()
+        rows = conn.execute('SELECT id, bidder_id, amount FROM bids WHERE auction_id = ? ORDER BY id',
+                            (auction_id,)).fetchall()
+        release_db(conn)
+        return [dict(row) for row in rows]
+
+    def test_concurrent_bids_share_one_commit(self):
+        auction_ids = [self.create_auction(), self.create_auction()]
+        barrier = threading.Barrier(len(self.bidder_ids))
+        placed, errors = [], []
+
+        def bid(index, bidder_id):
+            try:
+                barrier.wait(timeout=5)
+                result, _, _ = self.book.place(auction_ids[index % 2], bidder_id, 10 + index, lambda *args: None)
+                # 返回时出价已提交，出价ID已确定
+                placed.append(result)
+            except Exception as exc:
+                errors.append(exc)
+
+        with mock.patch.object(Bid, 'create_many', wraps=Bid.create_many) as create_many:
+            threads = [threading.Thread(target=bid, args=(i, bidder_id)) for i, bidder_id in enumerate(self.bidder_ids)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(placed), len(self.bidder_ids))
+        self.assertLess(create_many.call_count, len(self.bidder_ids))
+        self.assertEqual(sum(len(call.args[0]) for call in create_many.call_args_list), len(self.bidder_ids))
+        stored = {bid['id'] for auction_id in auction_ids for bid in self.stored_bids(auction_id)}
+        self.assertEqual(stored, {bid['id'] for bid in placed})
+        self.assertEqual(self.book.book_count(), 2)
+
+    def test_rejected_bid_is_not_written(self):
+        auction_id = self.create_auction()
+        self.book.place(auction_id, self.bidder_ids[0], 5, outbid)
+        with self.assertRaises(BidRejected) as raised:
+            self.book.place(auction_id, self.bidder_ids[1], 5.5, outbid)
+        self.assertEqual(raised.exception.status, 400)
+        self.assertEqual([bid['amount'] for bid in self.stored_bids(auction_id)], [5])
+
+    def test_failed_write_evicts_and_reloads_from_bids(self):
+        auction_id = self.create_auction()
+        self.book.place(auction_id, self.bidder_ids[0], 5, outbid)
+
+        with mock.patch.object(Bid, 'create_many', side_effect=sqlite3.OperationalError('disk I/O error')):
+            with self.assertRaises(BidRejected) as raised:
+                self.book.place(auction_id, self.bidder_ids[1], 50, outbid)
+        self.assertEqual(raised.exception.status, 503)
+        self.assertEqual(self.book.book_count(), 0)
+
+        # 内存中曾接受的50未写入：重新加载后最高价仍为5，低于50的出价可以被接受
+        bid, stats, _ = self.book.place(auction_id, self.bidder_ids[2], 7, outbid)
+        self.assertEqual(stats, {'bid_count': 2, 'bidder_count': 2})
+        self.assertEqual([row['amount'] for row in self.stored_bids(auction_id)], [5, 7])
+        self.assertEqual(Auction.get_by_id(auction_id)['current_price'], 7)
+
+    def test_close_evicts_and_waits_for_pending_bids(self):
+        auction_id = self.create_auction()
+        self.book.place(auction_id, self.bidder_ids[0], 5, outbid)
+        self.assertEqual(self.book.book_count(), 1)
+        self.book.close([auction_id])
+        self.assertEqual(self.book.book_count(), 0)
+        self.assertEqual(self.book.queue_size(), 0)
+
+    def test_unknown_auction_is_rejected(self):
+        with self.assertRaises(BidRejected) as raised:
+            self.book.place(10 ** 9, self.bidder_ids[0], 5, outbid)
+        self.assertEqual(raised.exception.status, 404)
+        self.assertEqual(self.book.book_count(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
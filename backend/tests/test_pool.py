@@ -0,0 +1,99 @@
+"""连接池：多线程借出/归还连接，归还时回滚未提交事务，超出容量的连接直接关闭
+
+用法（在 backend 目录下）：
+    python -m unittest discover tests
+"""
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+os.environ['DATABASE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='test-pool-'), 'auction.db')
+
+from config import Config
+from database import ConnectionPool, get_db, get_pool, release_db
+
+
+class ConnectionPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.pool = ConnectionPool(Config.DATABASE_PATH, 4, Config.DB_STORAGE_PROFILE)
+        conn = self.pool.acquire()
+        conn.execute('CREATE TABLE IF NOT EXISTS items (id INTEGER PRIMARY KEY, thread TEXT)')
+        conn.execute('DELETE FROM items')
+        conn.commit()
+        self.pool.release(conn)
+
+    def tearDown(self):
+        self.pool.close_all()
+
+    def test_threads_hold_distinct_connections(self):
+        threads_count = 8
+        held = []
+        lock = threading.Lock()
+        barrier = threading.Barrier(threads_count)
+        errors = []
+
+        def worker(index):
+            try:
+                conn = self.pool.acquire()
+                with lock:
+                    held.append(conn)
+                # 所有线程同时持有连接，确认没有两个线程拿到同一个连接
+                barrier.wait(timeout=5)
+                conn.execute('INSERT INTO items (thread) VALUES (?)', (str(index),))
+                conn.commit()
+                self.pool.release(conn)
+            except Exception as exc:
+                errors.append(exc)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(threads_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len({id(conn) for conn in held}), threads_count)
+        conn = self.pool.acquire()
+        self.assertEqual(conn.execute('SELECT COUNT(*) FROM items').fetchone()[0], threads_count)
+        self.pool.release(conn)
+        # 池容量为4：多出的连接归还时被关闭，池中最多保留4个空闲连接
+        self.assertEqual(self.pool._idle.qsize(), 4)
+        closed = [conn for conn in held if self._is_closed(conn)]
+        self.assertEqual(len(closed), threads_count - 4)
+
+    def test_released_connection_is_reused(self):
+        conn = self.pool.acquire()
+        self.pool.release(conn)
+        self.assertIs(self.pool.acquire(), conn)
+
+    def test_release_rolls_back_open_transaction(self):
+        conn = self.pool.acquire()
+        conn.execute('INSERT INTO items (thread) VALUES (?)', ('uncommitted',))
+        self.assertTrue(conn.in_transaction)
+        self.pool.release(conn)
+
+        conn = self.pool.acquire()
+        self.assertFalse(conn.in_transaction)
+        self.assertEqual(conn.execute('SELECT COUNT(*) FROM items').fetchone()[0], 0)
+        self.pool.release(conn)
+
+    def test_get_db_outside_app_context_returns_to_global_pool(self):
+        conn = get_db()
+        self.assertIs(conn.pool, get_pool())
+        release_db(conn)
+        self.assertIs(get_db(), conn)
+        release_db(conn)
+
+    @staticmethod
+    def _is_closed(conn):
+        try:
+            conn.execute('SELECT 1')
+        except sqlite3.ProgrammingError:
+            return True
+        return False
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+"""代理出价：按 (最高价从高到低, 登记时间从早到晚) 决定胜者，胜者出到第二名的最高价加一个加价幅度
+
+用法（在 backend 目录下）：
+    python -m unittest discover tests
+"""
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+os.environ['DATABASE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='test-proxy-'), 'auction.db')
+
+from database import get_db, init_db, release_db
+from models import Auction, Bid, resolve_proxies
+from utils import END_TIME_FORMAT
+
+LEADER, A, B, C = 1, 2, 3, 4
+
+
+def proxy(bidder_id, max_amount, placed_at):
+    return {'bidder_id': bidder_id, 'max_amount': max_amount, 'placed_at': f'2030-01-01 00:00:00.{placed_at:06d}'}
+
+
+def ordered(*proxies):
+    """按出价引擎和 _load_proxies 中的规则排序"""
+    return sorted(proxies, key=lambda item: (-item['max_amount'], item['placed_at']))
+
+
+class ResolveProxiesTest(unittest.TestCase):
+    def test_no_challenger(self):
+        self.assertEqual(resolve_proxies(10, LEADER, 1, []), [])
+        # 最高价不足当前价加一个加价幅度
+        self.assertEqual(resolve_proxies(10, LEADER, 1, ordered(proxy(A, 10.5, 1))), [])
+        # 只有当前最高出价者自己的代理
+        self.assertEqual(resolve_proxies(10, LEADER, 1, ordered(proxy(LEADER, 50, 1))), [])
+
+    def test_single_proxy_outbids_by_one_increment(self):
+        self.assertEqual(resolve_proxies(10, LEADER, 1, ordered(proxy(A, 20, 1))), [(A, 11)])
+        self.assertEqual(resolve_proxies(10, None, 1, ordered(proxy(A, 20, 1))), [(A, 11)])
+
+    def test_winner_pays_runner_up_plus_increment(self):
+        self.assertEqual(resolve_proxies(10, None, 1, ordered(proxy(B, 25, 1), proxy(A, 30, 2))),
+                         [(B, 25), (A, 26)])
+        # 不超过胜者自己的最高价
+        self.assertEqual(resolve_proxies(10, None, 1, ordered(proxy(B, 25, 1), proxy(A, 25.5, 2))),
+                         [(B, 25), (A, 25.5)])
+
+    def test_equal_max_earlier_proxy_wins(self):
+        # 最高价相同时先登记的胜出，以相同金额后写入成为最高出价
+        self.assertEqual(resolve_proxies(10, None, 1, ordered(proxy(B, 25, 2), proxy(A, 25, 1))),
+                         [(B, 25), (A, 25)])
+        self.assertEqual(resolve_proxies(10, None, 1, ordered(proxy(A, 25, 2), proxy(B, 25, 1))),
+                         [(A, 25), (B, 25)])
+
+    def test_leader_proxy_defends(self):
+        self.assertEqual(resolve_proxies(10, LEADER, 1, ordered(proxy(LEADER, 40, 1), proxy(C, 30, 2))),
+                         [(C, 30), (LEADER, 31)])
+        # 最高价相同且最高出价者先登记：挑战者出到最高价，最高出价者以相同金额应对
+        self.assertEqual(resolve_proxies(10, LEADER, 1, ordered(proxy(LEADER, 30, 1), proxy(C, 30, 2))),
+                         [(C, 30), (LEADER, 30)])
+
+    def test_earlier_challenger_beats_leader_proxy_with_equal_max(self):
+        self.assertEqual(resolve_proxies(10, LEADER, 1, ordered(proxy(LEADER, 30, 2), proxy(C, 30, 1))),
+                         [(LEADER, 30), (C, 30)])
+
+    def test_runner_up_is_higher_of_leader_and_second_challenger(self):
+        # 最高出价者没有代理：第二名是第二个挑战者
+        self.assertEqual(resolve_proxies(20, LEADER, 1, ordered(proxy(A, 50, 1), proxy(B, 45, 2))),
+                         [(B, 45), (A, 46)])
+        # 最高出价者的代理低于第二个挑战者
+        self.assertEqual(
+            resolve_proxies(20, LEADER, 1, ordered(proxy(LEADER, 30, 1), proxy(A, 50, 2), proxy(B, 40, 3))),
+            [(B, 40), (A, 41)])
+        # 最高出价者的代理高于第二个挑战者
+        self.assertEqual(
+            resolve_proxies(20, LEADER, 1, ordered(proxy(LEADER, 45, 1), proxy(A, 50, 2), proxy(B, 40, 3))),
+            [(LEADER, 45), (A, 46)])
+
+    def test_runner_up_at_current_price_is_not_written_again(self):
+        self.assertEqual(resolve_proxies(20, LEADER, 1, ordered(proxy(LEADER, 20, 1), proxy(A, 50, 2))),
+                         [(A, 21)])
+
+    def test_amounts_are_rounded_to_cents(self):
+        self.assertEqual(resolve_proxies(1, None, 0.1, ordered(proxy(A, 10, 1), proxy(B, 9.9, 2))),
+                         [(B, 9.9), (A, 10.0)])
+        self.assertEqual(resolve_proxies(1, None, 0.1, ordered(proxy(A, 20, 1), proxy(B, 9.7, 2))),
+                         [(B, 9.7), (A, 9.8)])
+
+
+class ProxyBiddingTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        init_db()
+        conn = get_db()
+        cursor = conn.cursor()
+        cls.user_ids = []
+        for name in ('proxy-seller', 'proxy-a', 'proxy-b', 'proxy-c'):
+            cursor.execute('INSERT INTO users (username, email, password) VALUES (?, ?, ?)',
+                           (name, f'{name}@test.local', '-'))
+            cls.user_ids.append(cursor.lastrowid)
+        conn.commit()
+        release_db(conn)
+
+    def create_auction(self):
+        end_time = (datetime.now() + timedelta(hours=2)).strftime(END_TIME_FORMAT)
+        return Auction.create('Proxy', 'proxy bidding', 10, end_time, self.user_ids[0], [], 1)['id']
+
+    def place_proxy(self, auction_id, bidder_id, max_amount):
+        bids, error = Bid.place_proxy(auction_id, bidder_id, max_amount, lambda *args: None)
+        self.assertIsNone(error)
+        return [(bid['bidder_id'], bid['amount']) for bid in bids]
+
+    def test_equal_proxies_earlier_one_leads(self):
+        _, a, b, c = self.user_ids
+        auction_id = self.create_auction()
+        self.assertEqual(self.place_proxy(auction_id, a, 30), [(a, 11)])
+        self.assertEqual(self.place_proxy(auction_id, b, 30), [(b, 30), (a, 30)])
+        auction = Auction.get_by_id(auction_id)
+        self.assertEqual((auction['current_bidder_id'], auction['current_price']), (a, 30))
+
+        # 直接出价超过两个代理的最高价
+        bid = Bid.place(auction_id, c, 31)
+        self.assertEqual(bid['proxy_bids'], [])
+        self.assertEqual(Auction.get_by_id(auction_id)['current_bidder_id'], c)
+
+    def test_direct_bid_is_answered_in_one_computation(self):
+        _, a, b, c = self.user_ids
+        auction_id = self.create_auction()
+        self.place_proxy(auction_id, a, 100)
+        self.place_proxy(auction_id, b, 60)
+        bid = Bid.place(auction_id, c, 70)
+        # 无论之前有多少代理，每次出价最多写入两条代理出价
+        self.assertEqual([(item['bidder_id'], item['amount']) for item in bid['proxy_bids']], [(a, 71)])
+        auction = Auction.get_by_id(auction_id)
+        self.assertEqual((auction['current_bidder_id'], auction['current_price']), (a, 71))
+
+
+if __name__ == '__main__':
+    unittest.main()
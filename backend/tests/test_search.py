@@ -0,0 +1,115 @@
+"""全文搜索：标题匹配排在只有描述匹配之前，所有关键词都需出现，按相关度游标分页
+
+用法（在 backend 目录下）：
+    python -m unittest discover tests
+"""
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+os.environ['DATABASE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='test-search-'), 'auction.db')
+
+from app import create_app
+from database import get_db, release_db
+from models import Auction
+from utils import END_TIME_FORMAT
+
+
+class SearchTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = create_app()
+        cls.client = cls.app.test_client()
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute('INSERT INTO users (username, email, password) VALUES (?, ?, ?)',
+                       ('search-seller', 'search-seller@test.local', '-'))
+        seller_id = cursor.lastrowid
+        conn.commit()
+        release_db(conn)
+
+        end_time = (datetime.now() + timedelta(hours=2)).strftime(END_TIME_FORMAT)
+
+        def create(title, description):
+            return Auction.create(title, description, 1, end_time, seller_id, [], 1)['id']
+
+        # 关键词 zephyr 只出现在这些拍卖中，不受同一数据库中其他测试数据影响
+        cls.description_only = create('Old desk', 'comes with a zephyr lamp')
+        cls.title_only = create('Zephyr lamp', 'brass, working')
+        cls.title_and_description = create('Zephyr lamp', 'zephyr lamp, zephyr shade')
+        cls.other_term = create('Zephyr chair & <stool>', 'oak')
+        cls.ties = [create('Zephyr vase', 'blue') for _ in range(5)]
+        cls.chinese = create('复古台灯 zephyr', '黄铜灯座')
+
+    def search(self, **params):
+        response = self.client.get('/api/auctions/search', query_string=params)
+        self.assertEqual(response.status_code, 200, response.get_json())
+        return response.get_json()
+
+    def search_ids(self, **params):
+        return [auction['id'] for auction in self.search(**params)['auctions']]
+
+    def test_title_matches_rank_above_description_matches(self):
+        ids = self.search_ids(q='zephyr lamp')
+        self.assertEqual(set(ids), {self.description_only, self.title_only, self.title_and_description})
+        self.assertEqual(ids[-1], self.description_only)
+        self.assertLess(ids.index(self.title_and_description), ids.index(self.description_only))
+        self.assertLess(ids.index(self.title_only), ids.index(self.description_only))
+
+    def test_all_terms_must_match(self):
+        self.assertEqual(self.search_ids(q='zephyr chair'), [self.other_term])
+        self.assertEqual(self.search_ids(q='zephyr nothing-like-this'), [])
+
+    def test_cursor_pages_follow_rank_then_id(self):
+        full = self.search_ids(q='zephyr vase', limit=100)
+        # 相关度相同的拍卖按ID倒序
+        self.assertEqual(full, sorted(self.ties, reverse=True))
+
+        ids, cursor = [], ''
+        while True:
+            data = self.search(q='zephyr', limit=3, cursor=cursor)
+            ids.extend(auction['id'] for auction in data['auctions'])
+            if not data['pagination']['has_more']:
+                break
+            cursor = data['pagination']['next_cursor']
+        self.assertEqual(ids, self.search_ids(q='zephyr', limit=100))
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(len(ids), 10)
+
+    def test_short_terms_filter_with_like(self):
+        # 两个字的中文词短于trigram，只用LIKE过滤；与长关键词组合时仍走全文索引
+        self.assertEqual(self.search_ids(q='台灯'), [self.chinese])
+        self.assertEqual(self.search_ids(q='zephyr 台灯'), [self.chinese])
+        self.assertEqual(self.search_ids(q='zephyr 书桌'), [])
+
+    def test_query_syntax_is_treated_as_text(self):
+        for query in ('"zephyr', 'zephyr OR desk', 'zephyr*', 'NEAR(zephyr lamp)', '100%_'):
+            with self.subTest(query=query):
+                self.search(q=query)
+
+    def test_updated_title_is_reindexed(self):
+        auction_id = self.ties[0]
+        conn = get_db()
+        conn.execute('UPDATE auctions SET title = ? WHERE id = ?', ('Quixotic kettle', auction_id))
+        conn.commit()
+        release_db(conn)
+        try:
+            self.assertEqual(self.search_ids(q='quixotic'), [auction_id])
+            self.assertNotIn(auction_id, self.search_ids(q='zephyr vase'))
+        finally:
+            conn = get_db()
+            conn.execute('UPDATE auctions SET title = ? WHERE id = ?', ('Zephyr vase', auction_id))
+            conn.commit()
+            release_db(conn)
+
+    def test_highlight_escapes_html(self):
+        data = self.search(q='zephyr chair')
+        self.assertEqual(data['auctions'][0]['highlight']['title'], '<mark>Zephyr</mark> <mark>chair</mark> &amp; &lt;stool&gt;')
+
+    def test_empty_query_is_rejected(self):
+        self.assertEqual(self.client.get('/api/auctions/search', query_string={'q': '  '}).status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
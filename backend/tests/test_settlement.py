@@ -0,0 +1,135 @@
+"""结算引擎：按结束时间的最小堆批量结算到期拍卖，软结束延长的拍卖按新的结束时间重新入堆
+
+用法（在 backend 目录下）：
+    python -m unittest discover tests
+"""
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+os.environ['DATABASE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='test-settlement-'), 'auction.db')
+
+from database import get_db, init_db, release_db
+from models import Auction
+from scheduler import SettlementEngine, get_engine, parse_end_time
+from utils import END_TIME_FORMAT
+
+
+def local_after(seconds):
+    return (datetime.now() + timedelta(seconds=seconds)).strftime(END_TIME_FORMAT)
+
+
+class FakeScheduler:
+    """只记录唤醒任务的调度器，由测试直接调用 settle_due"""
+
+    def __init__(self):
+        self.jobs = {}
+
+    def add_job(self, func, id, **kwargs):
+        self.jobs[id] = kwargs
+
+    def get_job(self, job_id):
+        return self.jobs.get(job_id)
+
+    def remove_job(self, job_id):
+        del self.jobs[job_id]
+
+
+class SettlementEngineTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # 同一进程中其他测试创建的应用可能已启动结算引擎，停止它以免抢先结算本测试的拍卖
+        engine = get_engine()
+        if engine:
+            engine.stop()
+        init_db()
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute('INSERT INTO users (username, email, password) VALUES (?, ?, ?)',
+                       ('settle-seller', 'settle-seller@test.local', '-'))
+        cls.seller_id = cursor.lastrowid
+        cursor.execute('INSERT INTO users (username, email, password) VALUES (?, ?, ?)',
+                       ('settle-bidder', 'settle-bidder@test.local', '-'))
+        cls.bidder_id = cursor.lastrowid
+        conn.commit()
+        release_db(conn)
+
+    def setUp(self):
+        self.scheduler = FakeScheduler()
+        self.engine = SettlementEngine(self.scheduler)
+
+    def create_auction(self, end_time, with_bid=False):
+        auction = Auction.create('Lamp', 'settlement', 1, end_time, self.seller_id, [], 1)
+        if with_bid:
+            conn = get_db()
+            conn.execute('INSERT INTO bids (auction_id, bidder_id, amount) VALUES (?, ?, ?)',
+                         (auction['id'], self.bidder_id, 5))
+            conn.commit()
+            release_db(conn)
+        return auction
+
+    def next_run(self):
+        job = self.scheduler.get_job(SettlementEngine.JOB_ID)
+        return job['run_date'] if job else None
+
+    def test_settles_due_auctions_in_one_batch(self):
+        sold = self.create_auction(local_after(-2), with_bid=True)
+        unsold = self.create_auction(local_after(-1))
+        later = self.create_auction(local_after(3600))
+        self.engine.add_many([(a['id'], a['end_time']) for a in (later, sold, unsold)])
+        # 唤醒任务安排在最早的结束时间
+        self.assertEqual(self.next_run(), datetime.fromtimestamp(parse_end_time(sold['end_time'])))
+
+        with mock.patch.object(Auction, 'settle', wraps=Auction.settle) as settle:
+            result = self.engine.settle_due()
+        settle.assert_called_once()
+        self.assertEqual(sorted(settle.call_args.args[0]), sorted([sold['id'], unsold['id']]))
+        self.assertEqual(result, {sold['id']: 'ended', unsold['id']: 'no_bid'})
+        self.assertEqual(self.engine.pending_count(), 1)
+        self.assertEqual(self.next_run(), datetime.fromtimestamp(parse_end_time(later['end_time'])))
+
+    def test_soft_close_extension_is_pushed_back(self):
+        auction = self.create_auction(local_after(-1))
+        self.engine.add(auction['id'], auction['end_time'])
+        # 入堆之后出价触发软结束（可能在其他进程中），数据库中的结束时间已经延长
+        extended = local_after(120)
+        conn = get_db()
+        conn.execute('UPDATE auctions SET end_time = ? WHERE id = ?', (extended, auction['id']))
+        conn.commit()
+        release_db(conn)
+
+        self.assertEqual(self.engine.settle_due(), {})
+        self.assertEqual(Auction.get_by_id(auction['id'])['status'], 'active')
+        self.assertEqual(self.engine.pending_count(), 1)
+        self.assertEqual(self.next_run(), datetime.fromtimestamp(parse_end_time(extended)))
+
+    def test_re_added_auction_replaces_stale_heap_entry(self):
+        auction = self.create_auction(local_after(-1))
+        self.engine.add(auction['id'], auction['end_time'])
+        extended = local_after(300)
+        self.engine.add(auction['id'], extended)
+
+        with mock.patch.object(Auction, 'settle', wraps=Auction.settle) as settle:
+            self.assertEqual(self.engine.settle_due(), {})
+        settle.assert_not_called()
+        self.assertEqual(self.engine.pending_count(), 1)
+        self.assertEqual(self.next_run(), datetime.fromtimestamp(parse_end_time(extended)))
+
+    def test_failed_settlement_is_retried(self):
+        auction = self.create_auction(local_after(-1))
+        self.engine.add(auction['id'], auction['end_time'])
+        with mock.patch.object(Auction, 'settle', side_effect=RuntimeError('database is locked')):
+            self.assertEqual(self.engine.settle_due(), {})
+        self.assertEqual(self.engine.pending_count(), 1)
+        self.assertGreater(self.next_run(), datetime.now())
+
+        with mock.patch('scheduler.time.time', return_value=datetime.now().timestamp() + 60):
+            self.assertEqual(self.engine.settle_due(), {auction['id']: 'no_bid'})
+        self.assertEqual(self.engine.pending_count(), 0)
+        self.assertIsNone(self.next_run())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+"""缩略图：先写临时文件再原子替换，写入失败时不留下临时文件，无法生成时返回None
+
+用法（在 backend 目录下）：
+    python -m unittest discover tests
+"""
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from config import Config
+import thumbnails
+
+Image = thumbnails.Image
+
+
+@unittest.skipIf(Image is None, '需要Pillow')
+class GenerateVariantTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(Config, 'UPLOAD_FOLDER', tempfile.mkdtemp(prefix='test-thumbnails-'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.source = os.path.join(Config.UPLOAD_FOLDER, 'source.png')
+        Image.new('RGB', (800, 600), 'red').save(self.source)
+
+    def folder_files(self):
+        folder = thumbnails.get_thumbnail_folder()
+        return sorted(os.listdir(folder)) if os.path.isdir(folder) else []
+
+    def test_generates_resized_variant(self):
+        path = thumbnails.generate_variant(self.source, 'a' * 64 + '.png', 'small')
+        self.assertEqual(self.folder_files(), [os.path.basename(path)])
+        with Image.open(path) as image:
+            self.assertEqual(max(image.size), Config.IMAGE_VARIANTS['small'])
+
+    def test_failed_save_removes_temp_file(self):
+        original_save = Image.Image.save
+
+        def save_then_fail(image, fp, *args, **kwargs):
+            # 写入部分数据后失败（如磁盘已满）
+            original_save(image, fp, *args, **kwargs)
+            raise OSError(28, 'No space left on device')
+
+        with mock.patch.object(Image.Image, 'save', save_then_fail):
+            with self.assertLogs(thumbnails.logger, 'WARNING'):
+                self.assertIsNone(thumbnails.generate_variant(self.source, 'b' * 64 + '.png', 'small'))
+        self.assertEqual(self.folder_files(), [])
+
+    def test_failed_replace_removes_temp_file(self):
+        with mock.patch('thumbnails.os.replace', side_effect=PermissionError(13, 'Permission denied')):
+            with self.assertLogs(thumbnails.logger, 'WARNING'):
+                self.assertIsNone(thumbnails.generate_variant(self.source, 'c' * 64 + '.png', 'small'))
+        self.assertEqual(self.folder_files(), [])
+
+    def test_unreadable_source_returns_none(self):
+        broken = os.path.join(Config.UPLOAD_FOLDER, 'broken.png')
+        with open(broken, 'wb') as f:
+            f.write(b'\x89PNG\r\n\x1a\nnot an image')
+        with self.assertLogs(thumbnails.logger, 'WARNING'):
+            self.assertIsNone(thumbnails.generate_variant(broken, 'd' * 64 + '.png', 'small'))
+        self.assertEqual(self.folder_files(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+import logging
+import os
+import threading
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # 未安装Pillow时不生成缩略图，直接使用原图
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+_cache_lock = threading.Lock()
+_cache_size = None  # 缩略图目录当前占用的字节数（首次使用时统计）
+
+def get_thumbnail_folder():
+    """获取缩略图存储目录"""
+    return os.path.join(Config.UPLOAD_FOLDER, 'thumbnails')
+
+def get_variant_format():
+    """缩略图格式：优先WebP，不支持时使用JPEG"""
+    if Image is not None and 'WEBP' in Image.registered_extensions().values():
+        return 'WEBP', 'webp', 'image/webp'
+    return 'JPEG', 'jpg', 'image/jpeg'
+
+def variant_filename(image_key, size):
+    """缩略图文件名"""
+    return f"{image_key.split('.')[0]}_{size}.{get_variant_format()[1]}"
+
+def generate_variant(source_path, image_key, size):
+    """生成指定尺寸的缩略图，返回缩略图路径；无法生成时返回None"""
+    if Image is None or size not in Config.IMAGE_VARIANTS:
+        return None
+    folder = get_thumbnail_folder()
+    path = os.path.join(folder, variant_filename(image_key, size))
+    if os.path.exists(path):
+        return path
+    
+    max_side = Config.IMAGE_VARIANTS[size]
+    image_format, _, _ = get_variant_format()
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        with Image.open(source_path) as image:
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((max_side, max_side))
+            if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            elif image.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+                image = image.convert('RGBA')
+            os.makedirs(folder, exist_ok=True)
+            try:
+                image.save(tmp_path, image_format, quality=Config.THUMBNAIL_QUALITY)
+                os.replace(tmp_path, path)
+            except Exception:
+                # 写入或替换失败（如磁盘已满）时删除不完整的临时文件，避免残留在缩略图目录中
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                raise
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        # 无法解析或像素数超过Pillow上限（解压炸弹）的图片不生成缩略图，直接使用原图
+        logger.warning(f"Failed to generate {size} thumbnail for {image_key}: {e}")
+        return None
+    
+    _track_and_evict(os.path.getsize(path))
+    return path
+
+def get_variant(source_path, image_key, size):
+    """获取缩略图路径，不存在时按需生成（用于迁移前的旧拍卖）"""
+    path = os.path.join(get_thumbnail_folder(), variant_filename(image_key, size))
+    if os.path.exists(path):
+        # 更新修改时间，使淘汰时优先删除最久未访问的缩略图
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+    return generate_variant(source_path, image_key, size)
+
+def _track_and_evict(added_bytes):
+    """记录缩略图目录大小，超过上限时按最久未使用淘汰"""
+    global _cache_size
+    with _cache_lock:
+        folder = get_thumbnail_folder()
+        if _cache_size is None:
+            _cache_size = sum(entry.stat().st_size for entry in os.scandir(folder) if entry.is_file())
+        else:
+            _cache_size += added_bytes
+        if _cache_size <= Config.THUMBNAIL_CACHE_MAX_BYTES:
+            return
+        
+        entries = sorted(
+            (entry for entry in os.scandir(folder) if entry.is_file()),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        # 淘汰到上限的90%，避免每次生成都触发清理
+        target = Config.THUMBNAIL_CACHE_MAX_BYTES * 0.9
+        for entry in entries:
+            if _cache_size <= target:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                _cache_size -= size
+            except OSError:
+                continue
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=Config.THUMBNAIL_WORKERS,
+                                           thread_name_prefix='thumbnail')
+        return _executor
+
+def _generate_all(image_folder, image_keys):
+    for image_key in image_keys:
+        source_path = os.path.join(image_folder, image_key)
+        for size in Config.IMAGE_VARIANTS:
+            generate_variant(source_path, image_key, size)
+
+def schedule(image_folder, image_keys):
+    """在后台线程中为新上传的图片生成所有尺寸的缩略图"""
+    if Image is None or not image_keys:
+        return
+    _get_executor().submit(_generate_all, image_folder, list(image_keys))
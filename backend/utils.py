@@ -0,0 +1,71 @@
+from flask import request
+from config import Config
+from collections import deque
+from datetime import datetime
+import threading
+import time
+
+# 拍卖结束时间的存储格式：服务器本地时间、不带时区，SQL中可以直接按字符串比较
+END_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+def normalize_end_time(value):
+    """把结束时间转换为存储格式（带时区的时间换算为服务器本地时间，舍去秒以下部分），格式不正确时抛出ValueError"""
+    if not isinstance(value, str):
+        raise ValueError('结束时间格式不正确')
+    end = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    if end.tzinfo:
+        end = end.astimezone().replace(tzinfo=None)
+    return end.strftime(END_TIME_FORMAT)
+
+def resolve_client_ip(remote_addr, real_ip):
+    """由连接地址和X-Real-IP头确定客户端IP（登录限流按此IP计数）
+    
+    只有连接来自可信的反向代理（Config.TRUSTED_PROXIES，如同一容器中的nginx）时才使用其
+    用 $remote_addr 覆盖写入的 X-Real-IP 头；直接连接的客户端可以任意设置该头，使用连接地址。
+    X-Forwarded-For 的第一项由客户端原样传入、可以任意伪造，不使用。
+    """
+    if real_ip and remote_addr in Config.TRUSTED_PROXIES:
+        return real_ip
+    return remote_addr or 'unknown'
+
+def get_client_ip():
+    """获取当前Flask请求的客户端真实IP地址（规则见 resolve_client_ip）"""
+    return resolve_client_ip(request.remote_addr, request.headers.get('X-Real-Ip'))
+
+class RateLimiter:
+    """按键（如客户端IP）统计滑动窗口内的请求次数"""
+    
+    def __init__(self, limit, window_seconds):
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self._hits = {}  # 键 -> 窗口内的请求时间
+        self._lock = threading.Lock()
+        self._last_prune = time.monotonic()
+    
+    def hit(self, key):
+        """记录一次请求；超过限制时不记录，返回需要等待的秒数，否则返回0"""
+        return self._check(key, record=True)
+    
+    def check(self, key):
+        """只检查不记录（如登录只记录失败的尝试）：已达到限制时返回需要等待的秒数，否则返回0"""
+        return self._check(key, record=False)
+    
+    def _check(self, key, record):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_prune > self.window_seconds:
+                self._prune(now)
+            hits = self._hits.setdefault(key, deque())
+            while hits and hits[0] <= now - self.window_seconds:
+                hits.popleft()
+            if len(hits) >= self.limit:
+                return max(1, int(hits[0] + self.window_seconds - now) + 1)
+            if record:
+                hits.append(now)
+            return 0
+    
+    def _prune(self, now):
+        # 清理窗口内已无请求的键，避免字典无限增长
+        for key in [key for key, hits in self._hits.items() if not hits or hits[-1] <= now - self.window_seconds]:
+            del self._hits[key]
+        self._last_prune = now
@@ -0,0 +1,10 @@
+"""WSGI入口
+
+用于只支持WSGI的服务器（如 gunicorn -k gthread wsgi:app）。每个实时推送（SSE）连接会一直占用一个工作线程，
+生产环境使用 gunicorn.conf.py（uvicorn 工作进程运行 asgi:app）。
+
+每个工作进程都处理HTTP请求，结算任务只在持有租约的进程中运行（见 scheduler.LeaderElection）。
+"""
+from app import create_app
+
+app = create_app()